@@ -0,0 +1,223 @@
+"""
+Measures the overhead of pytest-scrutinize on synthetic test suites.
+
+Each benchmark generates a suite with pytester, then runs it in a subprocess without
+the plugin and with a single feature enabled. Results are written as JSON to the
+path given by --bench-output, so that runs can be compared to find regressions:
+
+    pytest benchmarks/bench_overhead.py --bench-suites=small,large --bench-output=results.json
+"""
+
+import gzip
+import sys
+import textwrap
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+import pytest
+from _pytest.pytester import Pytester, RunResult
+
+
+@dataclass(frozen=True)
+class Suite:
+    tests: int
+    fixtures: int
+    calls: int
+    functions: int = 10
+    tests_per_module: int = 50
+
+
+SUITES = {
+    "small": Suite(tests=100, fixtures=2, calls=10),
+    "large": Suite(tests=500, fixtures=5, calls=200),
+}
+
+
+@dataclass(frozen=True)
+class Feature:
+    args: tuple[str, ...]
+    django: bool = False
+    min_python: tuple[int, int] = (3, 9)
+
+
+def _func_args(count: int) -> tuple[str, ...]:
+    funcs = ",".join(f"bench_target.func_{i}" for i in range(count))
+    return (f"--scrutinize-func={funcs}",)
+
+
+FEATURES = {
+    "base": Feature(args=()),
+    "gc": Feature(args=("--scrutinize-gc",)),
+    "func-1": Feature(args=_func_args(1)),
+    "func-10": Feature(args=_func_args(10)),
+    "func-10-session": Feature(
+        args=(*_func_args(10), "--scrutinize-func-patch=session")
+    ),
+    "func-10-monitoring": Feature(
+        args=(*_func_args(10), "--scrutinize-func-backend=monitoring"),
+        min_python=(3, 12),
+    ),
+    "func-10-aggregate": Feature(args=(*_func_args(10), "--scrutinize-mode=aggregate")),
+    "func-10-sample": Feature(
+        args=(
+            *_func_args(10),
+            *(f"--scrutinize-sample=bench_target.func_{i}=0.1" for i in range(10)),
+        )
+    ),
+    "cpu": Feature(args=("--scrutinize-cpu",)),
+    "func-10-cpu": Feature(args=(*_func_args(10), "--scrutinize-cpu")),
+    "writer-thread": Feature(args=(*_func_args(10), "--scrutinize-writer=thread")),
+    "django-sql": Feature(args=("--scrutinize-django-sql",), django=True),
+}
+
+
+def pytest_generate_tests(metafunc: pytest.Metafunc):
+    if "suite_name" in metafunc.fixturenames:
+        suite_names = metafunc.config.getoption("--bench-suites").split(",")
+        metafunc.parametrize("suite_name", [name.strip() for name in suite_names])
+
+
+def write_suite(pytester: Pytester, suite: Suite, django: bool):
+    functions = "\n".join(
+        f"def func_{i}(value):\n    return value + {i}\n"
+        for i in range(suite.functions)
+    )
+    pytester.makepyfile(bench_target=functions)
+
+    if django:
+        pytester.makepyfile(
+            bench_settings="""
+            DATABASES = {
+                "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}
+            }
+            """
+        )
+        call_body = """
+            from django.db import connection
+
+            with connection.cursor() as cursor:
+                for i in range(calls):
+                    cursor.execute("SELECT %s", [i])
+        """
+    else:
+        call_body = f"""
+            for i in range(calls):
+                getattr(bench_target, f"func_{{i % {suite.functions}}}")(i)
+        """
+
+    fixtures = "\n".join(
+        textwrap.dedent(f"""
+        @pytest.fixture()
+        def fixture_{i}():
+            call_targets({suite.calls})
+            yield
+            call_targets({suite.calls})
+        """)
+        for i in range(suite.fixtures)
+    )
+
+    conftest = textwrap.dedent("""
+        import resource
+        import sys
+
+        import pytest
+
+        import bench_target
+
+
+        def pytest_unconfigure(config):
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # ru_maxrss is in kilobytes on Linux, and bytes on macOS
+            if sys.platform != "darwin":
+                max_rss *= 1024
+            with open("peak_rss.txt", "w") as fd:
+                fd.write(str(max_rss))
+
+
+        def call_targets(calls):
+    """) + textwrap.indent(textwrap.dedent(call_body).strip(), "    ")
+    pytester.makeconftest(f"{conftest}\n\n{fixtures}")
+
+    fixture_args = ", ".join(f"fixture_{i}" for i in range(suite.fixtures))
+    mark = "@pytest.mark.django_db\n" if django else ""
+    test_case = (
+        f"{mark}def test_case_{{i}}({fixture_args}):\n    call_targets({suite.calls})\n"
+    )
+    modules = {}
+    for start in range(0, suite.tests, suite.tests_per_module):
+        count = min(suite.tests_per_module, suite.tests - start)
+        tests = "\n\n".join(test_case.format(i=i) for i in range(count))
+        modules[f"test_module_{start}"] = (
+            f"import pytest\nfrom conftest import call_targets\n\n\n{tests}"
+        )
+    pytester.makepyfile(**modules)
+
+
+def run_suite(pytester: Pytester, args: list[str], repeat: int) -> RunResult:
+    results = []
+    for _ in range(repeat):
+        result = pytester.runpytest_subprocess("-p", "no:cacheprovider", *args)
+        assert result.ret == 0, result.outlines
+        results.append(result)
+    return min(results, key=lambda run: run.duration)
+
+
+def count_events(output_path: Path) -> int:
+    with gzip.open(output_path, mode="rb") as fd:
+        return sum(1 for _ in fd)
+
+
+@pytest.mark.parametrize("feature_name", FEATURES)
+def test_overhead(
+    pytester: Pytester,
+    request: pytest.FixtureRequest,
+    bench_results: list[dict],
+    suite_name: str,
+    feature_name: str,
+):
+    suite = SUITES[suite_name]
+    feature = FEATURES[feature_name]
+    if feature.django:
+        pytest.importorskip("pytest_django")
+    if sys.version_info < feature.min_python:
+        pytest.skip(f"{feature_name} requires Python {feature.min_python}")
+
+    write_suite(pytester, suite, django=feature.django)
+    repeat = request.config.getoption("--bench-repeat")
+
+    base_args = ["-q"]
+    if feature.django:
+        base_args.append("--ds=bench_settings")
+
+    # The plugin is installed, but not enabled
+    baseline = run_suite(pytester, base_args, repeat)
+    baseline_rss = int((pytester.path / "peak_rss.txt").read_text())
+
+    output_path = pytester.path / "output.jsonl.gz"
+    with_plugin = run_suite(
+        pytester,
+        [*base_args, f"--scrutinize={output_path}", *feature.args],
+        repeat,
+    )
+    peak_rss = int((pytester.path / "peak_rss.txt").read_text())
+
+    events = count_events(output_path)
+    output_bytes = output_path.stat().st_size
+    overhead_ns = int((with_plugin.duration - baseline.duration) * 1_000_000_000)
+
+    bench_results.append(
+        {
+            "suite": suite_name,
+            "suite_config": asdict(suite),
+            "feature": feature_name,
+            "args": list(feature.args),
+            "baseline_ns": int(baseline.duration * 1_000_000_000),
+            "runtime_ns": int(with_plugin.duration * 1_000_000_000),
+            "events": events,
+            "overhead_ns_per_event": overhead_ns // max(events, 1),
+            "baseline_peak_rss_bytes": baseline_rss,
+            "peak_rss_bytes": peak_rss,
+            "output_bytes": output_bytes,
+            "output_bytes_per_event": output_bytes / max(events, 1),
+        }
+    )
@@ -0,0 +1,64 @@
+"""
+Compare two benchmark result files produced by bench_overhead.py:
+
+    python benchmarks/compare.py main.json branch.json --threshold=1.2
+
+Exits with a non-zero status if the per-event overhead of any suite/feature pair
+grew by more than the given ratio.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def load_results(path: Path) -> dict[tuple[str, str], dict]:
+    data = json.loads(path.read_text())
+    return {(result["suite"], result["feature"]): result for result in data["results"]}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("current", type=Path)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="Maximum allowed ratio between the current and baseline overhead",
+    )
+    args = parser.parse_args()
+
+    baseline = load_results(args.baseline)
+    current = load_results(args.current)
+
+    regressions = 0
+    print(
+        f"{'suite':<8} {'feature':<16} {'ns/event':>12} {'was':>12} "
+        f"{'bytes/event':>12} {'peak rss':>12}"
+    )
+    for key, result in sorted(current.items()):
+        suite, feature = key
+        overhead = result["overhead_ns_per_event"]
+        previous = baseline.get(key)
+        previous_overhead = previous["overhead_ns_per_event"] if previous else None
+
+        marker = ""
+        if previous_overhead is not None and previous_overhead > 0:
+            if overhead / previous_overhead > args.threshold:
+                marker = "  REGRESSION"
+                regressions += 1
+
+        print(
+            f"{suite:<8} {feature:<16} {overhead:>12} "
+            f"{previous_overhead if previous_overhead is not None else '-':>12} "
+            f"{result['output_bytes_per_event']:>12.1f} "
+            f"{result['peak_rss_bytes']:>12}{marker}"
+        )
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+import json
+import platform
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest_plugins = [
+    "pytester",
+]
+
+
+def pytest_addoption(parser: pytest.Parser):
+    group = parser.getgroup("scrutinize-bench", "pytest-scrutinize benchmarks")
+    group.addoption(
+        "--bench-output",
+        type=Path,
+        default=Path("bench-results.json"),
+        help="Write machine-readable benchmark results to this file",
+    )
+    group.addoption(
+        "--bench-suites",
+        default="small",
+        help="Comma separated list of synthetic suites to run",
+    )
+    group.addoption(
+        "--bench-repeat",
+        type=int,
+        default=3,
+        help="Number of times to run each suite. The fastest run is reported",
+    )
+
+
+@pytest.fixture(scope="session")
+def bench_results(request: pytest.FixtureRequest):
+    results: list[dict] = []
+    yield results
+
+    output_path: Path = request.config.getoption("--bench-output")
+    output_path.write_text(
+        json.dumps(
+            {
+                "python": sys.version,
+                "platform": platform.platform(),
+                "results": results,
+            },
+            indent=2,
+        )
+    )
@@ -5,22 +5,46 @@ from typing import Union
 from .data import (
     GCTiming,
     CollectionTiming,
+    CollectionFileTiming,
     WorkerTiming,
     MockTiming,
     TestTiming,
+    TestCostTiming,
     FixtureTiming,
     DjangoSQLTiming,
+    RepeatedSQLTiming,
+    DjangoSQLExplainTiming,
+    NetworkTiming,
+    WriterTiming,
+    MergeTiming,
+    OverheadTiming,
+    HookTiming,
+    AggregateTiming,
+    MemoryTiming,
+    ProfileTiming,
 )
 
 Timing = typing.Annotated[
     Union[
         GCTiming,
         CollectionTiming,
+        CollectionFileTiming,
         WorkerTiming,
         MockTiming,
         TestTiming,
+        TestCostTiming,
         FixtureTiming,
         DjangoSQLTiming,
+        RepeatedSQLTiming,
+        DjangoSQLExplainTiming,
+        NetworkTiming,
+        WriterTiming,
+        MergeTiming,
+        OverheadTiming,
+        HookTiming,
+        AggregateTiming,
+        MemoryTiming,
+        ProfileTiming,
     ],
     pydantic.Field(discriminator="type"),
 ]
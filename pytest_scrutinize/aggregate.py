@@ -0,0 +1,158 @@
+import collections
+import typing
+from dataclasses import dataclass, field
+
+from .data import AggregateTiming, HistogramBucket
+from .io import TimingsSink
+from .records import TimingRecord, MockRecord, DjangoSQLRecord, GCRecord, hash_query
+from .scope import get_scope
+from .timer import Duration
+
+if typing.TYPE_CHECKING:
+    from .data import BaseTiming
+
+# With `--scrutinize-mode=aggregate`, high-frequency timings (recorded functions, SQL queries
+# and garbage collections) are not written individually. Instead, each one is folded into an
+# aggregate keyed by (source, name, test_id, fixture_name, sql_hash). Aggregates for a test are
+# written when the test finishes, and all others when the session finishes.
+
+# Number of bits kept below the most significant bit when bucketing a duration. Two bits gives
+# four buckets per power of two, with a relative error of at most 25%.
+_HISTOGRAM_PRECISION_BITS = 2
+
+AggregateKey = tuple[str, str, str | None, str | None, str | None]
+
+
+def bucket_lower_bound(value_ns: int) -> int:
+    shift = max(value_ns.bit_length() - 1 - _HISTOGRAM_PRECISION_BITS, 0)
+    return (value_ns >> shift) << shift
+
+
+@dataclass(slots=True)
+class Aggregate:
+    count: int = 0
+    total_ns: int = 0
+    min_ns: int = 0
+    max_ns: int = 0
+    histogram: collections.Counter[int] = field(default_factory=collections.Counter)
+    sql: str | None = None
+
+    def add(self, value_ns: int):
+        if self.count == 0 or value_ns < self.min_ns:
+            self.min_ns = value_ns
+        if value_ns > self.max_ns:
+            self.max_ns = value_ns
+        self.count += 1
+        self.total_ns += value_ns
+        self.histogram[bucket_lower_bound(value_ns)] += 1
+
+    def merge(self, other: "Aggregate"):
+        if other.count == 0:
+            return
+        if self.count == 0 or other.min_ns < self.min_ns:
+            self.min_ns = other.min_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+        self.count += other.count
+        self.total_ns += other.total_ns
+        self.histogram.update(other.histogram)
+        self.sql = self.sql or other.sql
+
+    def to_timing(self, key: AggregateKey) -> AggregateTiming:
+        source, name, test_id, fixture_name, sql_hash = key
+        return AggregateTiming(
+            source=source,
+            name=name,
+            test_id=test_id,
+            fixture_name=fixture_name,
+            sql_hash=sql_hash,
+            sql=self.sql,
+            count=self.count,
+            total=Duration(as_nanoseconds=self.total_ns),
+            min=Duration(as_nanoseconds=self.min_ns),
+            max=Duration(as_nanoseconds=self.max_ns),
+            histogram=[
+                HistogramBucket(lower_ns=lower_ns, count=count)
+                for lower_ns, count in sorted(self.histogram.items())
+            ],
+        )
+
+    @classmethod
+    def from_timing(cls, timing: AggregateTiming) -> tuple[AggregateKey, "Aggregate"]:
+        key = (
+            timing.source,
+            timing.name,
+            timing.test_id,
+            timing.fixture_name,
+            timing.sql_hash,
+        )
+        aggregate = cls(
+            count=timing.count,
+            total_ns=timing.total.as_nanoseconds,
+            min_ns=timing.min.as_nanoseconds,
+            max_ns=timing.max.as_nanoseconds,
+            histogram=collections.Counter(
+                {bucket.lower_ns: bucket.count for bucket in timing.histogram}
+            ),
+            sql=timing.sql,
+        )
+        return key, aggregate
+
+
+@dataclass
+class TimingsAggregator:
+    output: TimingsSink
+
+    # Aggregates grouped by test ID, so that a single test can be flushed cheaply
+    aggregates: dict[str | None, dict[AggregateKey, Aggregate]] = field(
+        default_factory=dict
+    )
+
+    def add_timing(self, timing: "BaseTiming | TimingRecord"):
+        match timing:
+            case DjangoSQLRecord():
+                sql_hash, query = hash_query(timing.query)
+                key = (
+                    "django-sql",
+                    timing.name,
+                    timing.test_id,
+                    timing.fixture_name,
+                    sql_hash,
+                )
+                aggregate = self._get_aggregate(key)
+                if timing.include_sql:
+                    aggregate.sql = query
+            case MockRecord():
+                key = ("mock", timing.name, timing.test_id, timing.fixture_name, None)
+                aggregate = self._get_aggregate(key)
+            case GCRecord():
+                test_id, fixture_name = get_scope() or (None, None)
+                aggregate = self._get_aggregate(
+                    ("gc", f"gen{timing.generation}", test_id, fixture_name, None)
+                )
+            case _:
+                self.output.add_timing(timing)
+                return
+
+        aggregate.add(timing.runtime_ns)
+
+    def _get_aggregate(self, key: AggregateKey) -> Aggregate:
+        test_aggregates = self.aggregates.setdefault(key[2], {})
+        if (aggregate := test_aggregates.get(key)) is None:
+            aggregate = test_aggregates[key] = Aggregate()
+        return aggregate
+
+    def merge_timing(self, timing: AggregateTiming):
+        key, aggregate = Aggregate.from_timing(timing)
+        self._get_aggregate(key).merge(aggregate)
+
+    def take_timings(self, test_id: str | None) -> list[AggregateTiming]:
+        test_aggregates = self.aggregates.pop(test_id, {})
+        return [aggregate.to_timing(key) for key, aggregate in test_aggregates.items()]
+
+    def flush_test(self, test_id: str | None):
+        for timing in self.take_timings(test_id):
+            self.output.add_timing(timing)
+
+    def flush_all(self):
+        for test_id in list(self.aggregates):
+            self.flush_test(test_id)
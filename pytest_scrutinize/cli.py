@@ -0,0 +1,151 @@
+"""
+Analyse the output of pytest-scrutinize:
+
+    scrutinize report test-timings.jsonl.gz --top=20
+
+Write the stacks sampled with --scrutinize-profile for flamegraph tools:
+
+    scrutinize collapse test-timings.jsonl.gz | flamegraph.pl > profile.svg
+
+Keep a history of runs and detect regressions:
+
+    scrutinize ingest test-timings.jsonl.gz --store=scrutinize.db --name=$GIT_SHA
+    scrutinize compare --store=scrutinize.db --runs=10
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from .history import open_store
+from .profiler import collapse_profiles
+from .report import build_report
+
+
+def report_command(args: argparse.Namespace) -> int:
+    if args.path.suffix == ".parquet":
+        print(
+            "Parquet output can be queried directly with DuckDB or pyarrow",
+            file=sys.stderr,
+        )
+        return 2
+    report = build_report(args.path, top=args.top)
+    sys.stdout.write(report.render())
+    return 0
+
+
+def collapse_command(args: argparse.Namespace) -> int:
+    stacks = collapse_profiles(args.path, test_id_prefix=args.test)
+    for stack, count in stacks.most_common():
+        sys.stdout.write(f"{stack} {count}\n")
+    return 0
+
+
+def ingest_command(args: argparse.Namespace) -> int:
+    with open_store(args.store) as store:
+        run_id = store.ingest(args.path, name=args.name)
+    print(f"Ingested {args.path} as run {run_id}")
+    return 0
+
+
+def compare_command(args: argparse.Namespace) -> int:
+    with open_store(args.store) as store:
+        try:
+            regressions = store.compare(
+                run_id=args.run, baseline_runs=args.runs, threshold=args.threshold
+            )
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+
+    if not regressions:
+        print("No regressions found")
+        return 0
+    for regression in regressions:
+        if regression.kind == "queries":
+            baseline, current = (
+                f"{regression.baseline:.0f}",
+                f"{regression.current:.0f}",
+            )
+        else:
+            baseline = f"{regression.baseline / 1_000_000:.2f}ms"
+            current = f"{regression.current / 1_000_000:.2f}ms"
+        print(
+            f"{regression.kind:<16} {regression.key}: {baseline} -> {current} "
+            f"(+{regression.change:.0%})"
+        )
+    return 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="scrutinize",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    report_parser = commands.add_parser(
+        "report",
+        help="Report the slowest tests and fixtures, duplicate SQL queries and "
+        "garbage collection totals",
+    )
+    report_parser.add_argument("path", type=Path, help="A .jsonl.gz output file")
+    report_parser.add_argument(
+        "--top", type=int, default=10, help="Number of rows in each table"
+    )
+    report_parser.set_defaults(func=report_command)
+
+    collapse_parser = commands.add_parser(
+        "collapse",
+        help="Print the stacks sampled with --scrutinize-profile in the collapsed "
+        "format used by flamegraph tools",
+    )
+    collapse_parser.add_argument("path", type=Path, help="A .jsonl.gz output file")
+    collapse_parser.add_argument(
+        "--test", help="Only include tests whose ID starts with this"
+    )
+    collapse_parser.set_defaults(func=collapse_command)
+
+    ingest_parser = commands.add_parser("ingest", help="Add a run to a history store")
+    ingest_parser.add_argument("path", type=Path, help="A .jsonl.gz output file")
+    ingest_parser.add_argument(
+        "--store", type=Path, required=True, help="SQLite database to add the run to"
+    )
+    ingest_parser.add_argument(
+        "--name", help="Name of the run, such as a commit. Defaults to the time"
+    )
+    ingest_parser.set_defaults(func=ingest_command)
+
+    compare_parser = commands.add_parser(
+        "compare",
+        help="Compare a run to the previous runs in a history store. Exits with 1 if "
+        "any test, fixture or query count regressed",
+    )
+    compare_parser.add_argument(
+        "--store", type=Path, required=True, help="SQLite database of runs"
+    )
+    compare_parser.add_argument(
+        "--run", type=int, help="Run to compare. Defaults to the latest"
+    )
+    compare_parser.add_argument(
+        "--runs", type=int, default=10, help="Number of previous runs to compare to"
+    )
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=3,
+        help="Number of standard deviations above the mean that is a regression",
+    )
+    compare_parser.set_defaults(func=compare_command)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
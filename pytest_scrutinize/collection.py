@@ -0,0 +1,156 @@
+import contextlib
+import typing
+import warnings
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Literal
+
+import pytest
+
+from .data import CollectionFileTiming
+from .timer import Duration, measure_time, perf_ns
+
+# `CollectionTiming` covers the whole collection. The time is also broken down per file:
+# - test modules: the time to import the module, and the time to generate its items (the
+#   `pytest_make_collect_report` calls of the module and its classes, excluding the import)
+# - conftest.py files: the time to import and register them
+#
+# pytest has no hook around either import, so the module's `_getobj` and the plugin
+# manager's `_importconftest` are wrapped on the instance. Both are private, so if a pytest
+# release removes them the affected imports are not timed and a warning is shown. The
+# initial conftests are imported before the plugin is configured, so tracking starts in
+# `pytest_load_initial_conftests`.
+
+FileKind = Literal["module", "conftest"]
+
+tracker_key = pytest.StashKey["CollectionTracker"]()
+
+
+@dataclass
+class FileCollection:
+    kind: FileKind
+    import_ns: int = 0
+    collect_ns: int = 0
+    items: int = 0
+
+
+@dataclass
+class CollectionTracker:
+    rootpath: Path
+    files: dict[Path, FileCollection] = field(default_factory=dict)
+    # Import time measured since the current collector started, so it can be excluded
+    _imported_ns: int = 0
+    _warned_getobj: bool = False
+
+    def _file(self, path: Path, kind: FileKind) -> FileCollection:
+        if (file := self.files.get(path)) is None:
+            file = self.files[path] = FileCollection(kind=kind)
+        return file
+
+    def _timed_import(
+        self, path: Path, kind: FileKind, func: typing.Callable[..., typing.Any]
+    ) -> typing.Callable[..., typing.Any]:
+        def timed_import(*args, **kwargs):
+            start = perf_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed_ns = perf_ns() - start
+                self._file(path, kind).import_ns += elapsed_ns
+                self._imported_ns += elapsed_ns
+
+        return timed_import
+
+    def trace_conftests(self, config: pytest.Config):
+        pluginmanager = config.pluginmanager
+        import_conftest = getattr(pluginmanager, "_importconftest", None)
+        if import_conftest is None:
+            config.issue_config_time_warning(
+                pytest.PytestWarning(
+                    "--scrutinize-collection cannot time conftest.py imports with "
+                    "this version of pytest"
+                ),
+                stacklevel=2,
+            )
+            return
+
+        def timed_import_conftest(conftestpath: Path, *args, **kwargs):
+            return self._timed_import(conftestpath, "conftest", import_conftest)(
+                conftestpath, *args, **kwargs
+            )
+
+        pluginmanager._importconftest = timed_import_conftest  # type: ignore[method-assign]
+
+    @contextlib.contextmanager
+    def collect(
+        self, collector: pytest.Collector
+    ) -> typing.Generator[list[pytest.Item | pytest.Collector], None, None]:
+        """Measures generating the items of a module or class, excluding imports"""
+        if not isinstance(collector, (pytest.Module, pytest.Class)):
+            yield []
+            return
+
+        module = collector if isinstance(collector, pytest.Module) else None
+        if module is not None and getattr(module, "_obj", None) is None:
+            if (getobj := getattr(module, "_getobj", None)) is not None:
+                module._getobj = self._timed_import(  # type: ignore[method-assign]
+                    module.path, "module", getobj
+                )
+            elif not self._warned_getobj:
+                self._warned_getobj = True
+                warnings.warn(
+                    pytest.PytestWarning(
+                        "--scrutinize-collection cannot time test module imports "
+                        "with this version of pytest"
+                    )
+                )
+
+        result: list[pytest.Item | pytest.Collector] = []
+        imported_ns, self._imported_ns = self._imported_ns, 0
+        with measure_time() as timer:
+            yield result
+        file = self._file(collector.path, "module")
+        file.collect_ns += max(timer.elapsed_ns - self._imported_ns, 0)
+        file.items += sum(isinstance(node, pytest.Item) for node in result)
+        self._imported_ns += imported_ns
+
+    def _relative(self, path: Path) -> str:
+        try:
+            return str(path.relative_to(self.rootpath))
+        except ValueError:
+            return str(path)
+
+    def take_timings(self) -> list[CollectionFileTiming]:
+        timings = [
+            CollectionFileTiming(
+                path=self._relative(path),
+                kind=file.kind,
+                import_time=Duration(as_nanoseconds=file.import_ns),
+                collect_time=Duration(as_nanoseconds=file.collect_ns),
+                items=file.items,
+            )
+            for path, file in self.files.items()
+        ]
+        self.files = {}
+        return timings
+
+
+def get_tracker(config: pytest.Config) -> CollectionTracker:
+    if (tracker := config.stash.get(tracker_key, None)) is None:
+        tracker = config.stash[tracker_key] = CollectionTracker(config.rootpath)
+        tracker.trace_conftests(config)
+    return tracker
+
+
+class CollectionPlugin:
+    """Registered with --scrutinize-collection, to time the collection of each file"""
+
+    def __init__(self, tracker: CollectionTracker):
+        self.tracker = tracker
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_make_collect_report(self, collector: pytest.Collector):
+        with self.tracker.collect(collector) as nodes:
+            outcome = yield
+            if outcome.excinfo is None:
+                nodes.extend(outcome.get_result().result)
@@ -0,0 +1,160 @@
+import collections
+import typing
+import warnings
+from dataclasses import dataclass, field
+
+import pytest
+
+from .data import TestCostTiming
+from .timer import Duration
+
+if typing.TYPE_CHECKING:
+    from _pytest.fixtures import FixtureDef
+
+# A test's cost includes its own body, the fixtures it sets up and a share of the shared
+# (class, module, package or session scoped) fixtures it uses. A shared fixture is set up by
+# the first test that needs it and is cached for the following ones, so the test that sets
+# it up is charged a share of its setup rather than all of it.
+#
+# After collection, the tests that use each shared fixture in each of its scopes (e.g. each
+# module for a module scoped fixture) are counted, and every one of them is charged an equal
+# share of the fixture's setup. Shared fixtures are torn down after the last test that uses
+# them has run, so their teardown is removed from that test's cost and is not shared.
+#
+# Under pytest-xdist, a shared fixture can be set up on several workers but its setup is
+# still divided between every test that uses it, so shares are a lower bound.
+#
+# The fixtures a test uses are only available from pytest's private Function._fixtureinfo.
+# If a pytest release removes it, test costs are disabled with a warning.
+
+Phase = typing.Literal["setup", "call", "teardown"]
+
+_SCOPE_NODES: dict[str, type[pytest.Collector]] = {
+    "class": pytest.Class,
+    "module": pytest.Module,
+    "package": pytest.Package,
+}
+
+
+def scope_node_id(item: pytest.Item, scope: str) -> str:
+    """Returns the ID of the node a fixture of the given scope is cached on for a test"""
+    if scope == "function":
+        return item.nodeid
+    node_cls = _SCOPE_NODES.get(scope)
+    if node_cls is not None and (node := item.getparent(node_cls)) is not None:
+        return node.nodeid
+    return ""
+
+
+def item_fixturedefs(item: pytest.Item) -> list["FixtureDef"]:
+    """Returns the fixture definitions used by a test, including indirect ones"""
+    fixtureinfo = getattr(item, "_fixtureinfo", None)
+    if fixtureinfo is None:
+        return []
+    return [
+        fixturedefs[-1]
+        for name in fixtureinfo.names_closure
+        if (fixturedefs := fixtureinfo.name2fixturedefs.get(name))
+    ]
+
+
+@dataclass
+class TestCost:
+    setup_ns: int = 0
+    call_ns: int = 0
+    teardown_ns: int = 0
+    # Fixtures set up by this test, by name
+    created: list[str] = field(default_factory=list)
+    # Time spent setting up and tearing down shared fixtures during this test
+    shared_ns: int = 0
+
+
+@dataclass
+class CostTracker:
+    enabled: bool = False
+    # Number of tests that use each shared fixture, keyed by the fixture and scope node ID
+    users: collections.Counter[tuple["FixtureDef", str]] = field(
+        default_factory=collections.Counter
+    )
+    # Setup duration of the latest instance of each shared fixture
+    shared_setup_ns: dict["FixtureDef", int] = field(default_factory=dict)
+    current: TestCost | None = None
+
+    def collect(self, items: list[pytest.Item]):
+        if not self.enabled:
+            return
+        for item in items:
+            if isinstance(item, pytest.Function) and not hasattr(item, "_fixtureinfo"):
+                warnings.warn(
+                    pytest.PytestWarning(
+                        "--scrutinize-cost is not supported by this version of "
+                        "pytest, test costs will not be recorded"
+                    )
+                )
+                self.enabled = False
+                self.users.clear()
+                return
+            for fixturedef in item_fixturedefs(item):
+                if fixturedef.scope != "function":
+                    self.users[fixturedef, scope_node_id(item, fixturedef.scope)] += 1
+
+    def start_test(self):
+        if self.enabled:
+            self.current = TestCost()
+
+    def phase_done(self, phase: Phase, elapsed_ns: int):
+        if self.current is None:
+            return
+        match phase:
+            case "setup":
+                self.current.setup_ns += elapsed_ns
+            case "call":
+                self.current.call_ns += elapsed_ns
+            case "teardown":
+                self.current.teardown_ns += elapsed_ns
+
+    def fixture_setup(self, fixturedef: "FixtureDef", setup_ns: int):
+        if not self.enabled:
+            return
+        if fixturedef.scope != "function":
+            self.shared_setup_ns[fixturedef] = setup_ns
+        if self.current is not None:
+            self.current.created.append(fixturedef.argname)
+            if fixturedef.scope != "function":
+                self.current.shared_ns += setup_ns
+
+    def fixture_teardown(self, fixturedef: "FixtureDef", teardown_ns: int):
+        if self.current is not None and fixturedef.scope != "function":
+            self.current.shared_ns += teardown_ns
+
+    def finish_test(self, item: pytest.Item) -> TestCostTiming | None:
+        cost, self.current = self.current, None
+        if cost is None:
+            return None
+
+        shared_fixtures = {}
+        cached = []
+        for fixturedef in item_fixturedefs(item):
+            if fixturedef.argname not in cost.created:
+                cached.append(fixturedef.argname)
+            if fixturedef.scope == "function":
+                continue
+            users = self.users.get((fixturedef, scope_node_id(item, fixturedef.scope)))
+            setup_ns = self.shared_setup_ns.get(fixturedef, 0)
+            shared_fixtures[fixturedef.argname] = Duration(
+                as_nanoseconds=setup_ns // (users or 1)
+            )
+
+        total_ns = cost.setup_ns + cost.call_ns + cost.teardown_ns - cost.shared_ns
+        total_ns += sum(share.as_nanoseconds for share in shared_fixtures.values())
+        return TestCostTiming(
+            name=item.name,
+            test_id=item.nodeid,
+            setup=Duration(as_nanoseconds=cost.setup_ns),
+            call=Duration(as_nanoseconds=cost.call_ns),
+            teardown=Duration(as_nanoseconds=cost.teardown_ns),
+            fixtures_created=cost.created,
+            fixtures_cached=cached,
+            shared_fixtures=shared_fixtures,
+            total=Duration(as_nanoseconds=max(total_ns, 0)),
+        )
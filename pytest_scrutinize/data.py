@@ -1,10 +1,15 @@
 import abc
 import threading
 from datetime import datetime
-from typing import Literal
+from typing import ClassVar, Literal
 
 import pydantic
-from pydantic import computed_field
+from pydantic import (
+    SerializationInfo,
+    SerializerFunctionWrapHandler,
+    computed_field,
+    model_serializer,
+)
 from pydantic.fields import Field
 
 from .timer import now, Duration
@@ -26,6 +31,23 @@ class Meta(pydantic.BaseModel):
 class BaseTiming(pydantic.BaseModel, abc.ABC):
     meta: Meta = Field(default_factory=Meta)
 
+    # Fields added to existing record types, which are left out of the JSON output while
+    # they have their default value. Runs that don't use the features setting them write the
+    # same records as before.
+    omit_defaults: ClassVar[frozenset[str]] = frozenset()
+
+    @model_serializer(mode="wrap")
+    def _omit_defaults(
+        self, handler: SerializerFunctionWrapHandler, info: SerializationInfo
+    ) -> dict:
+        data = handler(self)
+        if self.omit_defaults and info.mode_is_json():
+            fields = type(self).model_fields
+            for name in self.omit_defaults:
+                if getattr(self, name) == fields[name].default:
+                    data.pop(name, None)
+        return data
+
 
 class GCTiming(BaseTiming):
     type: Literal["gc"] = "gc"
@@ -33,6 +55,10 @@ class GCTiming(BaseTiming):
     runtime: Duration
     collected_count: int
     generation: int
+    # The number of collections this timing represents, when sampling
+    sample_weight: float = 1.0
+
+    omit_defaults = frozenset({"sample_weight"})
 
 
 class CollectionTiming(BaseTiming):
@@ -41,6 +67,24 @@ class CollectionTiming(BaseTiming):
     runtime: Duration
 
 
+class CollectionFileTiming(BaseTiming):
+    type: Literal["collection-file"] = "collection-file"
+
+    # Relative to the rootdir
+    path: str
+    kind: Literal["module", "conftest"]
+
+    import_time: Duration
+    # Generating the items of a module and its classes, excluding the import
+    collect_time: Duration
+    items: int
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def runtime(self) -> Duration:
+        return self.import_time + self.collect_time
+
+
 class WorkerTiming(BaseTiming):
     type: Literal["worker"] = "worker"
 
@@ -48,22 +92,207 @@ class WorkerTiming(BaseTiming):
     runtime: Duration | None = None
 
 
+class WriterTiming(BaseTiming):
+    type: Literal["writer"] = "writer"
+
+    events_written: int
+    events_delayed: int
+    events_dropped: int
+    blocked: Duration
+
+
+class MergeTiming(BaseTiming):
+    type: Literal["merge"] = "merge"
+
+    # The number of output files merged into the final output, including the master's
+    files_merged: int
+    runtime: Duration
+
+
+class OverheadTiming(BaseTiming):
+    type: Literal["overhead"] = "overhead"
+
+    # None for the total overhead of a worker
+    test_id: str | None
+
+    patching: Duration
+    recording: Duration
+    serialization: Duration
+    bookkeeping: Duration
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def runtime(self) -> Duration:
+        return self.patching + self.recording + self.serialization + self.bookkeeping
+
+
+class HookTiming(BaseTiming):
+    type: Literal["hook"] = "hook"
+
+    # None for hooks called outside of tests, summed for the session
+    test_id: str | None
+    hook: str
+    plugin: str
+
+    calls: int
+    # Excluding the hook implementations called from this one
+    runtime: Duration
+
+
+class HistogramBucket(pydantic.BaseModel):
+    # Lower bound of the bucket. Buckets are log-scaled, with four buckets per power of two.
+    lower_ns: int
+    count: int
+
+
+class AggregateTiming(BaseTiming):
+    type: Literal["aggregate"] = "aggregate"
+
+    # The type of the aggregated timings: mock, django-sql or gc
+    source: str
+    name: str
+    test_id: str | None
+    fixture_name: str | None
+    sql_hash: str | None = None
+    sql: str | None = None
+
+    count: int
+    total: Duration
+    min: Duration
+    max: Duration
+    histogram: list[HistogramBucket]
+
+
+class AllocationSite(pydantic.BaseModel):
+    filename: str
+    lineno: int
+    # Net bytes and blocks allocated at this line
+    size_bytes: int
+    count: int
+
+
+class MemoryTiming(BaseTiming):
+    type: Literal["memory"] = "memory"
+
+    test_id: str | None
+    fixture_name: str | None
+    phase: Literal["setup", "call", "teardown"]
+
+    # Highest traced memory, above the memory traced when the phase started
+    peak_bytes: int
+    # Traced memory when the phase finished, minus when it started
+    delta_bytes: int
+    top_allocations: list[AllocationSite]
+
+
+class ProfileStack(pydantic.BaseModel):
+    # Semicolon separated frames, outermost first
+    stack: str
+    count: int
+
+
+class ProfileTiming(BaseTiming):
+    type: Literal["profile"] = "profile"
+
+    test_id: str | None
+    fixture_name: str | None
+
+    interval: Duration
+    samples: int
+    stacks: list[ProfileStack]
+
+
 class BaseMockTiming(BaseTiming, abc.ABC):
     name: str
     test_id: str | None
     fixture_name: str | None
 
     runtime: Duration
+    # The number of calls this timing represents, when sampling
+    sample_weight: float = 1.0
+
+    omit_defaults = frozenset({"sample_weight"})
 
 
 class MockTiming(BaseMockTiming):
     type: Literal["mock"] = "mock"
+    # The call raised an exception, with --scrutinize-func-backend=monitoring
+    exception: bool = False
+
+    omit_defaults = frozenset({"sample_weight", "exception"})
 
 
 class DjangoSQLTiming(BaseMockTiming):
     type: Literal["django-sql"] = "django-sql"
     sql_hash: str
     sql: str | None
+    # Hash of the normalized query, with --scrutinize-django-sql-fingerprint
+    fingerprint: str | None = None
+    # The database alias, except Django's default one, and the number of rows affected
+    # when the driver reports it
+    alias: str | None = None
+    row_count: int | None = None
+    executemany: bool = False
+
+    omit_defaults = frozenset(
+        {"sample_weight", "fingerprint", "alias", "row_count", "executemany"}
+    )
+
+
+class DjangoSQLExplainTiming(BaseTiming):
+    type: Literal["django-sql-explain"] = "django-sql-explain"
+
+    # Where the slowest execution of the query ran
+    test_id: str | None
+    fixture_name: str | None
+
+    sql_hash: str
+    sql: str
+    alias: str
+    # The parameters of the slowest execution, which the query was explained with
+    params: str
+    runtime: Duration
+
+    plan: str | None
+    # Set instead of the plan when the query could not be explained
+    error: str | None = None
+
+
+class RepeatedSQLTiming(BaseTiming):
+    type: Literal["repeated-sql"] = "repeated-sql"
+
+    test_id: str | None
+    fixture_name: str | None
+    fingerprint: str
+    # The normalized query
+    sql: str
+
+    count: int
+    runtime: Duration
+
+
+NetworkOperation = Literal["dns", "connect", "http"]
+
+
+class NetworkTiming(BaseTiming):
+    type: Literal["network"] = "network"
+
+    # Where the call was made, or where the socket was connected
+    test_id: str | None
+    fixture_name: str | None
+    operation: NetworkOperation
+    host: str | None
+    port: int | None
+    # The method and URL of http requests
+    request: str | None = None
+
+    # connect: sent and received over the socket until it was closed. http: the request
+    # line, headers and body.
+    bytes_sent: int | None = None
+    bytes_received: int | None = None
+    # connect: the time to connect. http: the time until the response headers were read
+    runtime: Duration
+    error: str | None = None
 
 
 class TestTiming(BaseTiming):
@@ -76,6 +305,27 @@ class TestTiming(BaseTiming):
     runtime: Duration
 
 
+class TestCostTiming(BaseTiming):
+    type: Literal["test-cost"] = "test-cost"
+
+    name: str
+    test_id: str
+
+    # Inclusive durations of each phase, including the fixtures set up or torn down in it
+    setup: Duration
+    call: Duration
+    teardown: Duration
+
+    # Fixtures that were set up for this test, and those that were already cached
+    fixtures_created: list[str]
+    fixtures_cached: list[str]
+    # Amortized share of the setup of each shared (non-function scoped) fixture
+    shared_fixtures: dict[str, Duration]
+
+    # All phases, with shared fixtures counted by their share rather than their duration
+    total: Duration
+
+
 class FixtureTiming(BaseTiming):
     type: Literal["fixture"] = "fixture"
 
@@ -83,6 +333,9 @@ class FixtureTiming(BaseTiming):
     short_name: str
     test_id: str | None
     scope: str
+    # The name tests request the fixture by, and the node ID it's defined in
+    argname: str | None = None
+    baseid: str | None = None
 
     setup: Duration
     teardown: Duration | None
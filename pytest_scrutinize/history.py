@@ -0,0 +1,274 @@
+import collections
+import contextlib
+import sqlite3
+import statistics
+import typing
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+from . import TimingAdapter
+from .data import AggregateTiming, DjangoSQLTiming, FixtureTiming, TestTiming
+from .report import iter_timings
+from .timer import now
+
+# Runs are ingested into a SQLite database, one row per test, fixture and (test, SQL hash) in
+# the run. Timings are summed while the output file is streamed, so ingesting a run only
+# reads that run and only writes its own rows.
+#
+# A run is compared to the runs ingested before it. A value is a regression when it is
+# above the baseline mean by more than `threshold` standard deviations, and by more than a
+# minimum relative and absolute amount so that noise in very fast tests is ignored. Query
+# counts are usually deterministic, so any increase over the baseline maximum is flagged.
+
+SCHEMA = """
+create table if not exists runs (
+    id integer primary key,
+    name text not null,
+    path text not null,
+    ingested_at text not null
+);
+create table if not exists tests (
+    run_id integer not null references runs (id),
+    test_id text not null,
+    runtime_ns integer not null,
+    primary key (test_id, run_id)
+);
+create table if not exists fixtures (
+    run_id integer not null references runs (id),
+    name text not null,
+    count integer not null,
+    setup_ns integer not null,
+    teardown_ns integer not null,
+    primary key (name, run_id)
+);
+create table if not exists queries (
+    run_id integer not null references runs (id),
+    test_id text not null,
+    sql_hash text not null,
+    count real not null,
+    runtime_ns real not null,
+    primary key (test_id, sql_hash, run_id)
+);
+create index if not exists queries_sql_hash on queries (sql_hash, run_id);
+create index if not exists tests_run_id on tests (run_id);
+create index if not exists fixtures_run_id on fixtures (run_id);
+create index if not exists queries_run_id on queries (run_id);
+"""
+
+_HISTORY_TYPES = frozenset({b"test", b"fixture", b"django-sql", b"aggregate"})
+
+# Minimum change in duration that is considered a regression
+MIN_RELATIVE_CHANGE = 0.1
+MIN_ABSOLUTE_CHANGE_NS = 1_000_000
+# Number of previous runs needed to detect a duration regression
+MIN_BASELINE_RUNS = 3
+
+
+@dataclass
+class RunTotals:
+    tests: collections.Counter[str] = field(default_factory=collections.Counter)
+    fixture_counts: collections.Counter[str] = field(
+        default_factory=collections.Counter
+    )
+    fixture_setup_ns: collections.Counter[str] = field(
+        default_factory=collections.Counter
+    )
+    fixture_teardown_ns: collections.Counter[str] = field(
+        default_factory=collections.Counter
+    )
+    # Keyed by (test_id, sql_hash)
+    query_counts: collections.Counter[tuple[str, str]] = field(
+        default_factory=collections.Counter
+    )
+    query_runtime_ns: collections.Counter[tuple[str, str]] = field(
+        default_factory=collections.Counter
+    )
+
+    def add(self, timing: typing.Any):
+        match timing:
+            case TestTiming():
+                self.tests[timing.test_id] += timing.runtime.as_nanoseconds
+            case FixtureTiming():
+                self.fixture_counts[timing.name] += 1
+                self.fixture_setup_ns[timing.name] += timing.setup.as_nanoseconds
+                if timing.teardown is not None:
+                    self.fixture_teardown_ns[timing.name] += (
+                        timing.teardown.as_nanoseconds
+                    )
+            case DjangoSQLTiming(test_id=str(test_id)):
+                key = (test_id, timing.sql_hash)
+                self.query_counts[key] += timing.sample_weight
+                self.query_runtime_ns[key] += (
+                    timing.runtime.as_nanoseconds * timing.sample_weight
+                )
+            case AggregateTiming(
+                source="django-sql", test_id=str(test_id), sql_hash=str(sql_hash)
+            ):
+                key = (test_id, sql_hash)
+                self.query_counts[key] += timing.count
+                self.query_runtime_ns[key] += timing.total.as_nanoseconds
+
+    @classmethod
+    def from_output(cls, path: Path) -> "RunTotals":
+        totals = cls()
+        for timing in iter_timings(path, types=_HISTORY_TYPES):
+            totals.add(TimingAdapter.validate_python(timing))
+        return totals
+
+
+@dataclass
+class Regression:
+    kind: str
+    key: str
+    baseline: float
+    current: float
+
+    @property
+    def change(self) -> float:
+        if self.baseline == 0:
+            return float("inf")
+        return self.current / self.baseline - 1
+
+
+@dataclass
+class HistoryStore:
+    path: Path
+    connection: sqlite3.Connection = field(init=False)
+
+    def __post_init__(self):
+        self.connection = sqlite3.connect(self.path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def ingest(self, output_path: Path, name: str | None = None) -> int:
+        totals = RunTotals.from_output(output_path)
+        ingested_at = now()
+        with self.connection:
+            cursor = self.connection.execute(
+                "insert into runs (name, path, ingested_at) values (?, ?, ?)",
+                (
+                    name or ingested_at.isoformat(),
+                    str(output_path),
+                    ingested_at.isoformat(),
+                ),
+            )
+            run_id = typing.cast(int, cursor.lastrowid)
+            self.connection.executemany(
+                "insert into tests values (?, ?, ?)",
+                ((run_id, test_id, ns) for test_id, ns in totals.tests.items()),
+            )
+            self.connection.executemany(
+                "insert into fixtures values (?, ?, ?, ?, ?)",
+                (
+                    (
+                        run_id,
+                        fixture,
+                        count,
+                        totals.fixture_setup_ns[fixture],
+                        totals.fixture_teardown_ns[fixture],
+                    )
+                    for fixture, count in totals.fixture_counts.items()
+                ),
+            )
+            self.connection.executemany(
+                "insert into queries values (?, ?, ?, ?, ?)",
+                (
+                    (run_id, *key, count, totals.query_runtime_ns[key])
+                    for key, count in totals.query_counts.items()
+                ),
+            )
+        return run_id
+
+    def runs(self) -> list[tuple[int, str, datetime]]:
+        return [
+            (run_id, name, datetime.fromisoformat(ingested_at))
+            for run_id, name, ingested_at in self.connection.execute(
+                "select id, name, ingested_at from runs order by id"
+            )
+        ]
+
+    def _values(self, query: str, run_ids: list[int]) -> dict[str, dict[int, float]]:
+        placeholders = ",".join("?" * len(run_ids))
+        values: dict[str, dict[int, float]] = collections.defaultdict(dict)
+        for key, run_id, value in self.connection.execute(
+            query.format(runs=placeholders), run_ids
+        ):
+            values[key][run_id] = value
+        return values
+
+    def metrics(self, run_ids: list[int]) -> dict[str, dict[str, dict[int, float]]]:
+        """Returns {kind: {key: {run_id: value}}} for the given runs"""
+        return {
+            "test": self._values(
+                "select test_id, run_id, runtime_ns from tests "
+                "where run_id in ({runs})",
+                run_ids,
+            ),
+            "fixture-setup": self._values(
+                "select name, run_id, setup_ns * 1.0 / count from fixtures "
+                "where run_id in ({runs})",
+                run_ids,
+            ),
+            "fixture-teardown": self._values(
+                "select name, run_id, teardown_ns * 1.0 / count from fixtures "
+                "where run_id in ({runs}) and teardown_ns > 0",
+                run_ids,
+            ),
+            "queries": self._values(
+                "select test_id, run_id, sum(count) from queries "
+                "where run_id in ({runs}) group by test_id, run_id",
+                run_ids,
+            ),
+        }
+
+    def compare(
+        self, run_id: int | None = None, baseline_runs: int = 10, threshold: float = 3
+    ) -> list[Regression]:
+        """Compares a run, by default the latest, to the runs ingested before it"""
+        run_ids = [
+            existing_id
+            for existing_id, _, _ in self.runs()
+            if run_id is None or existing_id <= run_id
+        ]
+        if not run_ids:
+            raise ValueError("No runs have been ingested")
+        current_id, baseline_ids = run_ids[-1], run_ids[:-1][-baseline_runs:]
+        if not baseline_ids:
+            return []
+
+        regressions = []
+        for kind, keys in self.metrics([*baseline_ids, current_id]).items():
+            for key, values in keys.items():
+                if (current := values.pop(current_id, None)) is None or not values:
+                    continue
+                if is_regression(kind, list(values.values()), current, threshold):
+                    baseline = statistics.fmean(values.values())
+                    regressions.append(Regression(kind, key, baseline, current))
+        return sorted(regressions, key=lambda r: (r.kind, -r.change))
+
+
+def is_regression(
+    kind: str, baseline: list[float], current: float, threshold: float
+) -> bool:
+    if kind == "queries":
+        return current > max(baseline)
+    if len(baseline) < MIN_BASELINE_RUNS:
+        return False
+
+    mean = statistics.fmean(baseline)
+    if current - mean < max(MIN_ABSOLUTE_CHANGE_NS, mean * MIN_RELATIVE_CHANGE):
+        return False
+    stdev = statistics.stdev(baseline)
+    return stdev == 0 or (current - mean) / stdev > threshold
+
+
+@contextlib.contextmanager
+def open_store(path: Path) -> typing.Generator[HistoryStore, None, None]:
+    store = HistoryStore(path)
+    try:
+        yield store
+    finally:
+        store.close()
@@ -0,0 +1,181 @@
+import collections
+import contextlib
+import functools
+import typing
+from dataclasses import dataclass, field
+
+import pluggy
+
+from .data import HookTiming
+from .timer import Duration, perf_ns
+
+if typing.TYPE_CHECKING:
+    from .io import TimingsOutputFile
+
+# With `--scrutinize-hooks`, the function of every hook implementation is replaced with a
+# timed wrapper when its plugin is registered (`pytest_plugin_registered` is a historic hook,
+# so plugins registered before this one are included). Hook implementations call other hooks
+# (e.g. `pytest_runtest_protocol` calls `pytest_runtest_setup`), so each implementation
+# records its own time, excluding the hook implementations called from it.
+#
+# Hook wrappers run in two steps, before and after the implementations they wrap, and both
+# are counted as one call. The times are summed per hook and plugin for each test, and the
+# hooks called outside of tests (e.g. during collection) are summed for the session.
+#
+# The test function and fixtures run inside pytest's own `pytest_pyfunc_call` and
+# `pytest_fixture_setup` implementations, so their time is attributed to the `python` and
+# `fixtures` plugins.
+#
+# This plugin's own hooks are timed too, so their time isn't counted in the implementations
+# that call them. The end of its `pytest_runtest_protocol` wrapper runs after the test's
+# timings are written, so it is counted for the session.
+
+HookKey = tuple[str, str]
+
+
+def plugin_name(hook_impl: pluggy.HookImpl) -> str:
+    # Plugins registered without a name are named after their ID
+    if hook_impl.plugin_name.isdigit():
+        plugin_type = type(hook_impl.plugin)
+        return f"{plugin_type.__module__}.{plugin_type.__qualname__}"
+    return hook_impl.plugin_name
+
+
+@dataclass
+class HookTracer:
+    output: "TimingsOutputFile"
+    enabled: bool = False
+
+    # Hook calls and their time since the current test started, or outside of tests
+    current: collections.Counter[HookKey] | None = None
+    current_calls: collections.Counter[HookKey] | None = None
+    session: collections.Counter[HookKey] = field(default_factory=collections.Counter)
+    session_calls: collections.Counter[HookKey] = field(
+        default_factory=collections.Counter
+    )
+
+    # Time spent in the hook implementations called by each running implementation
+    _children_ns: list[int] = field(default_factory=list)
+    _originals: dict[pluggy.HookImpl, typing.Callable[..., typing.Any]] = field(
+        default_factory=dict
+    )
+
+    def trace_plugin(self, manager: pluggy.PluginManager, plugin: object):
+        if not self.enabled:
+            return
+        for hook_caller in manager.get_hookcallers(plugin) or []:
+            for hook_impl in hook_caller.get_hookimpls():
+                if hook_impl.plugin is plugin and hook_impl not in self._originals:
+                    self._originals[hook_impl] = hook_impl.function
+                    hook_impl.function = self._wrap(hook_caller.name, hook_impl)
+
+    @contextlib.contextmanager
+    def trace(self) -> typing.Generator[None, None, None]:
+        try:
+            yield
+        finally:
+            if self.enabled:
+                self.enabled = False
+                for hook_impl, function in self._originals.items():
+                    hook_impl.function = function
+                self._originals = {}
+                for timing in self._build_timings(
+                    None, self.session, self.session_calls
+                ):
+                    self.output.add_timing(timing)
+
+    def start_test(self):
+        if self.enabled:
+            self.current = collections.Counter()
+            self.current_calls = collections.Counter()
+
+    def finish_test(self, test_id: str):
+        if self.current is None or self.current_calls is None:
+            return
+        timings = self._build_timings(test_id, self.current, self.current_calls)
+        self.current = self.current_calls = None
+        for timing in timings:
+            self.output.add_timing(timing)
+
+    def _add(self, key: HookKey, elapsed_ns: int, calls: int):
+        if self.current is not None and self.current_calls is not None:
+            self.current[key] += elapsed_ns
+            self.current_calls[key] += calls
+        else:
+            self.session[key] += elapsed_ns
+            self.session_calls[key] += calls
+
+    def _step(
+        self,
+        key: HookKey,
+        calls: int,
+        function: typing.Callable[..., typing.Any],
+        *args: typing.Any,
+    ) -> typing.Any:
+        __tracebackhide__ = True
+        self._children_ns.append(0)
+        start = perf_ns()
+        try:
+            return function(*args)
+        finally:
+            elapsed_ns = perf_ns() - start
+            self._add(key, elapsed_ns - self._children_ns.pop(), calls)
+            if self._children_ns:
+                self._children_ns[-1] += elapsed_ns
+
+    def _wrap(
+        self, hook_name: str, hook_impl: pluggy.HookImpl
+    ) -> typing.Callable[..., typing.Any]:
+        key = (hook_name, plugin_name(hook_impl))
+        function = hook_impl.function
+        step = self._step
+
+        if not (hook_impl.hookwrapper or hook_impl.wrapper):
+
+            @functools.wraps(function)
+            def timed_impl(*args):
+                __tracebackhide__ = True
+                return step(key, 1, function, *args)
+
+            return timed_impl
+
+        @functools.wraps(function)
+        def timed_wrapper(*args):
+            __tracebackhide__ = True
+            generator = function(*args)
+            value = step(key, 1, next, generator)
+            while True:
+                try:
+                    sent = yield value
+                except GeneratorExit:
+                    generator.close()
+                    raise
+                except BaseException as exc:
+                    try:
+                        value = step(key, 0, generator.throw, exc)
+                    except StopIteration as stop:
+                        return stop.value
+                else:
+                    try:
+                        value = step(key, 0, generator.send, sent)
+                    except StopIteration as stop:
+                        return stop.value
+
+        return timed_wrapper
+
+    @staticmethod
+    def _build_timings(
+        test_id: str | None,
+        runtimes: collections.Counter[HookKey],
+        calls: collections.Counter[HookKey],
+    ) -> list[HookTiming]:
+        return [
+            HookTiming(
+                test_id=test_id,
+                hook=hook,
+                plugin=plugin,
+                calls=calls[hook, plugin],
+                runtime=Duration(as_nanoseconds=max(runtime_ns, 0)),
+            )
+            for (hook, plugin), runtime_ns in runtimes.items()
+        ]
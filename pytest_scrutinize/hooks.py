@@ -0,0 +1,13 @@
+import pytest
+
+
+@pytest.hookspec
+def pytest_scrutinize_timing(batch: bytes, config: pytest.Config) -> None:
+    """Called with every batch of timings written by this process.
+
+    The batch contains one timing per line, serialized as JSON in the same format as the
+    output file. With pytest-xdist, each worker dispatches its own timings.
+
+    This is called from a dedicated thread rather than the test thread, so implementations
+    must be thread-safe. Batches are dropped if implementations cannot keep up.
+    """
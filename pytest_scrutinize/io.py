@@ -1,25 +1,150 @@
+import abc
 import contextlib
 import gzip
+import queue
+import shutil
+import threading
 import typing
 from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Literal
+
+from pytest_scrutinize.data import WriterTiming
+from pytest_scrutinize.records import TimingRecord
+from pytest_scrutinize.timer import measure_time, Duration
 
 if typing.TYPE_CHECKING:
     from pytest_scrutinize.data import BaseTiming
 
+OutputFormat = Literal["jsonl", "parquet"]
+
+OUTPUT_SUFFIXES: dict[OutputFormat, str] = {
+    "jsonl": ".jsonl.gz",
+    "parquet": ".parquet",
+}
+
+_COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class TimingsSink(typing.Protocol):
+    def add_timing(self, timing: "BaseTiming | TimingRecord"): ...
+
+
+def serialize_timings(timings: list["BaseTiming"]) -> bytes:
+    """Serializes timings as JSON lines"""
+    return "".join(f"{timing.model_dump_json()}\n" for timing in timings).encode()
+
+
+class TimingsWriter(abc.ABC):
+    @abc.abstractmethod
+    def write_timings(self, timings: list["BaseTiming"]): ...
+
+    def write_serialized(self, data: bytes, timings: list["BaseTiming"]):
+        """Write timings that have already been serialized with `serialize_timings`"""
+        self.write_timings(timings)
+
+
+class FileTimingsWriter(TimingsWriter):
+    """Writes an output file, which other output files can be merged into"""
+
+    @abc.abstractmethod
+    def copy_from(self, path: Path):
+        """Append the contents of another output file, in the same format"""
+
+
+class JSONLTimingsWriter(FileTimingsWriter):
+    # The output is a series of gzip members. A file made of concatenated gzip members is
+    # itself a valid gzip file, which `gzip.open` and DuckDB read as a single stream. This
+    # lets other output files be appended byte-for-byte, without decompressing them.
+
+    def __init__(self, fd: typing.BinaryIO, compresslevel: int = 6):
+        self.fd = fd
+        self.compresslevel = compresslevel
+        self.member: gzip.GzipFile | None = None
+
+    def _get_member(self) -> gzip.GzipFile:
+        if self.member is None:
+            self.member = gzip.GzipFile(
+                fileobj=self.fd, mode="wb", compresslevel=self.compresslevel
+            )
+        return self.member
+
+    def close_member(self):
+        if self.member is not None:
+            self.member.close()
+            self.member = None
+
+    def write_timings(self, timings: list["BaseTiming"]):
+        self.write_serialized(serialize_timings(timings), timings)
+
+    def write_serialized(self, data: bytes, timings: list["BaseTiming"]):
+        self._get_member().write(data)
+
+    def append_member(self, data: bytes):
+        """Append a complete gzip member, such as one created with `gzip.compress`"""
+        self.close_member()
+        self.fd.write(data)
+
+    def copy_from(self, path: Path):
+        self.close_member()
+        with path.open("rb") as input_fd:
+            shutil.copyfileobj(fsrc=input_fd, fdst=self.fd, length=_COPY_BUFFER_SIZE)
+
+
+@contextlib.contextmanager
+def open_jsonl_writer(path: Path) -> typing.Generator[FileTimingsWriter, None, None]:
+    with path.open("wb") as fd:
+        writer = JSONLTimingsWriter(fd)
+        try:
+            yield writer
+        finally:
+            if fd.tell() == 0:
+                # Always write a valid, if empty, gzip file
+                writer._get_member()
+            writer.close_member()
+
+
+@dataclass
+class WriterStats:
+    events_written: int = 0
+    # Events that had to wait for space in the background queue
+    events_delayed: int = 0
+    # Events that could not be written because the background writer failed
+    events_dropped: int = 0
+    blocked_ns: int = 0
+
+
+_STOP = object()
+
 
 @dataclass
 class TimingsOutputFile:
     path: Path
-    buffer: list["BaseTiming"] = field(default_factory=list)
+    format: OutputFormat = "jsonl"
+    # If true, serialization and compression happens in a dedicated thread. Batches are
+    # handed over through a bounded queue: when it is full the caller blocks until the
+    # writer catches up.
+    background: bool = False
+    queue_size: int = 64
+
+    buffer: list["BaseTiming | TimingRecord"] = field(default_factory=list)
+    stats: WriterStats = field(default_factory=WriterStats)
+
+    writer: TimingsWriter | None = None
+    # Called with every batch of timings after it is written, serialized as JSON lines
+    on_batch: typing.Callable[[bytes], None] | None = None
 
-    fd: typing.TextIO | None = None
+    _queue: queue.Queue | None = None
+    _thread: threading.Thread | None = None
+    _error: BaseException | None = None
+    # Held while writing, as compressed timings can be appended from other threads
+    _lock: threading.Lock = field(default_factory=threading.Lock)
 
-    def add_timing(self, timing: "BaseTiming"):
+    def add_timing(self, timing: "BaseTiming | TimingRecord"):
         self.buffer.append(timing)
 
     def flush_buffer(self):
-        if self.fd is None:
+        if self.writer is None:
             raise RuntimeError("Output file not opened")
         # Get a reference to the buffer, then replace it with an
         # empty list. We do this because the GC callbacks _could_
@@ -27,27 +152,141 @@ class TimingsOutputFile:
         # write loop has finished.
         buffer = self.buffer
         self.buffer = []
-        for timing in buffer:
-            self.fd.write(timing.model_dump_json())
-            self.fd.write("\n")
+        if not buffer:
+            return
+
+        if self._queue is None:
+            self._write_batch(buffer)
+        else:
+            self._enqueue_batch(buffer)
+
+    def _write_batch(self, batch: list["BaseTiming | TimingRecord"]):
+        assert self.writer is not None
+        timings = [
+            timing.to_timing() if isinstance(timing, TimingRecord) else timing
+            for timing in batch
+        ]
+        if self.on_batch is None:
+            with self._lock:
+                self.writer.write_timings(timings)
+        else:
+            data = serialize_timings(timings)
+            with self._lock:
+                self.writer.write_serialized(data, timings)
+            self.on_batch(data)
+        self.stats.events_written += len(batch)
+
+    def append_compressed(self, data: bytes):
+        """Append gzip compressed JSON lines, which may be called from any thread"""
+        with self._lock:
+            if not isinstance(self.writer, JSONLTimingsWriter):
+                raise RuntimeError("Output file not opened for JSON lines")
+            self.writer.append_member(data)
+
+    def _enqueue_batch(self, batch: list["BaseTiming | TimingRecord"]):
+        assert self._queue is not None
+        if self._error is not None:
+            self.stats.events_dropped += len(batch)
+            return
+
+        try:
+            self._queue.put_nowait(batch)
+        except queue.Full:
+            self.stats.events_delayed += len(batch)
+            with measure_time() as timer:
+                self._queue.put(batch)
+            self.stats.blocked_ns += timer.elapsed.as_nanoseconds
+
+    def _run_writer(self):
+        assert self._queue is not None
+        stopping = False
+        while not stopping:
+            batch = self._queue.get()
+            if batch is _STOP:
+                break
+            # Coalesce anything else that is already waiting into a single write
+            while True:
+                try:
+                    next_batch = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if next_batch is _STOP:
+                    stopping = True
+                    break
+                batch.extend(next_batch)
+
+            if self._error is not None:
+                self.stats.events_dropped += len(batch)
+                continue
+            try:
+                self._write_batch(batch)
+            except BaseException as e:
+                # Keep draining the queue so that producers never block forever,
+                # and surface the error when the writer is closed.
+                self._error = e
+                self.stats.events_dropped += len(batch)
+
+    @contextlib.contextmanager
+    def _background_writer(self) -> typing.Generator[None, None, None]:
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._thread = threading.Thread(
+            target=self._run_writer, name="scrutinize-writer", daemon=True
+        )
+        self._thread.start()
+        try:
+            yield
+        finally:
+            self.flush_buffer()
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._queue, self._thread = None, None
+
+        if self._error is not None:
+            raise RuntimeError("Background writer failed") from self._error
+
+        self.add_timing(
+            WriterTiming(
+                events_written=self.stats.events_written,
+                events_delayed=self.stats.events_delayed,
+                events_dropped=self.stats.events_dropped,
+                blocked=Duration(as_nanoseconds=self.stats.blocked_ns),
+            )
+        )
+
+    def _open_writer(self) -> typing.ContextManager[TimingsWriter]:
+        match self.format:
+            case "jsonl":
+                return open_jsonl_writer(self.path)
+            case "parquet":
+                from .parquet import open_parquet_writer
+
+                return open_parquet_writer(self.path)
+            case _:
+                raise ValueError(f"Unknown output format {self.format}")
 
     @contextlib.contextmanager
-    def initialize_writer(self) -> typing.Generator[typing.TextIO, None, None]:
-        if self.fd is not None:
+    def initialize_writer(self) -> typing.Generator[TimingsWriter, None, None]:
+        if self.writer is not None:
             raise RuntimeError("Output file already opened")
 
-        with gzip.open(self.path, mode="wt", compresslevel=6) as fd:
-            self.fd = fd
+        with self._open_writer() as writer:
+            self.writer = writer
             try:
-                yield fd
+                if self.background:
+                    with self._background_writer():
+                        yield writer
+                else:
+                    yield writer
             finally:
                 self.flush_buffer()
-                self.fd = None
+                self.writer = None
 
     @contextlib.contextmanager
     def get_reader(self) -> typing.Generator[typing.TextIO, None, None]:
-        if self.fd is not None:
+        if self.writer is not None:
             raise RuntimeError("Output file not closed")
+        if self.format != "jsonl":
+            raise RuntimeError(f"Cannot read {self.format} output as text")
 
         with gzip.open(self.path, mode="rt") as fd:
             yield fd
@@ -0,0 +1,191 @@
+import contextlib
+import tracemalloc
+import typing
+import zlib
+from dataclasses import dataclass, field
+from typing import Literal
+
+from .data import AllocationSite, MemoryTiming
+
+if typing.TYPE_CHECKING:
+    from .io import TimingsOutputFile
+
+# With `--scrutinize-memory`, allocations are traced with tracemalloc while the session runs.
+# Each test call and fixture setup or teardown records the peak memory above what was
+# allocated when it started, and the net change once it finished.
+#
+# tracemalloc has a single peak counter, which is reset when a block starts. A fixture can
+# request another fixture while it is being set up (`request.getfixturevalue`), so blocks are
+# kept on a stack: before a nested block resets the peak, the peak so far is saved on the
+# outer block, and the outer block's peak includes the nested block's once it finishes.
+#
+# Tracing every allocation is expensive: allocation-heavy code ran over 10x slower with one
+# frame per traceback and over 20x slower with ten in a micro-benchmark, and
+# `--scrutinize-memory-frames` controls how many frames are stored. The top allocation sites
+# are found by comparing snapshots taken before and after each block, which takes time
+# proportional to the number of live traced blocks (~2s for 200k, mostly comparing). Snapshots
+# are taken outside of the measured durations, and `--scrutinize-memory-top=0` disables them.
+#
+# Snapshots are mostly untraced memory, but filtering or comparing them creates Python objects
+# for every trace, which takes megabytes with many live blocks. Snapshots are compared without
+# being filtered, the traced memory a nested block's snapshot holds is subtracted from the
+# peak it reports to the outer block, and the peak is reset after comparing so that isn't
+# counted in the outer block either.
+#
+# With `--scrutinize-memory-sample=N`, tracing is only started for one in N tests, picked by
+# the CRC32 of their ID so every run traces the same ones. Fixtures are only measured while a
+# sampled test sets them up or tears them down.
+
+MemoryPhase = Literal["setup", "call", "teardown"]
+
+# Allocation sites that are not reported
+_EXCLUDED_FILES = frozenset(
+    {
+        tracemalloc.__file__,
+        __file__,
+        "<frozen importlib._bootstrap>",
+        "<frozen importlib._bootstrap_external>",
+    }
+)
+
+
+@dataclass
+class _Block:
+    start_bytes: int
+    # Highest traced memory seen by this block so far, before the peak was last reset
+    peak_bytes: int
+    snapshot: tracemalloc.Snapshot | None
+    # Traced memory held by the snapshot, included in `start_bytes`
+    snapshot_bytes: int = 0
+
+
+@dataclass
+class MemoryTracker:
+    output: "TimingsOutputFile"
+    enabled: bool = False
+    top: int = 5
+    frames: int = 1
+    # Trace one in this many tests
+    sample: int = 1
+
+    _stack: list[_Block] = field(default_factory=list)
+
+    @contextlib.contextmanager
+    def trace(self) -> typing.Generator[None, None, None]:
+        # When sampling, each sampled test is traced on its own by `trace_test`
+        if not self.enabled or self.sample > 1:
+            yield
+            return
+
+        with self._tracing():
+            yield
+
+    @contextlib.contextmanager
+    def trace_test(self, test_id: str) -> typing.Generator[None, None, None]:
+        if not self.enabled or self.sample == 1 or not self.is_sampled(test_id):
+            yield
+            return
+
+        with self._tracing():
+            yield
+
+    def is_sampled(self, test_id: str) -> bool:
+        return zlib.crc32(test_id.encode()) % self.sample == 0
+
+    @contextlib.contextmanager
+    def _tracing(self) -> typing.Generator[None, None, None]:
+        tracemalloc.start(self.frames)
+        try:
+            yield
+        finally:
+            tracemalloc.stop()
+            self._stack = []
+
+    def start(self) -> _Block | None:
+        if not self.enabled or not tracemalloc.is_tracing():
+            return None
+
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            outer = self._stack[-1]
+            outer.peak_bytes = max(outer.peak_bytes, peak)
+        snapshot = None
+        snapshot_bytes = 0
+        if self.top:
+            snapshot = tracemalloc.take_snapshot()
+            snapshot_bytes = max(tracemalloc.get_traced_memory()[0] - current, 0)
+            current += snapshot_bytes
+        tracemalloc.reset_peak()
+        block = _Block(
+            start_bytes=current,
+            peak_bytes=current,
+            snapshot=snapshot,
+            snapshot_bytes=snapshot_bytes,
+        )
+        self._stack.append(block)
+        return block
+
+    def _top_allocations(self, block: _Block) -> list[AllocationSite]:
+        if block.snapshot is None:
+            return []
+        # Sorted by the absolute size difference, largest first
+        statistics = [
+            stat
+            for stat in tracemalloc.take_snapshot().compare_to(block.snapshot, "lineno")
+            if stat.size_diff > 0 and stat.traceback[0].filename not in _EXCLUDED_FILES
+        ]
+        return [
+            AllocationSite(
+                filename=stat.traceback[0].filename,
+                lineno=stat.traceback[0].lineno,
+                size_bytes=stat.size_diff,
+                count=stat.count_diff,
+            )
+            for stat in statistics[: self.top]
+        ]
+
+    def finish(
+        self,
+        block: _Block | None,
+        test_id: str | None,
+        fixture_name: str | None,
+        phase: MemoryPhase,
+    ):
+        if block is None or not tracemalloc.is_tracing():
+            return
+
+        current, peak = tracemalloc.get_traced_memory()
+        block.peak_bytes = max(block.peak_bytes, peak)
+        while self._stack and self._stack.pop() is not block:
+            pass
+        if self._stack:
+            outer = self._stack[-1]
+            outer.peak_bytes = max(
+                outer.peak_bytes, block.peak_bytes - block.snapshot_bytes
+            )
+
+        top_allocations = self._top_allocations(block)
+        block.snapshot = None
+        # Don't count the snapshots in the outer block's peak
+        tracemalloc.reset_peak()
+
+        self.output.add_timing(
+            MemoryTiming(
+                test_id=test_id,
+                fixture_name=fixture_name,
+                phase=phase,
+                peak_bytes=block.peak_bytes - block.start_bytes,
+                delta_bytes=current - block.start_bytes,
+                top_allocations=top_allocations,
+            )
+        )
+
+    @contextlib.contextmanager
+    def measure(
+        self, test_id: str | None, fixture_name: str | None, phase: MemoryPhase
+    ) -> typing.Generator[None, None, None]:
+        block = self.start()
+        try:
+            yield
+        finally:
+            self.finish(block, test_id=test_id, fixture_name=fixture_name, phase=phase)
@@ -1,19 +1,37 @@
 import contextlib
+import functools
+import inspect
 import pkgutil
 from dataclasses import dataclass, field
 from typing import Any, Callable, Self, Literal
 from unittest import mock
-import hashlib
 import pydantic
 
-from pytest_scrutinize.io import TimingsOutputFile
-from pytest_scrutinize.timer import measure_time, Duration
-from pytest_scrutinize.data import MockTiming, DjangoSQLTiming, BaseMockTiming
+from pytest_scrutinize.io import TimingsSink
+from pytest_scrutinize.monitoring import MonitoringRecorder
+from pytest_scrutinize.overhead import OverheadTracker
+from pytest_scrutinize.timer import perf_ns, process_ns, thread_ns
+from pytest_scrutinize.records import MockRecord, DjangoSQLRecord
+from pytest_scrutinize.scope import Scope, enter_scope, get_scope
+from pytest_scrutinize.sql import (
+    RepeatedQueryDetector,
+    SlowQueryTracker,
+    fingerprint_query,
+)
+
+PatchMode = Literal["test", "session"]
+DjangoSQLMode = Literal[True, "query", "explain"]
+RecorderBackend = Literal["patch", "monitoring"]
+
+# `django.db.DEFAULT_DB_ALIAS`, without importing Django
+DEFAULT_DB_ALIAS = "default"
 
 
 class SingleMockRecorder(pydantic.BaseModel):
     name: str
+    mock_path: str
     mocked: Any
+    original_object: Any
     original_callable: Callable
 
     @classmethod
@@ -23,96 +41,211 @@ class SingleMockRecorder(pydantic.BaseModel):
         original_callable = getattr(original_object, attribute_name)
         mocked = mock.patch(mock_path, side_effect=None, autospec=True)
         return cls(
-            name=name, mocked=mocked, original_callable=original_callable, **kwargs
+            name=name,
+            mock_path=mock_path,
+            mocked=mocked,
+            original_object=original_object,
+            original_callable=original_callable,
+            **kwargs,
         )
 
     def record_timing(
         self,
         fixture_name: str | None,
-        elapsed: Duration,
+        elapsed_ns: int,
         test_id: str | None,
         *,
         args: tuple[Any, ...],
         kwargs: dict[str, Any],
-    ) -> BaseMockTiming:
-        return MockTiming(
-            fixture_name=fixture_name,
-            runtime=elapsed,
+    ) -> MockRecord:
+        return MockRecord(
             name=self.name,
             test_id=test_id,
+            fixture_name=fixture_name,
+            runtime_ns=elapsed_ns,
         )
 
     @contextlib.contextmanager
     def record_mock(
-        self, output: TimingsOutputFile, test_id: str | None, fixture_name: str | None
+        self,
+        output: TimingsSink,
+        test_id: str | None,
+        fixture_name: str | None,
+        overhead: OverheadTracker,
+        cpu: bool = False,
     ):
         if self.mocked.kwargs["side_effect"] is not None:
             raise RuntimeError(f"Recursive mock call for mock {self}")
 
+        scope = (test_id, fixture_name)
+        self.mocked.kwargs["side_effect"] = self.build_wrapper(
+            output, overhead, resolve_scope=lambda: scope, cpu=cpu
+        )
+        try:
+            with self.mocked:
+                yield
+        finally:
+            self.mocked.kwargs["side_effect"] = None
+
+    @contextlib.contextmanager
+    def patch_session(
+        self, output: TimingsSink, overhead: OverheadTracker, cpu: bool = False
+    ):
+        # Replace the attribute with a plain function for the whole session, which
+        # attributes each call to the scope that is current when it is made.
+        wrapper: Any = functools.wraps(self.original_callable)(
+            self.build_wrapper(output, overhead, resolve_scope=get_scope, cpu=cpu)
+        )
+        attribute_name = self.mock_path.rsplit(".", 1)[1]
+        raw_attribute = inspect.getattr_static(self.original_object, attribute_name)
+        if isinstance(raw_attribute, (staticmethod, classmethod)):
+            # `original_callable` is already bound, so must not be bound again
+            wrapper = staticmethod(wrapper)
+
+        with mock.patch(self.mock_path, new=wrapper):
+            yield
+
+    def build_wrapper(
+        self,
+        output: TimingsSink,
+        overhead: OverheadTracker,
+        resolve_scope: Callable[[], Scope | None],
+        cpu: bool = False,
+    ) -> Callable:
+        original_callable = self.original_callable
+        record_timing = self.record_timing
+
         def wrapped(*args, **kwargs):
-            with measure_time() as timer:
-                result = self.original_callable(*args, **kwargs)
+            # This is the hot path: avoid `measure_time()` and Pydantic models here.
+            scope = resolve_scope()
+            if scope is None:
+                return original_callable(*args, **kwargs)
+            start = perf_ns()
+            result = original_callable(*args, **kwargs)
+            elapsed_ns = perf_ns() - start
+            test_id, fixture_name = scope
             output.add_timing(
-                self.record_timing(
-                    fixture_name, timer.elapsed, test_id, args=args, kwargs=kwargs
+                record_timing(
+                    fixture_name, elapsed_ns, test_id, args=args, kwargs=kwargs
                 )
             )
             return result
 
-        self.mocked.kwargs["side_effect"] = wrapped
-        try:
-            with self.mocked:
-                yield
-        finally:
-            self.mocked.kwargs["side_effect"] = None
+        def wrapped_instrumented(*args, **kwargs):
+            # Also records the overhead and/or CPU time. The CPU clocks are read outside
+            # of the wall time measurement.
+            entered = perf_ns()
+            scope = resolve_scope()
+            if scope is None:
+                return original_callable(*args, **kwargs)
+            if cpu:
+                process_start, thread_start = process_ns(), thread_ns()
+            start = perf_ns()
+            result = original_callable(*args, **kwargs)
+            end = perf_ns()
+            test_id, fixture_name = scope
+            record = record_timing(
+                fixture_name, end - start, test_id, args=args, kwargs=kwargs
+            )
+            if cpu:
+                record.process_time_ns = process_ns() - process_start
+                record.thread_time_ns = thread_ns() - thread_start
+            output.add_timing(record)
+            if overhead.enabled:
+                overhead.add("recording", (start - entered) + (perf_ns() - end))
+            return result
+
+        return wrapped_instrumented if overhead.enabled or cpu else wrapped
 
 
 class DjangoSQLRecorder(SingleMockRecorder):
-    mode: Literal[True, "query"]
+    mode: DjangoSQLMode
+    executemany: bool = False
+    # A RepeatedQueryDetector, when queries are fingerprinted
+    repeats: Any = None
+    # A SlowQueryTracker, with --scrutinize-django-sql=explain
+    slow_queries: Any = None
 
     def record_timing(
         self,
         fixture_name: str | None,
-        elapsed: Duration,
+        elapsed_ns: int,
         test_id: str | None,
         *,
         args: tuple[Any, ...],
         kwargs: dict[str, Any],
-    ) -> DjangoSQLTiming:
-        # The django.db.backends.utils.CursorWrapper._execute function takes the
-        # SQL as the second argument (the first being `self`):
-        query: str | bytes = args[1]
-        query_str = query
-        if isinstance(query, str):
-            query = query.encode()
-        else:
-            query_str = query.decode()
-        sql_hash = hashlib.sha256(query, usedforsecurity=False).hexdigest()
-
-        sql = None
+    ) -> DjangoSQLRecord:
+        # The django.db.backends.utils.CursorWrapper._execute and _executemany functions
+        # take the SQL as the second argument (the first being `self`). The query is
+        # hashed when the record is written, but is fingerprinted now to count repeats.
+        cursor_wrapper, query = args[0], args[1]
+        fingerprint = None
+        if self.repeats is not None:
+            fingerprint, normalized = fingerprint_query(query)
+            self.repeats.add(test_id, fixture_name, fingerprint, normalized, elapsed_ns)
+        alias = cursor_wrapper.db.alias
+        if self.slow_queries is not None and not self.executemany:
+            self.slow_queries.add(
+                query, args[2], alias, elapsed_ns, test_id, fixture_name
+            )
+        # Recorded with the full query. DB-API drivers report -1 when the row count is
+        # unknown, e.g. for sqlite SELECTs.
+        row_count = -1
         if self.mode == "query":
-            # Include the full query here
-            sql = query_str
-        return DjangoSQLTiming(
-            fixture_name=fixture_name,
-            runtime=elapsed,
+            row_count = getattr(cursor_wrapper.cursor, "rowcount", -1)
+        return DjangoSQLRecord(
             name=self.name,
             test_id=test_id,
-            sql_hash=sql_hash,
-            sql=sql,
+            fixture_name=fixture_name,
+            runtime_ns=elapsed_ns,
+            query=query,
+            # Include the full query
+            include_sql=self.mode == "query",
+            fingerprint=fingerprint,
+            # Left out for the default database, which most projects only have
+            alias=None if alias == DEFAULT_DB_ALIAS else alias,
+            row_count=row_count if row_count >= 0 else None,
+            executemany=self.executemany,
         )
 
 
 @dataclass
 class MockRecorder:
     mocks: frozenset[str]
-    output: TimingsOutputFile
-    enable_django_sql: Literal[True, "query"] | None
+    output: TimingsSink
+    enable_django_sql: DjangoSQLMode | None
+    overhead: OverheadTracker = field(default_factory=OverheadTracker)
+    # With "test", functions are patched for the duration of each test and fixture. With
+    # "session", they are patched once and calls are attributed with `get_scope()`.
+    patch_mode: PatchMode = "test"
+    # With "monitoring", functions given in `mocks` are recorded with `sys.monitoring`
+    # instead of being patched. Django SQL queries are always patched.
+    backend: RecorderBackend = "patch"
+    # Also record the CPU time of recorded functions
+    cpu: bool = False
+    # Counts Django SQL queries by fingerprint, with --scrutinize-django-sql-fingerprint
+    repeated_sql: RepeatedQueryDetector | None = None
+    # Tracks the slowest Django SQL queries, with --scrutinize-django-sql=explain
+    slow_sql: SlowQueryTracker | None = None
 
     _mock_funcs: dict[str, SingleMockRecorder] = field(default_factory=dict)
+    _monitoring: MonitoringRecorder | None = None
 
     @contextlib.contextmanager
     def record(self, test_id: str | None, fixture_name: str | None):
+        try:
+            with enter_scope(test_id, fixture_name):
+                if self.patch_mode == "session":
+                    yield
+                else:
+                    with self._patch(test_id, fixture_name):
+                        yield
+        finally:
+            if self._monitoring is not None:
+                self._monitoring.scope_finished()
+
+    @contextlib.contextmanager
+    def _patch(self, test_id: str | None, fixture_name: str | None):
         # We want to avoid recursive mock calls, which can happen when using `getfixturevalue`.
         # Detecting if something is a mock is a pain, so we just use a token-style system:
         # we take the entire _mock_funcs dictionary when we set up the mocks, and replace it
@@ -125,31 +258,69 @@ class MockRecorder:
         mock_funcs = self._mock_funcs
         self._mock_funcs = {}
 
+        stack = contextlib.ExitStack()
         try:
-            with contextlib.ExitStack() as stack:
+            with self.overhead.measure("patching"):
                 for single_mock in mock_funcs.values():
                     stack.enter_context(
-                        single_mock.record_mock(self.output, test_id, fixture_name)
+                        single_mock.record_mock(
+                            self.output,
+                            test_id,
+                            fixture_name,
+                            self.overhead,
+                            cpu=self.cpu,
+                        )
                     )
-                yield
+            yield
         finally:
+            with self.overhead.measure("patching"):
+                stack.close()
             self._mock_funcs = mock_funcs
 
     @contextlib.contextmanager
     def initialize_mocks(self):
-        for mock_path in self.mocks:
-            self._mock_funcs[mock_path] = SingleMockRecorder.from_dotted_path(
-                name=mock_path, mock_path=mock_path
-            )
+        if self.backend == "patch":
+            for mock_path in self.mocks:
+                self._mock_funcs[mock_path] = SingleMockRecorder.from_dotted_path(
+                    name=mock_path, mock_path=mock_path
+                )
 
         if self.enable_django_sql is not None:
             self._mock_funcs["django_sql"] = DjangoSQLRecorder.from_dotted_path(
                 name="django_sql",
                 mock_path="django.db.backends.utils.CursorWrapper._execute",
                 mode=self.enable_django_sql,
+                repeats=self.repeated_sql,
+                slow_queries=self.slow_sql,
+            )
+            self._mock_funcs["django_sql_many"] = DjangoSQLRecorder.from_dotted_path(
+                name="django_sql",
+                mock_path="django.db.backends.utils.CursorWrapper._executemany",
+                mode=self.enable_django_sql,
+                executemany=True,
+                repeats=self.repeated_sql,
             )
 
         try:
-            yield
+            with contextlib.ExitStack() as stack:
+                if self.backend == "monitoring":
+                    self._monitoring = MonitoringRecorder(
+                        mocks=self.mocks,
+                        output=self.output,
+                        overhead=self.overhead,
+                        cpu=self.cpu,
+                    )
+                    stack.enter_context(self._monitoring.initialize())
+
+                if self.patch_mode == "session":
+                    with self.overhead.measure("patching"):
+                        for single_mock in self._mock_funcs.values():
+                            stack.enter_context(
+                                single_mock.patch_session(
+                                    self.output, self.overhead, cpu=self.cpu
+                                )
+                            )
+                yield
         finally:
             self._mock_funcs.clear()
+            self._monitoring = None
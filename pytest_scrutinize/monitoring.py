@@ -0,0 +1,208 @@
+import contextlib
+import pkgutil
+import sys
+import types
+import typing
+from dataclasses import dataclass, field
+
+from .io import TimingsSink
+from .overhead import OverheadTracker
+from .records import MockRecord
+from .scope import get_scope
+from .timer import perf_ns, process_ns, thread_ns
+
+# Records calls to functions using `sys.monitoring` (PEP 669, Python 3.12+) rather than by
+# patching them. The code objects of the recorded functions are instrumented directly, so
+# the functions keep their identity and calls are recorded however the function was
+# imported. Only Python functions can be recorded this way.
+#
+# Calls are tracked by their frame, which the callbacks are called from. Generator and
+# coroutine frames are suspended at each yield or await and resumed later, possibly on
+# another thread, so their runtime is the sum of the time spent running between PY_START or
+# PY_RESUME and PY_YIELD or PY_RETURN. `throw()` resumes them with PY_THROW instead.
+#
+# Calls that raise end with PY_UNWIND. PY_UNWIND and PY_THROW cannot be set as local events
+# on a code object, only for all code. They are enabled when a recorded function starts, and
+# disabled when the test or fixture that called it finishes with no recorded call left in
+# progress, so code outside of tests that call recorded functions is not affected. Each
+# change re-instruments the running code, so they are not toggled around every call.
+
+# Tool IDs to try, in order. PROFILER_ID is the natural fit, but may be in use by another
+# profiler. 3 and 4 are not reserved for anything.
+_TOOL_IDS = (2, 3, 4)
+
+
+def is_supported() -> bool:
+    return hasattr(sys, "monitoring")
+
+
+def resolve_code(path: str) -> types.CodeType:
+    class_path, attribute_name = path.rsplit(".", 1)
+    owner = pkgutil.resolve_name(class_path)
+    func = getattr(owner, attribute_name)
+    # Bound methods and classmethods
+    func = getattr(func, "__func__", func)
+    code = getattr(func, "__code__", None)
+    if not isinstance(code, types.CodeType):
+        raise ValueError(
+            f"Cannot record {path} with sys.monitoring: it is not a Python function"
+        )
+    return code
+
+
+@dataclass(slots=True)
+class _Call:
+    runtime_ns: int = 0
+    process_time_ns: int = 0
+    thread_time_ns: int = 0
+    # Of the current run, until the frame yields or returns
+    start_ns: int = 0
+    process_start_ns: int = 0
+    thread_start_ns: int = 0
+
+    def resume(self, cpu: bool):
+        if cpu:
+            self.process_start_ns = process_ns()
+            self.thread_start_ns = thread_ns()
+        self.start_ns = perf_ns()
+
+    def suspend(self, end_ns: int, cpu: bool):
+        self.runtime_ns += end_ns - self.start_ns
+        if cpu:
+            self.process_time_ns += process_ns() - self.process_start_ns
+            self.thread_time_ns += thread_ns() - self.thread_start_ns
+
+
+@dataclass
+class MonitoringRecorder:
+    mocks: frozenset[str]
+    output: TimingsSink
+    overhead: OverheadTracker
+    cpu: bool = False
+
+    _names: dict[types.CodeType, str] = field(default_factory=dict)
+    # Calls in progress, by frame. Frames are unique to each call and thread.
+    _calls: dict[types.FrameType, _Call] = field(default_factory=dict)
+    _tool_id: int | None = None
+    # PY_UNWIND and PY_THROW are enabled
+    _unwind_events: bool = False
+
+    def _on_start(self, code: types.CodeType, offset: int):
+        if not self._unwind_events:
+            self._set_unwind_events(True)
+        call = self._calls[sys._getframe(1)] = _Call()
+        call.resume(self.cpu)
+
+    def _on_resume(self, code: types.CodeType, offset: int):
+        # Missing if monitoring was enabled while the frame was suspended
+        if (call := self._calls.get(sys._getframe(1))) is not None:
+            call.resume(self.cpu)
+
+    def _on_yield(self, code: types.CodeType, offset: int, retval: typing.Any):
+        end = perf_ns()
+        if (call := self._calls.get(sys._getframe(1))) is not None:
+            call.suspend(end, self.cpu)
+
+    def _on_return(self, code: types.CodeType, offset: int, retval: typing.Any):
+        self._finish(code, exception=False)
+
+    def _on_throw(self, code: types.CodeType, offset: int, exception: BaseException):
+        # Called for every generator and coroutine that is thrown into
+        if code in self._names and (call := self._calls.get(sys._getframe(1))):
+            call.resume(self.cpu)
+
+    def _on_unwind(self, code: types.CodeType, offset: int, exception: BaseException):
+        # Called for every function that exits with an exception
+        if code in self._names:
+            self._finish(code, exception=True)
+
+    def _finish(self, code: types.CodeType, exception: bool):
+        end = perf_ns()
+        # The monitored frame is the caller of the callback
+        if (call := self._calls.pop(sys._getframe(2), None)) is None:
+            # Monitoring was enabled while the function was running
+            return
+        call.suspend(end, self.cpu)
+        if (scope := get_scope()) is None:
+            return
+        test_id, fixture_name = scope
+        record = MockRecord(
+            name=self._names[code],
+            test_id=test_id,
+            fixture_name=fixture_name,
+            runtime_ns=call.runtime_ns,
+            exception=exception,
+        )
+        if self.cpu:
+            record.process_time_ns = call.process_time_ns
+            record.thread_time_ns = call.thread_time_ns
+        self.output.add_timing(record)
+        if self.overhead.enabled:
+            self.overhead.add("recording", perf_ns() - end)
+
+    def _set_unwind_events(self, enabled: bool):
+        if self._tool_id is None:
+            return
+        events = sys.monitoring.events
+        sys.monitoring.set_events(
+            self._tool_id,
+            events.PY_THROW | events.PY_UNWIND if enabled else events.NO_EVENTS,
+        )
+        self._unwind_events = enabled
+
+    def scope_finished(self):
+        """Called when a test or fixture finishes"""
+        if self._unwind_events and not self._calls:
+            self._set_unwind_events(False)
+
+    def _acquire_tool_id(self) -> int:
+        for tool_id in _TOOL_IDS:
+            if sys.monitoring.get_tool(tool_id) is None:
+                sys.monitoring.use_tool_id(tool_id, "pytest-scrutinize")
+                return tool_id
+        raise RuntimeError("No free sys.monitoring tool IDs")
+
+    @contextlib.contextmanager
+    def initialize(self) -> typing.Generator[None, None, None]:
+        if not self.mocks:
+            yield
+            return
+
+        monitoring = sys.monitoring
+        events = monitoring.events
+        self._names = {resolve_code(path): path for path in self.mocks}
+
+        with self.overhead.measure("patching"):
+            tool_id = self._tool_id = self._acquire_tool_id()
+            for event, callback in self._callbacks().items():
+                monitoring.register_callback(tool_id, event, callback)
+            local_events = (
+                events.PY_START | events.PY_RESUME | events.PY_YIELD | events.PY_RETURN
+            )
+            for code in self._names:
+                monitoring.set_local_events(tool_id, code, local_events)
+
+        try:
+            yield
+        finally:
+            for code in self._names:
+                monitoring.set_local_events(tool_id, code, events.NO_EVENTS)
+            monitoring.set_events(tool_id, events.NO_EVENTS)
+            self._unwind_events = False
+            for event in self._callbacks():
+                monitoring.register_callback(tool_id, event, None)
+            monitoring.free_tool_id(tool_id)
+            self._tool_id = None
+            self._names = {}
+            self._calls = {}
+
+    def _callbacks(self) -> dict[int, typing.Callable[..., typing.Any]]:
+        events = sys.monitoring.events
+        return {
+            events.PY_START: self._on_start,
+            events.PY_RESUME: self._on_resume,
+            events.PY_YIELD: self._on_yield,
+            events.PY_RETURN: self._on_return,
+            events.PY_THROW: self._on_throw,
+            events.PY_UNWIND: self._on_unwind,
+        }
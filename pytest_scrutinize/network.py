@@ -0,0 +1,336 @@
+import contextlib
+import errno
+import functools
+import http.client
+import os
+import socket
+import typing
+import weakref
+from dataclasses import dataclass, field
+from unittest import mock
+
+from .data import NetworkOperation, NetworkTiming
+from .scope import get_scope
+from .timer import Duration, perf_ns
+
+if typing.TYPE_CHECKING:
+    from .io import TimingsOutputFile
+
+# With `--scrutinize-network`, outbound network calls made by tests and fixtures are recorded.
+# The calls are patched for the whole session, and attributed with `get_scope()`:
+# - dns: `socket.getaddrinfo`, which `socket.create_connection` (and so `http.client`,
+#   `urllib` and `urllib3`) resolves hosts with
+# - connect: `socket.socket.connect` and `connect_ex`. The bytes sent and received over the
+#   socket are counted until it's closed, and the record is written then (or at the end of the
+#   session for sockets that are still open).
+# - http: `http.client` requests, from `putrequest` until `getresponse` has read the response
+#   headers. The response body is read afterwards, so its size is only counted on the socket.
+#
+# Only the sockets connected in a test or fixture are counted. Counting wraps the socket's
+# `send`, `sendall`, `recv` and `recv_into` methods, which `socket.makefile` reads and writes
+# with too. Sockets connected without blocking (e.g. by asyncio) are counted once the connect
+# call returns, so their runtime doesn't include the connection itself. TLS sockets encrypt and
+# decrypt in `ssl`, so the bytes of HTTPS connections aren't counted.
+
+
+@dataclass(slots=True)
+class SocketStats:
+    test_id: str | None
+    fixture_name: str | None
+    host: str | None
+    port: int | None
+    connect_ns: int
+    sent: int = 0
+    received: int = 0
+
+
+@dataclass(slots=True)
+class HTTPRequest:
+    test_id: str | None
+    fixture_name: str | None
+    request: str
+    start_ns: int
+    sent: int = 0
+
+
+def _parse_port(port: typing.Any) -> int | None:
+    if isinstance(port, int):
+        return port
+    if isinstance(port, (str, bytes)) and port.isdigit():
+        return int(port)
+    # Service names, like "http"
+    return None
+
+
+def _parse_host(host: typing.Any) -> str | None:
+    if host is None:
+        return None
+    return os.fsdecode(host) if isinstance(host, bytes) else str(host)
+
+
+def _parse_address(address: typing.Any) -> tuple[str | None, int | None]:
+    # (host, port) for IPv4, (host, port, flowinfo, scope_id) for IPv6, a path for AF_UNIX
+    if isinstance(address, tuple) and len(address) >= 2:
+        return _parse_host(address[0]), _parse_port(address[1])
+    return _parse_host(address), None
+
+
+def _describe_error(error: BaseException) -> str:
+    return f"{type(error).__name__}: {error}"
+
+
+@dataclass
+class NetworkRecorder:
+    output: "TimingsOutputFile"
+    enabled: bool = False
+
+    sockets: "weakref.WeakKeyDictionary[socket.socket, SocketStats]" = field(
+        default_factory=weakref.WeakKeyDictionary
+    )
+
+    def record(
+        self,
+        operation: NetworkOperation,
+        test_id: str | None,
+        fixture_name: str | None,
+        host: str | None,
+        port: int | None,
+        runtime_ns: int,
+        request: str | None = None,
+        bytes_sent: int | None = None,
+        bytes_received: int | None = None,
+        error: str | None = None,
+    ):
+        self.output.add_timing(
+            NetworkTiming(
+                test_id=test_id,
+                fixture_name=fixture_name,
+                operation=operation,
+                host=host,
+                port=port,
+                request=request,
+                bytes_sent=bytes_sent,
+                bytes_received=bytes_received,
+                runtime=Duration(as_nanoseconds=runtime_ns),
+                error=error,
+            )
+        )
+
+    def _record_socket(self, stats: SocketStats):
+        self.record(
+            "connect",
+            stats.test_id,
+            stats.fixture_name,
+            stats.host,
+            stats.port,
+            stats.connect_ns,
+            bytes_sent=stats.sent,
+            bytes_received=stats.received,
+        )
+
+    @contextlib.contextmanager
+    def initialize(self) -> typing.Generator[None, None, None]:
+        if not self.enabled:
+            yield
+            return
+
+        try:
+            with (
+                self._patch_getaddrinfo(),
+                self._patch_socket(),
+                self._patch_http_client(),
+            ):
+                yield
+        finally:
+            sockets, self.sockets = self.sockets, weakref.WeakKeyDictionary()
+            for stats in list(sockets.values()):
+                self._record_socket(stats)
+
+    def _patch_getaddrinfo(self) -> typing.ContextManager[typing.Any]:
+        getaddrinfo = socket.getaddrinfo
+        record = self.record
+
+        @functools.wraps(getaddrinfo)
+        def timed_getaddrinfo(host, port, *args, **kwargs):
+            if (scope := get_scope()) is None:
+                return getaddrinfo(host, port, *args, **kwargs)
+            error = None
+            start = perf_ns()
+            try:
+                return getaddrinfo(host, port, *args, **kwargs)
+            except OSError as e:
+                error = _describe_error(e)
+                raise
+            finally:
+                elapsed_ns = perf_ns() - start
+                record(
+                    "dns",
+                    *scope,
+                    _parse_host(host),
+                    _parse_port(port),
+                    elapsed_ns,
+                    error=error,
+                )
+
+        return mock.patch("socket.getaddrinfo", new=timed_getaddrinfo)
+
+    @contextlib.contextmanager
+    def _patch_socket(self) -> typing.Generator[None, None, None]:
+        sockets = self.sockets
+        record = self.record
+        record_socket = self._record_socket
+        cls = socket.socket
+        connect, connect_ex = cls.connect, cls.connect_ex
+        send, sendall, recv, recv_into = cls.send, cls.sendall, cls.recv, cls.recv_into
+        real_close = cls._real_close  # type: ignore[attr-defined]
+
+        def connected(
+            sock: socket.socket, address: typing.Any, start: int, error: str | None
+        ):
+            elapsed_ns = perf_ns() - start
+            test_id, fixture_name = get_scope() or (None, None)
+            host, port = _parse_address(address)
+            if error is not None:
+                record(
+                    "connect",
+                    test_id,
+                    fixture_name,
+                    host,
+                    port,
+                    elapsed_ns,
+                    error=error,
+                )
+            else:
+                sockets[sock] = SocketStats(
+                    test_id, fixture_name, host, port, connect_ns=elapsed_ns
+                )
+
+        @functools.wraps(connect)
+        def timed_connect(self, address, /):
+            if get_scope() is None:
+                return connect(self, address)
+            start = perf_ns()
+            try:
+                result = connect(self, address)
+            except (BlockingIOError, InterruptedError):
+                connected(self, address, start, None)
+                raise
+            except OSError as e:
+                connected(self, address, start, _describe_error(e))
+                raise
+            connected(self, address, start, None)
+            return result
+
+        @functools.wraps(connect_ex)
+        def timed_connect_ex(self, address, /):
+            if get_scope() is None:
+                return connect_ex(self, address)
+            start = perf_ns()
+            result = connect_ex(self, address)
+            in_progress = result in (0, errno.EINPROGRESS, errno.EWOULDBLOCK)
+            connected(
+                self, address, start, None if in_progress else os.strerror(result)
+            )
+            return result
+
+        @functools.wraps(send)
+        def counted_send(self, data, *args):
+            sent = send(self, data, *args)
+            if (stats := sockets.get(self)) is not None:
+                stats.sent += sent
+            return sent
+
+        @functools.wraps(sendall)
+        def counted_sendall(self, data, *args):
+            result = sendall(self, data, *args)
+            if (stats := sockets.get(self)) is not None:
+                stats.sent += memoryview(data).nbytes
+            return result
+
+        @functools.wraps(recv)
+        def counted_recv(self, *args):
+            data = recv(self, *args)
+            if (stats := sockets.get(self)) is not None:
+                stats.received += len(data)
+            return data
+
+        @functools.wraps(recv_into)
+        def counted_recv_into(self, buffer, *args):
+            received = recv_into(self, buffer, *args)
+            if (stats := sockets.get(self)) is not None:
+                stats.received += received
+            return received
+
+        # Called by `close()` once the files created by `makefile()` are closed too
+        @functools.wraps(real_close)
+        def recorded_real_close(self, *args):
+            if (stats := sockets.pop(self, None)) is not None:
+                record_socket(stats)
+            return real_close(self, *args)
+
+        with (
+            mock.patch.object(cls, "connect", new=timed_connect),
+            mock.patch.object(cls, "connect_ex", new=timed_connect_ex),
+            mock.patch.object(cls, "send", new=counted_send),
+            mock.patch.object(cls, "sendall", new=counted_sendall),
+            mock.patch.object(cls, "recv", new=counted_recv),
+            mock.patch.object(cls, "recv_into", new=counted_recv_into),
+            mock.patch.object(cls, "_real_close", new=recorded_real_close),
+        ):
+            yield
+
+    @contextlib.contextmanager
+    def _patch_http_client(self) -> typing.Generator[None, None, None]:
+        record = self.record
+        cls = http.client.HTTPConnection
+        putrequest, send, getresponse = cls.putrequest, cls.send, cls.getresponse
+        # Requests in flight, by connection
+        requests: weakref.WeakKeyDictionary[http.client.HTTPConnection, HTTPRequest] = (
+            weakref.WeakKeyDictionary()
+        )
+
+        @functools.wraps(putrequest)
+        def timed_putrequest(self, method, url, *args, **kwargs):
+            if (scope := get_scope()) is not None:
+                requests[self] = HTTPRequest(*scope, f"{method} {url}", perf_ns())
+            return putrequest(self, method, url, *args, **kwargs)
+
+        # File and iterable bodies are written to the socket directly, not with `send()`
+        @functools.wraps(send)
+        def counted_send(self, data):
+            if (request := requests.get(self)) is not None and isinstance(
+                data, (bytes, bytearray, memoryview)
+            ):
+                request.sent += memoryview(data).nbytes
+            return send(self, data)
+
+        @functools.wraps(getresponse)
+        def timed_getresponse(self, *args, **kwargs):
+            if (request := requests.pop(self, None)) is None:
+                return getresponse(self, *args, **kwargs)
+            error = None
+            try:
+                return getresponse(self, *args, **kwargs)
+            except Exception as e:
+                error = _describe_error(e)
+                raise
+            finally:
+                elapsed_ns = perf_ns() - request.start_ns
+                record(
+                    "http",
+                    request.test_id,
+                    request.fixture_name,
+                    self.host,
+                    self.port,
+                    elapsed_ns,
+                    request=request.request,
+                    bytes_sent=request.sent,
+                    error=error,
+                )
+
+        with (
+            mock.patch.object(cls, "putrequest", new=timed_putrequest),
+            mock.patch.object(cls, "send", new=counted_send),
+            mock.patch.object(cls, "getresponse", new=timed_getresponse),
+        ):
+            yield
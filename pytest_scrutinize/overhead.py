@@ -0,0 +1,68 @@
+import collections
+import contextlib
+from dataclasses import dataclass, field
+from typing import Generator, Literal
+
+from .data import OverheadTiming
+from .timer import Duration, perf_ns
+
+# The plugin's own work happens while tests and fixtures are running, and would otherwise be
+# attributed to them. The overhead is split into:
+# - patching: entering and exiting the `--scrutinize-func` and Django SQL patches
+# - recording: bookkeeping in recorded function wrappers and GC callbacks
+# - serialization: writing buffered timings to the output
+# - bookkeeping: building test and fixture timings
+OverheadCategory = Literal["patching", "recording", "serialization", "bookkeeping"]
+
+
+@dataclass
+class OverheadTracker:
+    enabled: bool = False
+
+    # Overhead since the last per-test timing was taken
+    current: collections.Counter[str] = field(default_factory=collections.Counter)
+    # Overhead for the whole session
+    session: collections.Counter[str] = field(default_factory=collections.Counter)
+
+    def add(self, category: OverheadCategory, elapsed_ns: int):
+        self.current[category] += elapsed_ns
+        self.session[category] += elapsed_ns
+
+    @contextlib.contextmanager
+    def measure(self, category: OverheadCategory) -> Generator[None, None, None]:
+        if not self.enabled:
+            yield
+            return
+
+        start = perf_ns()
+        try:
+            yield
+        finally:
+            self.add(category, perf_ns() - start)
+
+    @property
+    def recording_ns(self) -> int:
+        # Monotonic counter of the overhead incurred inside tests and fixtures. The
+        # difference before and after a measured block is the instrumentation cost
+        # included in its duration.
+        return self.session["recording"]
+
+    def take_timing(self, test_id: str) -> OverheadTiming:
+        timing = self._build_timing(test_id, self.current)
+        self.current = collections.Counter()
+        return timing
+
+    def session_timing(self) -> OverheadTiming:
+        return self._build_timing(None, self.session)
+
+    @staticmethod
+    def _build_timing(
+        test_id: str | None, counter: collections.Counter[str]
+    ) -> OverheadTiming:
+        return OverheadTiming(
+            test_id=test_id,
+            patching=Duration(as_nanoseconds=counter["patching"]),
+            recording=Duration(as_nanoseconds=counter["recording"]),
+            serialization=Duration(as_nanoseconds=counter["serialization"]),
+            bookkeeping=Duration(as_nanoseconds=counter["bookkeeping"]),
+        )
@@ -0,0 +1,145 @@
+import contextlib
+import functools
+import types
+import typing
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+
+import pydantic
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError as e:
+    raise ImportError(
+        "Parquet output requires pyarrow: pip install 'pytest-scrutinize[parquet]'"
+    ) from e
+
+from . import Timing
+from .data import BaseTiming
+from .io import FileTimingsWriter
+from .timer import Duration
+
+# All timing types are written to a single table. Each model field becomes a column, and
+# fields that are not present on a given type are null. Columns are dictionary encoded by
+# Parquet, so repeated values (types, test IDs, fixture names) are cheap to store.
+# Durations are stored as a struct of their fields (the nanoseconds and the optional CPU
+# times), without the computed fields, so that queries like `runtime.as_nanoseconds` work
+# against both the JSON and Parquet output.
+
+ROW_GROUP_SIZE = 10_000
+
+_SIMPLE_TYPES: dict[typing.Any, pa.DataType] = {
+    str: pa.string(),
+    int: pa.int64(),
+    float: pa.float64(),
+    bool: pa.bool_(),
+    datetime: pa.timestamp("us", tz="UTC"),
+}
+
+
+def _arrow_type(annotation: typing.Any) -> pa.DataType:
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+
+    if origin in (typing.Union, types.UnionType):
+        non_null_args = [arg for arg in args if arg is not type(None)]
+        if len(non_null_args) != 1:
+            raise TypeError(f"Unsupported union type {annotation}")
+        return _arrow_type(non_null_args[0])
+    if origin is typing.Literal:
+        return pa.string()
+    if origin is list:
+        return pa.list_(_arrow_type(args[0]))
+    if origin is dict:
+        return pa.map_(_arrow_type(args[0]), _arrow_type(args[1]))
+    if annotation is Duration:
+        return pa.struct(
+            [
+                (name, _arrow_type(field.annotation))
+                for name, field in Duration.model_fields.items()
+            ]
+        )
+    if isinstance(annotation, type) and issubclass(annotation, pydantic.BaseModel):
+        return pa.struct(list(_model_columns(annotation).items()))
+    if annotation in _SIMPLE_TYPES:
+        return _SIMPLE_TYPES[annotation]
+    raise TypeError(f"Unsupported type {annotation}")
+
+
+def _model_columns(model: type[pydantic.BaseModel]) -> dict[str, pa.DataType]:
+    columns = {
+        name: _arrow_type(field.annotation)
+        for name, field in model.model_fields.items()
+    }
+    for name, computed_field in model.model_computed_fields.items():
+        columns[name] = _arrow_type(computed_field.return_type)
+    return columns
+
+
+def _timing_models() -> list[type[BaseTiming]]:
+    union, *_ = typing.get_args(Timing)
+    return list(typing.get_args(union))
+
+
+@functools.cache
+def models_by_type() -> dict[str, type[BaseTiming]]:
+    return {model.model_fields["type"].default: model for model in _timing_models()}
+
+
+@functools.cache
+def timings_schema() -> pa.Schema:
+    columns: dict[str, pa.DataType] = {"type": pa.string()}
+    for model in _timing_models():
+        for name, data_type in _model_columns(model).items():
+            existing_type = columns.setdefault(name, data_type)
+            if existing_type != data_type:
+                raise TypeError(
+                    f"Column {name} on {model.__name__} has type {data_type}, "
+                    f"but another timing uses {existing_type}"
+                )
+    return pa.schema(list(columns.items()))
+
+
+class ParquetTimingsWriter(FileTimingsWriter):
+    def __init__(self, writer: pq.ParquetWriter, row_group_size: int = ROW_GROUP_SIZE):
+        self.writer = writer
+        self.row_group_size = row_group_size
+        self.rows: list[dict[str, typing.Any]] = []
+
+    def write_timings(self, timings: list[BaseTiming]):
+        self.rows.extend(timing.model_dump() for timing in timings)
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            table = pa.Table.from_pylist(self.rows, schema=timings_schema())
+            self.writer.write_table(table, row_group_size=self.row_group_size)
+            self.rows = []
+
+    def copy_from(self, path: Path):
+        # Merge whole row groups, without converting them back into timings
+        self.flush()
+        parquet_file = pq.ParquetFile(path)
+        for index in range(parquet_file.num_row_groups):
+            self.writer.write_table(parquet_file.read_row_group(index))
+
+
+@contextlib.contextmanager
+def open_parquet_writer(path: Path) -> Iterator[ParquetTimingsWriter]:
+    with pq.ParquetWriter(path, timings_schema(), compression="zstd") as writer:
+        timings_writer = ParquetTimingsWriter(writer)
+        try:
+            yield timings_writer
+        finally:
+            timings_writer.flush()
+
+
+def read_parquet_timings(path: Path) -> Iterator[BaseTiming]:
+    models = models_by_type()
+    for batch in pq.ParquetFile(path).iter_batches():
+        for row in batch.to_pylist(maps_as_pydicts="strict"):
+            model = models[row["type"]]
+            yield model.model_validate({name: row[name] for name in model.model_fields})
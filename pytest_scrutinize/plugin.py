@@ -9,21 +9,42 @@ from typing import Literal
 import pydantic
 import pytest
 
-from .io import TimingsOutputFile
-from .mocks import MockRecorder
+from .aggregate import TimingsAggregator
+from . import collection
+from .cost import CostTracker, Phase
+from .hook_timing import HookTracer
+from .memory import MemoryTracker
+from .network import NetworkRecorder
+from .profiler import StackSampler
+from .io import TimingsOutputFile, TimingsSink, OutputFormat, OUTPUT_SUFFIXES
+from .mocks import DjangoSQLMode, MockRecorder, PatchMode, RecorderBackend
+from . import monitoring
+from .overhead import OverheadTracker
 from .data import (
     CollectionTiming,
     FixtureTiming,
     TestTiming,
-    GCTiming,
 )
+from .records import GCRecord
+from .sampling import TimingsSampler, parse_sample_rate
+from .scope import propagate_to_threads
+from .sinks import SinkDispatcher, parse_sink
+from .sql import RepeatedQueryDetector, SlowQueryTracker, unblock_django_db
+from .sql_recorders import SQLRecorder, SQLRecorderName, parse_sql_recorders
 from .utils import is_generator_fixture
-from .timer import Timer, measure_time
+from .timer import Timer, Duration, measure_time
 
 if typing.TYPE_CHECKING:
     from _pytest.fixtures import FixtureDef, SubRequest
 
 
+@pytest.hookimpl
+def pytest_addhooks(pluginmanager: pytest.PytestPluginManager):
+    from . import hooks
+
+    pluginmanager.add_hookspecs(hooks)
+
+
 @pytest.hookimpl
 def pytest_addoption(parser: pytest.Parser):
     group = parser.getgroup("scrutinize", "Structured timing output")
@@ -41,24 +62,255 @@ def pytest_addoption(parser: pytest.Parser):
         nargs="?",
         help="Comma separated list of functions to record",
     )
+    group.addoption(
+        "--scrutinize-func-patch",
+        choices=["test", "session"],
+        default="test",
+        help="Patch recorded functions for every test and fixture (test), or "
+        "once per session (session)",
+    )
+    group.addoption(
+        "--scrutinize-func-backend",
+        choices=["patch", "monitoring"],
+        default="patch",
+        help="Record functions by patching them (patch), or with sys.monitoring "
+        "(monitoring, Python 3.12+)",
+    )
     group.addoption(
         "--scrutinize-gc", action="store_true", help="Record garbage collections"
     )
     group.addoption(
         "--scrutinize-django-sql",
         nargs="?",
-        choices=["hash", "query"],
+        choices=["hash", "query", "explain"],
+        default=False,
+        const=True,
+        help="Record Django SQL queries by hash (hash), with the raw SQL (query), or "
+        "by hash and EXPLAIN the slowest distinct queries at the end of the run "
+        "(explain)",
+    )
+    group.addoption(
+        "--scrutinize-django-sql-explain-top",
+        type=int,
+        default=10,
+        metavar="N",
+        help="Number of slowest distinct queries to EXPLAIN with "
+        "--scrutinize-django-sql=explain",
+    )
+    group.addoption(
+        "--scrutinize-django-sql-fingerprint",
+        action="store_true",
+        help="Also fingerprint SQL queries (Django and --scrutinize-sql) after "
+        "replacing their literals and placeholders, and record queries that repeat "
+        "in a test or fixture",
+    )
+    group.addoption(
+        "--scrutinize-django-sql-repeats",
+        type=int,
+        default=10,
+        metavar="N",
+        help="Record queries with the same fingerprint that run more than N times in "
+        "a test or fixture",
+    )
+    group.addoption(
+        "--scrutinize-sql",
+        action="append",
+        type=str,
+        metavar="RECORDERS",
+        help="Comma separated list of other SQL queries to record: sqlalchemy "
+        "(SQLAlchemy engines) and sqlite3 (sqlite3 connections)",
+    )
+    group.addoption(
+        "--scrutinize-sql-query",
+        action="store_true",
+        help="Include the raw SQL of the queries recorded with --scrutinize-sql",
+    )
+    group.addoption(
+        "--scrutinize-network",
+        action="store_true",
+        help="Record the DNS lookups, socket connections and http.client requests "
+        "made by tests and fixtures",
+    )
+    group.addoption(
+        "--scrutinize-cpu",
+        action="store_true",
+        help="Also record the process and thread CPU time of tests, fixtures and "
+        "recorded functions",
+    )
+    group.addoption(
+        "--scrutinize-profile",
+        action="store_true",
+        help="Sample the stacks of tests and fixture setups, and record them as "
+        "collapsed stacks for flamegraph tools",
+    )
+    group.addoption(
+        "--scrutinize-profile-interval",
+        type=float,
+        default=5,
+        metavar="MS",
+        help="Interval between stack samples, in milliseconds",
+    )
+    group.addoption(
+        "--scrutinize-profile-threshold",
+        type=float,
+        default=0,
+        metavar="MS",
+        help="Only keep the samples of tests and fixture setups that took longer "
+        "than this, in milliseconds",
+    )
+    group.addoption(
+        "--scrutinize-collection",
+        action="store_true",
+        help="Record the time taken to import and collect each test module and "
+        "conftest.py file",
+    )
+    group.addoption(
+        "--scrutinize-cost",
+        action="store_true",
+        help="Record the cost of each test, including its share of the class, "
+        "module, package and session scoped fixtures it uses",
+    )
+    group.addoption(
+        "--scrutinize-hooks",
+        action="store_true",
+        help="Record the time spent in each plugin's hook implementations, per test",
+    )
+    group.addoption(
+        "--scrutinize-memory",
+        action="store_true",
+        help="Record memory allocated by tests and fixtures with tracemalloc",
+    )
+    group.addoption(
+        "--scrutinize-memory-top",
+        type=int,
+        default=5,
+        help="Number of top allocation sites to record per test call and fixture "
+        "setup or teardown. 0 disables snapshots, which are the costliest part",
+    )
+    group.addoption(
+        "--scrutinize-memory-frames",
+        type=int,
+        default=1,
+        help="Number of frames tracemalloc stores per allocation",
+    )
+    group.addoption(
+        "--scrutinize-memory-sample",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Only trace memory in one of every N tests, chosen by test ID so the "
+        "same tests are traced in every run. Other tests run without tracemalloc",
+    )
+    group.addoption(
+        "--scrutinize-mode",
+        choices=["raw", "aggregate"],
+        default="raw",
+        help="Record every function call, SQL query and garbage collection (raw), "
+        "or only aggregates per test and fixture (aggregate)",
+    )
+    group.addoption(
+        "--scrutinize-sample",
+        action="append",
+        type=str,
+        metavar="SOURCE=RATE",
+        help="Sample timings from a source (a recorded function, django_sql or gc) "
+        "at the given rate, between 0 and 1. The slowest timings per test and "
+        "fixture are always kept",
+    )
+    group.addoption(
+        "--scrutinize-sample-top-k",
+        type=int,
+        default=10,
+        help="Number of slowest timings per source, test and fixture that are "
+        "always kept when sampling",
+    )
+    group.addoption(
+        "--scrutinize-overhead",
+        nargs="?",
+        choices=["correct"],
         default=False,
         const=True,
-        help="Record Django SQL queries",
+        help="Record the overhead of the plugin itself. With 'correct', the "
+        "measured overhead is subtracted from test and fixture durations",
+    )
+    group.addoption(
+        "--scrutinize-format",
+        choices=["jsonl", "parquet"],
+        default="jsonl",
+        help="Output format: gzipped JSON lines (jsonl) or Parquet (parquet, "
+        "requires pyarrow)",
+    )
+    group.addoption(
+        "--scrutinize-writer",
+        choices=["sync", "thread"],
+        default="sync",
+        help="Serialize and compress timings in the test thread (sync) or in a "
+        "dedicated background thread (thread)",
+    )
+    group.addoption(
+        "--scrutinize-writer-queue-size",
+        type=int,
+        default=64,
+        help="Maximum number of batches waiting for the background writer",
+    )
+    group.addoption(
+        "--scrutinize-xdist-transport",
+        choices=["file", "channel"],
+        default="file",
+        help="Send timings from pytest-xdist workers to the master in a file at the "
+        "end of the session (file), or over the xdist channel as they are recorded "
+        "(channel, requires --scrutinize-format=jsonl)",
+    )
+    group.addoption(
+        "--scrutinize-schedule",
+        metavar="PATH",
+        type=Path,
+        help="Distribute tests across pytest-xdist workers using the durations in a "
+        "previous .jsonl.gz output file, longest first. Replaces --dist=load",
+    )
+    group.addoption(
+        "--scrutinize-sink",
+        action="append",
+        type=str,
+        metavar="SINK",
+        help="Also send timings to a sink: memory, file:///path, unix:///path or "
+        "tcp://host:port",
     )
 
 
 class Config(pydantic.BaseModel):
     output_path: Path
+    output_format: OutputFormat = "jsonl"
     mocks: frozenset[str]
+    mock_patch_mode: PatchMode = "test"
+    mock_backend: RecorderBackend = "patch"
     enable_gc: bool
-    enable_django_sql: Literal[True, "query"] | None
+    enable_django_sql: DjangoSQLMode | None
+    enable_sql_fingerprint: bool = False
+    sql_repeat_threshold: int = 10
+    sql_explain_top: int = 10
+    sql_recorders: frozenset[SQLRecorderName] = frozenset()
+    sql_include_query: bool = False
+    enable_network: bool = False
+    enable_cpu: bool = False
+    enable_memory: bool = False
+    enable_profile: bool = False
+    enable_hooks: bool = False
+    enable_cost: bool = False
+    enable_collection: bool = False
+    profile_interval_ns: int = 5_000_000
+    profile_threshold_ns: int = 0
+    memory_top: int = 5
+    memory_frames: int = 1
+    memory_sample: int = 1
+    overhead: Literal[True, "correct"] | None = None
+    mode: Literal["raw", "aggregate"] = "raw"
+    sample_rates: dict[str, float] = {}
+    sample_top_k: int = 10
+    writer: Literal["sync", "thread"] = "sync"
+    writer_queue_size: int = 64
+    xdist_transport: Literal["file", "channel"] = "file"
+    schedule_path: Path | None = None
 
 
 def pytest_configure(config: pytest.Config):
@@ -68,9 +320,91 @@ def pytest_configure(config: pytest.Config):
         enable_gc = typing.cast(bool, config.getoption("--scrutinize-gc") or False)
 
         enable_django_sql = typing.cast(
-            Literal[True, "query"] | None,
+            DjangoSQLMode | Literal["hash"] | None,
             config.getoption("--scrutinize-django-sql") or None,
         )
+        if enable_django_sql == "hash":
+            enable_django_sql = True
+
+        sql_recorders: frozenset[SQLRecorderName] = frozenset()
+        for sql_arg in config.getoption("--scrutinize-sql") or []:
+            try:
+                sql_recorders |= parse_sql_recorders(sql_arg)
+            except ValueError as e:
+                raise pytest.UsageError(str(e)) from e
+        if "sqlalchemy" in sql_recorders:
+            try:
+                import sqlalchemy  # noqa: F401
+            except ImportError as e:
+                raise pytest.UsageError(
+                    "--scrutinize-sql=sqlalchemy requires SQLAlchemy"
+                ) from e
+
+        output_format = typing.cast(
+            OutputFormat, config.getoption("--scrutinize-format")
+        )
+        if output_format == "parquet":
+            try:
+                from . import parquet  # noqa: F401
+            except ImportError as e:
+                raise pytest.UsageError(str(e)) from e
+
+        xdist_transport = config.getoption("--scrutinize-xdist-transport")
+        if xdist_transport == "channel" and output_format != "jsonl":
+            raise pytest.UsageError(
+                "--scrutinize-xdist-transport=channel requires --scrutinize-format=jsonl"
+            )
+
+        mock_backend = typing.cast(
+            RecorderBackend, config.getoption("--scrutinize-func-backend")
+        )
+        if mock_backend == "monitoring" and not monitoring.is_supported():
+            raise pytest.UsageError(
+                "--scrutinize-func-backend=monitoring requires Python 3.12 or later"
+            )
+
+        sample_rates = {}
+        for sample_arg in config.getoption("--scrutinize-sample") or []:
+            try:
+                source, rate = parse_sample_rate(sample_arg)
+            except ValueError as e:
+                raise pytest.UsageError(str(e)) from e
+            sample_rates[source] = rate
+        mode = config.getoption("--scrutinize-mode")
+        if sample_rates and mode == "aggregate":
+            raise pytest.UsageError(
+                "--scrutinize-sample cannot be used with --scrutinize-mode=aggregate"
+            )
+
+        profile_interval_ms = config.getoption("--scrutinize-profile-interval")
+        if profile_interval_ms <= 0:
+            raise pytest.UsageError(
+                "--scrutinize-profile-interval must be greater than 0"
+            )
+
+        memory_sample = config.getoption("--scrutinize-memory-sample")
+        if memory_sample < 1:
+            raise pytest.UsageError("--scrutinize-memory-sample must be at least 1")
+
+        schedule_path = config.getoption("--scrutinize-schedule")
+        if schedule_path is not None and not schedule_path.is_file():
+            raise pytest.UsageError(
+                f"--scrutinize-schedule: {schedule_path} does not exist"
+            )
+        # pytest-xdist sets --dist=load when -n is given without a --dist mode
+        dist = config.getoption("dist", "no")
+        if schedule_path is not None and dist not in ("no", "load"):
+            raise pytest.UsageError(
+                f"--scrutinize-schedule replaces --dist=load, and cannot be used with "
+                f"--dist={dist}"
+            )
+
+        for sink_arg in config.getoption("--scrutinize-sink") or []:
+            try:
+                sink = parse_sink(sink_arg)
+            except ValueError as e:
+                raise pytest.UsageError(str(e)) from e
+            config.pluginmanager.register(sink, name=f"{__name__}.sink.{sink_arg}")
 
         mocks = typing.cast(list[str], config.getoption("--scrutinize-func"))
         if mocks is None:
@@ -84,9 +418,41 @@ def pytest_configure(config: pytest.Config):
             }
         plugin_config = Config(
             output_path=output_path,
+            output_format=output_format,
             mocks=frozenset(mocks),
+            mock_patch_mode=config.getoption("--scrutinize-func-patch"),
+            mock_backend=mock_backend,
             enable_gc=enable_gc,
             enable_django_sql=enable_django_sql,
+            enable_sql_fingerprint=config.getoption(
+                "--scrutinize-django-sql-fingerprint"
+            ),
+            sql_repeat_threshold=config.getoption("--scrutinize-django-sql-repeats"),
+            sql_explain_top=config.getoption("--scrutinize-django-sql-explain-top"),
+            sql_recorders=sql_recorders,
+            sql_include_query=config.getoption("--scrutinize-sql-query"),
+            enable_network=config.getoption("--scrutinize-network"),
+            enable_cpu=config.getoption("--scrutinize-cpu"),
+            enable_memory=config.getoption("--scrutinize-memory"),
+            enable_profile=config.getoption("--scrutinize-profile"),
+            enable_hooks=config.getoption("--scrutinize-hooks"),
+            enable_cost=config.getoption("--scrutinize-cost"),
+            enable_collection=config.getoption("--scrutinize-collection"),
+            profile_interval_ns=int(profile_interval_ms * 1_000_000),
+            profile_threshold_ns=int(
+                config.getoption("--scrutinize-profile-threshold") * 1_000_000
+            ),
+            memory_top=config.getoption("--scrutinize-memory-top"),
+            memory_frames=config.getoption("--scrutinize-memory-frames"),
+            memory_sample=memory_sample,
+            overhead=config.getoption("--scrutinize-overhead") or None,
+            mode=mode,
+            sample_rates=sample_rates,
+            sample_top_k=config.getoption("--scrutinize-sample-top-k"),
+            writer=config.getoption("--scrutinize-writer"),
+            writer_queue_size=config.getoption("--scrutinize-writer-queue-size"),
+            xdist_transport=xdist_transport,
+            schedule_path=schedule_path,
         )
 
         plugin_cls: type[DetailedTimingsPlugin]
@@ -107,6 +473,19 @@ def pytest_configure(config: pytest.Config):
 
         plugin = plugin_cls(plugin_config)
         config.pluginmanager.register(plugin, name=__name__)
+        if plugin_config.enable_collection:
+            config.pluginmanager.register(
+                collection.CollectionPlugin(collection.get_tracker(config)),
+                name=f"{__name__}.collection",
+            )
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_load_initial_conftests(early_config: pytest.Config):
+    # The initial conftests are imported before pytest_configure
+    args = early_config.known_args_namespace
+    if args.scrutinize and args.scrutinize_collection:
+        collection.get_tracker(early_config)
 
 
 @pytest.hookimpl(hookwrapper=True)
@@ -121,61 +500,264 @@ def pytest_runtestloop(session: pytest.Session):
 class DetailedTimingsPlugin:
     config: Config
     output: TimingsOutputFile
+    # Where high-frequency timings are sent: the output file, the aggregator or the sampler
+    sink: TimingsSink
+    aggregator: TimingsAggregator | None
+    sampler: TimingsSampler | None
     mock_recorder: MockRecorder
+    overhead: OverheadTracker
+    costs: CostTracker
+    memory: MemoryTracker
+    profiler: StackSampler
+    hooks: HookTracer
+    repeated_sql: RepeatedQueryDetector | None
+    slow_sql: SlowQueryTracker | None
+    sql_recorder: SQLRecorder
+    network: NetworkRecorder
+    # Reported in the terminal summary, as sinks are closed after the last test
+    sink_failures: list[str]
 
     def __init__(self, config: Config):
         self.config = config
+        self.sink_failures = []
+        self.overhead = OverheadTracker(enabled=config.overhead is not None)
+        self.costs = CostTracker(enabled=config.enable_cost)
+        self.output = self.create_output()
+        self.memory = MemoryTracker(
+            output=self.output,
+            enabled=config.enable_memory,
+            top=config.memory_top,
+            frames=config.memory_frames,
+            sample=config.memory_sample,
+        )
+        self.profiler = StackSampler(
+            output=self.output,
+            enabled=config.enable_profile,
+            interval_ns=config.profile_interval_ns,
+            threshold_ns=config.profile_threshold_ns,
+        )
+        self.hooks = HookTracer(output=self.output, enabled=config.enable_hooks)
+        self.repeated_sql = None
+        if (
+            config.enable_django_sql is not None or config.sql_recorders
+        ) and config.enable_sql_fingerprint:
+            self.repeated_sql = RepeatedQueryDetector(
+                output=self.output, threshold=config.sql_repeat_threshold
+            )
+        self.slow_sql = None
+        if config.enable_django_sql == "explain":
+            self.slow_sql = SlowQueryTracker(
+                output=self.output, top=config.sql_explain_top
+            )
+        self.aggregator = None
+        self.sampler = None
+        self.sink = self.output
+        if config.mode == "aggregate":
+            self.aggregator = self.sink = TimingsAggregator(output=self.output)
+        elif config.sample_rates:
+            self.sampler = self.sink = TimingsSampler(
+                output=self.output,
+                rates=config.sample_rates,
+                top_k=config.sample_top_k,
+            )
 
-        temp_dir = Path(tempfile.mkdtemp())
-        temp_output_path = temp_dir / "output.jsonl.gz"
-        self.output = TimingsOutputFile(temp_output_path)
         self.mock_recorder = MockRecorder(
             mocks=config.mocks,
-            output=self.output,
+            output=self.sink,
             enable_django_sql=self.config.enable_django_sql,
+            overhead=self.overhead,
+            patch_mode=config.mock_patch_mode,
+            backend=config.mock_backend,
+            cpu=config.enable_cpu,
+            repeated_sql=self.repeated_sql,
+            slow_sql=self.slow_sql,
+        )
+        self.sql_recorder = SQLRecorder(
+            output=self.sink,
+            recorders=config.sql_recorders,
+            include_sql=config.sql_include_query,
+            repeated_sql=self.repeated_sql,
+        )
+        self.network = NetworkRecorder(
+            output=self.output, enabled=config.enable_network
         )
 
         if config.enable_gc:
             self.setup_gc_callbacks()
 
+    def create_output(self) -> TimingsOutputFile:
+        temp_dir = Path(tempfile.mkdtemp())
+        suffix = OUTPUT_SUFFIXES[self.config.output_format]
+        return TimingsOutputFile(
+            temp_dir / f"output{suffix}",
+            format=self.config.output_format,
+            background=self.config.writer == "thread",
+            queue_size=self.config.writer_queue_size,
+        )
+
     @contextlib.contextmanager
     def run(self, session: pytest.Session) -> typing.Generator[typing.Self, None, None]:
-        with self.output.initialize_writer(), self.mock_recorder.initialize_mocks():
+        with (
+            self.start_sinks(session.config),
+            self.output.initialize_writer(),
+            propagate_to_threads(),
+            self.mock_recorder.initialize_mocks(),
+            self.sql_recorder.initialize(),
+            self.network.initialize(),
+            self.memory.trace(),
+            self.profiler.run(),
+            self.hooks.trace(),
+        ):
             yield self
 
+            if self.aggregator is not None:
+                self.finish_aggregates(self.aggregator)
+            if self.sampler is not None:
+                self.sampler.flush_all()
+            if self.repeated_sql is not None:
+                self.repeated_sql.flush_all()
+            if self.slow_sql is not None:
+                # Normally explained before the last test's teardown
+                self.slow_sql.explain(unblock_django_db(session.config))
+            if self.overhead.enabled:
+                self.output.add_timing(self.overhead.session_timing())
+
         self.create_final_output_file(session)
 
+    @contextlib.contextmanager
+    def start_sinks(self, config: pytest.Config) -> typing.Generator[None, None, None]:
+        dispatcher = SinkDispatcher(config)
+        if not dispatcher.enabled:
+            yield
+            return
+
+        with dispatcher.start():
+            self.output.on_batch = dispatcher.dispatch
+            try:
+                yield
+            finally:
+                self.output.on_batch = None
+
+        if (message := dispatcher.failure_message) is not None:
+            self.sink_failures.append(message)
+
     def create_final_output_file(self, session: pytest.Session):
         shutil.move(src=self.output.path, dst=self.config.output_path)
 
+    def finish_aggregates(self, aggregator: TimingsAggregator):
+        aggregator.flush_all()
+
+    def pytest_terminal_summary(self, terminalreporter: pytest.TerminalReporter):
+        for message in self.sink_failures:
+            terminalreporter.write_line(message, yellow=True)
+
     @pytest.hookimpl(hookwrapper=True)
     def pytest_collection(self, session: pytest.Session):
         with measure_time() as timer:
             yield
 
         self.output.add_timing(CollectionTiming(runtime=timer.elapsed))
+        if self.config.enable_collection:
+            tracker = collection.get_tracker(session.config)
+            for timing in tracker.take_timings():
+                self.output.add_timing(timing)
+
+    @pytest.hookimpl
+    def pytest_plugin_registered(
+        self, plugin: object, manager: pytest.PytestPluginManager
+    ):
+        # Including this plugin, so the time of its own hooks isn't counted in the
+        # implementations that call them
+        self.hooks.trace_plugin(manager, plugin)
+
+    @pytest.hookimpl
+    def pytest_collection_finish(self, session: pytest.Session):
+        self.costs.collect(session.items)
 
     @pytest.hookimpl(hookwrapper=True)
     def pytest_runtest_protocol(self, item: pytest.Item, nextitem: pytest.Item | None):
+        self.costs.start_test()
+        self.hooks.start_test()
         try:
-            yield
+            with self.memory.trace_test(item.nodeid):
+                yield
         finally:
-            self.output.flush_buffer()
+            self.hooks.finish_test(item.nodeid)
+            if self.repeated_sql is not None:
+                self.repeated_sql.flush_test(item.nodeid)
+            with self.overhead.measure("bookkeeping"):
+                if (cost := self.costs.finish_test(item)) is not None:
+                    self.output.add_timing(cost)
+            if self.aggregator is not None:
+                self.aggregator.flush_test(item.nodeid)
+            if self.sampler is not None:
+                self.sampler.flush_test(item.nodeid)
+            with self.overhead.measure("serialization"):
+                self.output.flush_buffer()
+            if self.overhead.enabled:
+                self.output.add_timing(self.overhead.take_timing(test_id=item.nodeid))
+
+    @contextlib.contextmanager
+    def measure_phase(self, phase: Phase) -> typing.Generator[None, None, None]:
+        recording_ns = self.overhead.recording_ns
+        with measure_time() as timer:
+            yield
+        self.costs.phase_done(
+            phase, self.corrected_duration(timer, recording_ns).as_nanoseconds
+        )
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_setup(self, item: pytest.Item):
+        with self.measure_phase("setup"):
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item: pytest.Item):
+        with self.measure_phase("call"):
+            yield
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_teardown(self, item: pytest.Item, nextitem: pytest.Item | None):
+        if nextitem is None and self.slow_sql is not None:
+            # Session scoped fixtures, such as the test database, are torn down next
+            self.slow_sql.explain(unblock_django_db(item.config))
+        with self.measure_phase("teardown"):
+            yield
 
     @pytest.hookimpl(hookwrapper=True)
     def pytest_pyfunc_call(self, pyfuncitem: pytest.Function):
         with self.mock_recorder.record(test_id=pyfuncitem.nodeid, fixture_name=None):
-            with measure_time() as timer:
+            recording_ns = self.overhead.recording_ns
+            with (
+                self.memory.measure(
+                    test_id=pyfuncitem.nodeid, fixture_name=None, phase="call"
+                ),
+                self.profiler.profile(
+                    pyfuncitem.obj, test_id=pyfuncitem.nodeid, fixture_name=None
+                ),
+                measure_time(cpu=self.config.enable_cpu) as timer,
+            ):
                 yield
+            runtime = self.corrected_duration(timer, recording_ns)
+
+        with self.overhead.measure("bookkeeping"):
+            test_timing = TestTiming(
+                name=pyfuncitem.name,
+                test_id=pyfuncitem.nodeid,
+                requires=pyfuncitem.fixturenames,
+                runtime=runtime,
+            )
 
-        test_timing = TestTiming(
-            name=pyfuncitem.name,
-            test_id=pyfuncitem.nodeid,
-            requires=pyfuncitem.fixturenames,
-            runtime=timer.elapsed,
-        )
+            self.output.add_timing(test_timing)
 
-        self.output.add_timing(test_timing)
+    def corrected_duration(self, timer: Timer, recording_ns: int) -> Duration:
+        # Optionally subtract the overhead recorded since `recording_ns` was read
+        duration = timer.elapsed
+        if self.config.overhead == "correct":
+            elapsed_ns = duration.as_nanoseconds
+            elapsed_ns -= self.overhead.recording_ns - recording_ns
+            duration.as_nanoseconds = max(elapsed_ns, 0)
+        return duration
 
     @pytest.hookimpl(hookwrapper=True)
     def pytest_fixture_setup(self, fixturedef: "FixtureDef", request: "SubRequest"):
@@ -185,32 +767,40 @@ class DetailedTimingsPlugin:
         # Don't associate non-function scoped fixtures with a given test
         test_id = request.node.nodeid if is_function_scope else None
 
-        setup_timer: Timer
-        teardown_timer: Timer | None = None
+        setup_duration: Duration
+        teardown_duration: Duration | None = None
 
         def fixture_done():
-            nonlocal setup_timer, teardown_timer
-            teardown_duration_ns = (
-                teardown_timer.elapsed if teardown_timer is not None else None
-            )
-
-            self.output.add_timing(
-                FixtureTiming(
-                    name=full_name,
-                    short_name=fixturedef.func.__qualname__,
-                    test_id=test_id,
-                    scope=request.scope,
-                    setup=setup_timer.elapsed,
-                    teardown=teardown_duration_ns,
+            with self.overhead.measure("bookkeeping"):
+                self.output.add_timing(
+                    FixtureTiming(
+                        name=full_name,
+                        short_name=fixturedef.func.__qualname__,
+                        test_id=test_id,
+                        scope=request.scope,
+                        argname=fixturedef.argname,
+                        baseid=fixturedef.baseid,
+                        setup=setup_duration,
+                        teardown=teardown_duration,
+                    )
                 )
-            )
 
         fixturedef.addfinalizer(fixture_done)
 
         if not is_generator_fixture(fixturedef.func):
             with self.mock_recorder.record(test_id=test_id, fixture_name=full_name):
-                with measure_time() as setup_timer:
+                recording_ns = self.overhead.recording_ns
+                with (
+                    self.memory.measure(
+                        test_id=test_id, fixture_name=full_name, phase="setup"
+                    ),
+                    self.profiler.profile(
+                        fixturedef.func, test_id=test_id, fixture_name=full_name
+                    ),
+                    measure_time(cpu=self.config.enable_cpu) as setup_timer,
+                ):
                     yield
+                setup_duration = self.corrected_duration(setup_timer, recording_ns)
         else:
             # We want to capture the teardown times for fixtures. This is non-trivial as
             # pytest exposes no hooks to allow you to do this.
@@ -220,28 +810,57 @@ class DetailedTimingsPlugin:
             # will be the `record_teardown_finish` finalizer, and the first will be the `record_teardown_start`.
 
             teardown_mock_capture: typing.ContextManager | None = None
-            teardown_timer = Timer()
+            teardown_memory_capture: typing.ContextManager | None = None
+            teardown_timer = Timer(cpu=self.config.enable_cpu)
+            teardown_recording_ns = 0
 
             def teardown_fixture_start():
-                nonlocal teardown_mock_capture
+                nonlocal teardown_mock_capture, teardown_memory_capture
+                nonlocal teardown_recording_ns
                 teardown_mock_capture = self.mock_recorder.record(
                     test_id=test_id, fixture_name=full_name
                 )
                 teardown_mock_capture.__enter__()
+                teardown_recording_ns = self.overhead.recording_ns
+                teardown_memory_capture = self.memory.measure(
+                    test_id=test_id, fixture_name=full_name, phase="teardown"
+                )
+                teardown_memory_capture.__enter__()
                 teardown_timer.__enter__()
 
             def teardown_fixture_finish():
+                nonlocal teardown_duration
                 teardown_timer.__exit__(None, None, None)
+                if teardown_memory_capture is not None:
+                    teardown_memory_capture.__exit__(None, None, None)
                 if teardown_mock_capture is not None:
+                    teardown_duration = self.corrected_duration(
+                        teardown_timer, teardown_recording_ns
+                    )
+                    self.costs.fixture_teardown(
+                        fixturedef, teardown_duration.as_nanoseconds
+                    )
                     teardown_mock_capture.__exit__(None, None, None)
 
             fixturedef.addfinalizer(teardown_fixture_finish)
             with self.mock_recorder.record(test_id=test_id, fixture_name=full_name):
-                with measure_time() as setup_timer:
+                recording_ns = self.overhead.recording_ns
+                with (
+                    self.memory.measure(
+                        test_id=test_id, fixture_name=full_name, phase="setup"
+                    ),
+                    self.profiler.profile(
+                        fixturedef.func, test_id=test_id, fixture_name=full_name
+                    ),
+                    measure_time(cpu=self.config.enable_cpu) as setup_timer,
+                ):
                     yield
+                setup_duration = self.corrected_duration(setup_timer, recording_ns)
 
             fixturedef.addfinalizer(teardown_fixture_start)
 
+        self.costs.fixture_setup(fixturedef, setup_duration.as_nanoseconds)
+
     def setup_gc_callbacks(self):
         gc_timer = Timer()
 
@@ -251,12 +870,13 @@ class DetailedTimingsPlugin:
             else:
                 gc_timer.stop()
 
-                self.output.add_timing(
-                    GCTiming(
-                        runtime=gc_timer.elapsed,
-                        collected_count=info["collected"],
-                        generation=info["generation"],
+                with self.overhead.measure("recording"):
+                    self.sink.add_timing(
+                        GCRecord(
+                            runtime_ns=gc_timer.elapsed_ns,
+                            collected_count=info["collected"],
+                            generation=info["generation"],
+                        )
                     )
-                )
 
         gc.callbacks.append(gc_callback)
@@ -1,5 +1,5 @@
+import contextlib
 import os
-import shutil
 import typing
 
 from pathlib import Path
@@ -8,10 +8,12 @@ from typing import Any, Sequence
 import pytest
 
 from pytest_scrutinize.plugin import DetailedTimingsPlugin
-from pytest_scrutinize.data import WorkerTiming, Meta
+from pytest_scrutinize.aggregate import TimingsAggregator
+from pytest_scrutinize.data import WorkerTiming, Meta, AggregateTiming, MergeTiming
 
-from pytest_scrutinize.timer import Timer
-from .io import TimingsOutputFile
+from pytest_scrutinize.timer import Timer, measure_time
+from .io import FileTimingsWriter, TimingsOutputFile
+from .stream import ChannelReceiver, ChannelTimingsOutput
 
 if typing.TYPE_CHECKING:
     from .plugin import Config
@@ -31,22 +33,60 @@ def is_master() -> bool:
 
 
 _worker_output_key = f"{__name__}.output"
+_worker_aggregates_key = f"{__name__}.aggregates"
+_worker_channel_key = f"{__name__}.channel"
+_worker_sink_failures_key = f"{__name__}.sink_failures"
 
 
 class XDistWorkerDetailedTimingsPlugin(DetailedTimingsPlugin):
+    session_aggregates: list[AggregateTiming]
+
+    def __init__(self, config: "Config"):
+        super().__init__(config=config)
+        self.session_aggregates = []
+
+    def create_output(self) -> TimingsOutputFile:
+        if self.config.xdist_transport != "channel":
+            return super().create_output()
+        # Timings are sent to the master, so nothing is written to a temporary file
+        return ChannelTimingsOutput(
+            background=self.config.writer == "thread",
+            queue_size=self.config.writer_queue_size,
+        )
+
+    @contextlib.contextmanager
+    def run(self, session: pytest.Session) -> typing.Generator[typing.Self, None, None]:
+        if isinstance(self.output, ChannelTimingsOutput):
+            workerinput = session.config.workerinput  # type: ignore[attr-defined]
+            self.output.channel = workerinput[_worker_channel_key]
+        with super().run(session) as plugin:
+            yield plugin
+
     @pytest.hookimpl()
     def pytest_sessionfinish(self, session: pytest.Session, exitstatus: int):
         if workeroutput := getattr(session.config, "workeroutput", None):
-            workeroutput[_worker_output_key] = str(self.output.path.absolute())
+            if not isinstance(self.output, ChannelTimingsOutput):
+                workeroutput[_worker_output_key] = str(self.output.path.absolute())
+            workeroutput[_worker_aggregates_key] = [
+                timing.model_dump(mode="json") for timing in self.session_aggregates
+            ]
+            workeroutput[_worker_sink_failures_key] = self.sink_failures
 
     def create_final_output_file(self, session: pytest.Session):
         return
 
+    def finish_aggregates(self, aggregator: TimingsAggregator):
+        # Aggregates that are not tied to a test, such as those from session and module
+        # scoped fixtures, are merged with those from other workers by the master.
+        self.session_aggregates = aggregator.take_timings(test_id=None)
+        aggregator.flush_all()
+
 
 class XDistMasterDetailedTimingsPlugin(DetailedTimingsPlugin):
     setup_nodes_timer: Timer
     worker_timings: dict[str, WorkerTiming]
     worker_output_files: list[Path]
+    receiver: ChannelReceiver
 
     def __init__(self, config: "Config"):
         super().__init__(config=config)
@@ -54,6 +94,32 @@ class XDistMasterDetailedTimingsPlugin(DetailedTimingsPlugin):
         self.setup_nodes_timer = Timer()
         self.worker_timings = {}
         self.worker_output_files = []
+        self.receiver = ChannelReceiver()
+
+    @contextlib.contextmanager
+    def run(self, session: pytest.Session) -> typing.Generator[typing.Self, None, None]:
+        with super().run(session) as plugin, self.receiver.attach(self.output):
+            yield plugin
+
+    @pytest.hookimpl(optionalhook=True, tryfirst=True)
+    def pytest_xdist_make_scheduler(self, config: pytest.Config, log: Any):
+        if self.config.schedule_path is None:
+            return None
+        if config.getvalue("dist") != "load":
+            return None
+
+        from .schedule import ScheduleHistory
+        from .schedule_xdist import ScrutinizeScheduling
+
+        history = ScheduleHistory.load(self.config.schedule_path)
+        return ScrutinizeScheduling(config, log, history)
+
+    @pytest.hookimpl()
+    def pytest_configure_node(self, node: "WorkerController"):
+        if self.config.xdist_transport == "channel":
+            channel = node.gateway.newchannel()
+            node.workerinput[_worker_channel_key] = channel
+            self.receiver.connect(channel)
 
     @pytest.hookimpl()
     def pytest_xdist_setupnodes(self, config: pytest.Config, specs: Sequence[Any]):
@@ -70,13 +136,27 @@ class XDistMasterDetailedTimingsPlugin(DetailedTimingsPlugin):
         )
 
     def create_final_output_file(self, session: pytest.Session):
-        final_output_file = TimingsOutputFile(path=self.config.output_path)
+        if self.config.xdist_transport == "channel":
+            # Timings from workers were appended as they arrived, so there is nothing
+            # to merge
+            super().create_final_output_file(session)
+            return
+
+        final_output_file = TimingsOutputFile(
+            path=self.config.output_path, format=self.config.output_format
+        )
         files_to_combine = [self.output.path] + self.worker_output_files
 
         with final_output_file.initialize_writer() as output_writer:
-            for input_path in files_to_combine:
-                with TimingsOutputFile(path=input_path).get_reader() as output_reader:
-                    shutil.copyfileobj(fsrc=output_reader, fdst=output_writer)
+            assert isinstance(output_writer, FileTimingsWriter)
+            # Output files are appended as-is, without being decoded and re-encoded
+            with measure_time() as timer:
+                for input_path in files_to_combine:
+                    output_writer.copy_from(input_path)
+
+            final_output_file.add_timing(
+                MergeTiming(files_merged=len(files_to_combine), runtime=timer.elapsed)
+            )
 
     def pytest_testnodedown(self, node: "WorkerController", error: Any):
         if workeroutput := getattr(node, "workeroutput", None):
@@ -88,3 +168,12 @@ class XDistMasterDetailedTimingsPlugin(DetailedTimingsPlugin):
 
             if output_path := workeroutput.get(_worker_output_key, None):
                 self.worker_output_files.append(Path(output_path))
+
+            for message in workeroutput.get(_worker_sink_failures_key, []):
+                self.sink_failures.append(f"[{worker_id}] {message}")
+
+            if self.aggregator is not None:
+                for aggregate in workeroutput.get(_worker_aggregates_key, []):
+                    self.aggregator.merge_timing(
+                        AggregateTiming.model_validate(aggregate)
+                    )
@@ -0,0 +1,168 @@
+import collections
+import contextlib
+import sys
+import threading
+import types
+import typing
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .data import ProfileStack, ProfileTiming
+from .report import iter_timings
+from .timer import Duration, perf_ns
+
+if typing.TYPE_CHECKING:
+    from .io import TimingsOutputFile
+
+# With `--scrutinize-profile`, a background thread samples the stack of the thread running
+# the tests at a fixed interval, while a test is called or a fixture is set up. Samples are
+# counted per collapsed stack (`outer;inner;leaf`), the format used by flamegraph tools,
+# and written as one `profile` record per test call or fixture setup.
+#
+# Stacks start at the test or fixture function: frames above it (pytest and pluggy) are
+# dropped. A fixture set up inside another fixture or a test (`request.getfixturevalue`) is
+# profiled on its own, so its samples are not included in the outer block.
+#
+# Python switches threads at most every `sys.getswitchinterval()` (5ms by default) while the
+# test thread is busy, so intervals below that are not honoured for CPU-bound code.
+
+PROFILE_INTERVAL_NS = 5_000_000
+# Deeper stacks are truncated at the leaf
+MAX_DEPTH = 128
+
+
+def frame_label(code: types.CodeType, module: str) -> str:
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{module}.{name}"
+
+
+@dataclass
+class _Block:
+    thread_id: int
+    # The function called by pytest: stacks are cut above it
+    root_code: types.CodeType | None
+    start_ns: int
+    samples: collections.Counter[str] = field(default_factory=collections.Counter)
+
+
+@dataclass
+class StackSampler:
+    output: "TimingsOutputFile"
+    enabled: bool = False
+    interval_ns: int = PROFILE_INTERVAL_NS
+    # Blocks shorter than this do not keep their samples
+    threshold_ns: int = 0
+
+    _stack: list[_Block] = field(default_factory=list)
+    _labels: dict[types.CodeType, str] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+    _stop: threading.Event = field(default_factory=threading.Event)
+
+    @contextlib.contextmanager
+    def run(self) -> typing.Generator[None, None, None]:
+        if not self.enabled:
+            yield
+            return
+
+        self._stop.clear()
+        thread = threading.Thread(
+            target=self._run, name="scrutinize-profiler", daemon=True
+        )
+        thread.start()
+        try:
+            yield
+        finally:
+            self._stop.set()
+            thread.join()
+
+    def _run(self):
+        interval = self.interval_ns / 1_000_000_000
+        while not self._stop.wait(interval):
+            with self._lock:
+                if self._stack:
+                    self._sample(self._stack[-1])
+
+    def _label(self, frame: types.FrameType) -> str:
+        code = frame.f_code
+        if (label := self._labels.get(code)) is None:
+            label = self._labels[code] = frame_label(
+                code, frame.f_globals.get("__name__", "?")
+            )
+        return label
+
+    def _sample(self, block: _Block):
+        frame = sys._current_frames().get(block.thread_id)
+        labels = []
+        while frame is not None and len(labels) < MAX_DEPTH:
+            labels.append(self._label(frame))
+            if frame.f_code is block.root_code:
+                break
+            frame = frame.f_back
+        else:
+            if frame is not None:
+                # Truncated: the root of the stack was not reached
+                labels.append("...")
+        if labels:
+            block.samples[";".join(reversed(labels))] += 1
+
+    @contextlib.contextmanager
+    def profile(
+        self,
+        func: typing.Any,
+        test_id: str | None,
+        fixture_name: str | None,
+    ) -> typing.Generator[None, None, None]:
+        if not self.enabled:
+            yield
+            return
+
+        block = _Block(
+            thread_id=threading.get_ident(),
+            root_code=getattr(getattr(func, "__func__", func), "__code__", None),
+            start_ns=perf_ns(),
+        )
+        with self._lock:
+            self._stack.append(block)
+        try:
+            yield
+        finally:
+            with self._lock:
+                while self._stack and self._stack.pop() is not block:
+                    pass
+            self.finish(block, test_id=test_id, fixture_name=fixture_name)
+
+    def finish(self, block: _Block, test_id: str | None, fixture_name: str | None):
+        runtime_ns = perf_ns() - block.start_ns
+        if not block.samples or runtime_ns < self.threshold_ns:
+            return
+        self.output.add_timing(
+            ProfileTiming(
+                test_id=test_id,
+                fixture_name=fixture_name,
+                interval=Duration(as_nanoseconds=self.interval_ns),
+                samples=sum(block.samples.values()),
+                stacks=[
+                    ProfileStack(stack=stack, count=count)
+                    for stack, count in block.samples.most_common()
+                ],
+            )
+        )
+
+
+def collapse_profiles(
+    path: Path, test_id_prefix: str | None = None
+) -> collections.Counter[str]:
+    """Merges the profiles in an output file, rooted at their test ID and fixture name"""
+    stacks: collections.Counter[str] = collections.Counter()
+    for timing in iter_timings(path, types=frozenset({b"profile"})):
+        test_id = timing["test_id"]
+        if test_id_prefix is not None and not (test_id or "").startswith(
+            test_id_prefix
+        ):
+            continue
+        root = test_id or "<session>"
+        if timing["fixture_name"] is not None:
+            root = f"{root};{timing['fixture_name']}"
+        for stack in timing["stacks"]:
+            stacks[f"{root};{stack['stack']}"] += stack["count"]
+    return stacks
@@ -0,0 +1,181 @@
+import abc
+import functools
+import hashlib
+import threading
+from datetime import datetime, UTC
+
+from .data import (
+    BaseTiming,
+    Meta,
+    MockTiming,
+    DjangoSQLTiming,
+    GCTiming,
+    get_worker_field_default,
+)
+from .timer import Duration, time_ns
+
+# Timings recorded from hot paths (recorded functions, SQL queries and garbage collections) can
+# be created hundreds of thousands of times per run. Building and validating a Pydantic model
+# for each of these skews the timings we are trying to measure, so these paths instead create
+# lightweight records that are only converted to the models in `data.py` when they are written.
+
+
+@functools.cache
+def cached_worker_id() -> str:
+    return get_worker_field_default()
+
+
+def hash_query(query: str | bytes) -> tuple[str, str]:
+    """Returns the sha256 hash of a SQL query, along with the query as a string"""
+    if isinstance(query, str):
+        query_str, query = query, query.encode()
+    else:
+        query_str = query.decode()
+    return hashlib.sha256(query, usedforsecurity=False).hexdigest(), query_str
+
+
+def _datetime_from_ns(timestamp_ns: int) -> datetime:
+    # Matches the microsecond truncation of `datetime.now()`
+    seconds, nanoseconds = divmod(timestamp_ns, 1_000_000_000)
+    return datetime.fromtimestamp(seconds, tz=UTC).replace(
+        microsecond=nanoseconds // 1_000
+    )
+
+
+class TimingRecord(abc.ABC):
+    __slots__ = ("worker", "recorded_at_ns", "thread_name", "sample_weight")
+
+    def __init__(self):
+        self.worker = cached_worker_id()
+        self.recorded_at_ns = time_ns()
+        self.thread_name = threading.current_thread().name
+        # Set by the sampler to the number of events this record represents
+        self.sample_weight = 1.0
+
+    def meta(self) -> Meta:
+        return Meta(
+            worker=self.worker,
+            recorded_at=_datetime_from_ns(self.recorded_at_ns),
+            thread_name=self.thread_name,
+        )
+
+    @abc.abstractmethod
+    def to_timing(self) -> BaseTiming: ...
+
+
+class MockRecord(TimingRecord):
+    __slots__ = (
+        "name",
+        "test_id",
+        "fixture_name",
+        "runtime_ns",
+        "process_time_ns",
+        "thread_time_ns",
+        "exception",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        test_id: str | None,
+        fixture_name: str | None,
+        runtime_ns: int,
+        exception: bool = False,
+    ):
+        super().__init__()
+        self.name = name
+        self.test_id = test_id
+        self.fixture_name = fixture_name
+        self.runtime_ns = runtime_ns
+        self.exception = exception
+        # Set by the recorder with --scrutinize-cpu
+        self.process_time_ns: int | None = None
+        self.thread_time_ns: int | None = None
+
+    def duration(self) -> Duration:
+        return Duration(
+            as_nanoseconds=self.runtime_ns,
+            process_time_ns=self.process_time_ns,
+            thread_time_ns=self.thread_time_ns,
+        )
+
+    def to_timing(self) -> MockTiming:
+        return MockTiming(
+            meta=self.meta(),
+            name=self.name,
+            test_id=self.test_id,
+            fixture_name=self.fixture_name,
+            runtime=self.duration(),
+            sample_weight=self.sample_weight,
+            exception=self.exception,
+        )
+
+
+class DjangoSQLRecord(MockRecord):
+    __slots__ = (
+        "query",
+        "include_sql",
+        "fingerprint",
+        "alias",
+        "row_count",
+        "executemany",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        test_id: str | None,
+        fixture_name: str | None,
+        runtime_ns: int,
+        query: str | bytes,
+        include_sql: bool,
+        fingerprint: str | None = None,
+        alias: str | None = None,
+        row_count: int | None = None,
+        executemany: bool = False,
+    ):
+        super().__init__(name, test_id, fixture_name, runtime_ns)
+        self.query = query
+        self.include_sql = include_sql
+        self.fingerprint = fingerprint
+        self.alias = alias
+        self.row_count = row_count
+        self.executemany = executemany
+
+    def to_timing(self) -> DjangoSQLTiming:
+        # Hashing is deferred until the record is written
+        sql_hash, query_str = hash_query(self.query)
+
+        return DjangoSQLTiming(
+            meta=self.meta(),
+            name=self.name,
+            test_id=self.test_id,
+            fixture_name=self.fixture_name,
+            runtime=self.duration(),
+            sql_hash=sql_hash,
+            sql=query_str if self.include_sql else None,
+            fingerprint=self.fingerprint,
+            alias=self.alias,
+            row_count=self.row_count,
+            executemany=self.executemany,
+            sample_weight=self.sample_weight,
+        )
+
+
+class GCRecord(TimingRecord):
+    __slots__ = ("runtime_ns", "collected_count", "generation")
+
+    def __init__(self, runtime_ns: int, collected_count: int, generation: int):
+        super().__init__()
+        self.runtime_ns = runtime_ns
+        self.collected_count = collected_count
+        self.generation = generation
+
+    def to_timing(self) -> GCTiming:
+        return GCTiming(
+            meta=self.meta(),
+            runtime=Duration(as_nanoseconds=self.runtime_ns),
+            collected_count=self.collected_count,
+            generation=self.generation,
+            sample_weight=self.sample_weight,
+        )
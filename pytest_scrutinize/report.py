@@ -0,0 +1,267 @@
+import collections
+import gzip
+import heapq
+import itertools
+import json
+import re
+import typing
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# Reports are built by streaming an output file one line at a time. Only the `type` of each
+# line is inspected up front, and lines that no report needs are skipped without being
+# parsed. Lines that are needed are parsed with `json.loads` rather than validated against
+# the Pydantic models, and only summary state is kept in memory: bounded heaps for the
+# "top N" tables and counters keyed by fixture name, SQL hash or GC generation.
+
+# Pydantic serializes without whitespace, and a quote inside a string value is always
+# escaped, so the first match is always the top-level `type` field.
+_TYPE_RE = re.compile(rb'"type":"([a-z-]+)"')
+
+REPORT_TYPES = frozenset({b"test", b"fixture", b"django-sql", b"gc", b"aggregate"})
+
+# Timings of a single test are written together, so the SQL queries of a test only need to
+# be counted until a number of other tests have been seen since.
+_MAX_OPEN_TESTS = 256
+
+T = typing.TypeVar("T")
+
+
+def iter_timings(
+    path: Path, types: frozenset[bytes] = REPORT_TYPES
+) -> typing.Iterator[dict[str, typing.Any]]:
+    with gzip.open(path, mode="rb") as fd:
+        for line in fd:
+            match = _TYPE_RE.search(line)
+            if match is None or match.group(1) not in types:
+                continue
+            yield json.loads(line)
+
+
+@dataclass
+class TopN(typing.Generic[T]):
+    size: int
+    _heap: list[tuple[float, int, T]] = field(default_factory=list)
+    _sequence: typing.Iterator[int] = field(default_factory=itertools.count)
+
+    def add(self, value: float, item: T):
+        entry = (value, next(self._sequence), item)
+        if len(self._heap) < self.size:
+            heapq.heappush(self._heap, entry)
+        elif entry > self._heap[0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def items(self) -> list[tuple[float, T]]:
+        return [
+            (value, item)
+            for value, _, item in sorted(self._heap, key=lambda e: (-e[0], e[1]))
+        ]
+
+
+@dataclass
+class FixtureStats:
+    count: int = 0
+    total_ns: int = 0
+
+
+@dataclass
+class GCStats:
+    count: float = 0
+    total_ns: float = 0
+    max_ns: int = 0
+
+
+@dataclass
+class Report:
+    top: int = 10
+
+    slowest_tests: TopN[str] = field(init=False)
+    # (name, test_id, setup_ns, teardown_ns)
+    slowest_fixtures: TopN[tuple[str, str | None, int, int | None]] = field(init=False)
+    fixtures: dict[str, FixtureStats] = field(
+        default_factory=lambda: collections.defaultdict(FixtureStats)
+    )
+    # (test_id, duplicate queries, distinct queries that were duplicated). Sampled queries
+    # are counted by their sample weight, so the number of duplicates is an estimate
+    duplicate_sql: TopN[tuple[str, float, int]] = field(init=False)
+    gc: dict[int, GCStats] = field(
+        default_factory=lambda: collections.defaultdict(GCStats)
+    )
+
+    _open_tests: collections.OrderedDict[str, dict[str, float]] = field(
+        default_factory=collections.OrderedDict
+    )
+
+    def __post_init__(self):
+        self.slowest_tests = TopN(self.top)
+        self.slowest_fixtures = TopN(self.top)
+        self.duplicate_sql = TopN(self.top)
+
+    def add(self, timing: dict[str, typing.Any]):
+        # Omitted when the timing wasn't sampled
+        weight = timing.get("sample_weight", 1)
+        match timing["type"]:
+            case "test":
+                self.slowest_tests.add(
+                    timing["runtime"]["as_nanoseconds"], timing["test_id"]
+                )
+            case "fixture":
+                self.add_fixture(timing)
+            case "django-sql":
+                self.add_sql(timing["test_id"], timing["sql_hash"], weight)
+            case "gc":
+                self.add_gc(
+                    timing["generation"],
+                    count=weight,
+                    total_ns=timing["runtime"]["as_nanoseconds"] * weight,
+                    max_ns=timing["runtime"]["as_nanoseconds"],
+                )
+            case "aggregate":
+                self.add_aggregate(timing)
+
+    def add_fixture(self, timing: dict[str, typing.Any]):
+        setup_ns = timing["setup"]["as_nanoseconds"]
+        teardown_ns = (
+            timing["teardown"]["as_nanoseconds"] if timing["teardown"] else None
+        )
+        runtime_ns = setup_ns + (teardown_ns or 0)
+        self.slowest_fixtures.add(
+            runtime_ns, (timing["name"], timing["test_id"], setup_ns, teardown_ns)
+        )
+        stats = self.fixtures[timing["name"]]
+        stats.count += 1
+        stats.total_ns += runtime_ns
+
+    def add_sql(self, test_id: str | None, sql_hash: str, count: float):
+        # Queries made by session and module scoped fixtures are not tied to a test
+        if test_id is None:
+            return
+        if (counter := self._open_tests.get(test_id)) is None:
+            counter = self._open_tests[test_id] = collections.defaultdict(float)
+            if len(self._open_tests) > _MAX_OPEN_TESTS:
+                self._close_test(*self._open_tests.popitem(last=False))
+        else:
+            self._open_tests.move_to_end(test_id)
+        counter[sql_hash] += count
+
+    def _close_test(self, test_id: str, counter: dict[str, float]):
+        duplicated = [count for count in counter.values() if count > 1]
+        if duplicated:
+            duplicates = sum(duplicated) - len(duplicated)
+            self.duplicate_sql.add(duplicates, (test_id, duplicates, len(duplicated)))
+
+    def add_gc(self, generation: int, count: float, total_ns: float, max_ns: int):
+        stats = self.gc[generation]
+        stats.count += count
+        stats.total_ns += total_ns
+        stats.max_ns = max(stats.max_ns, max_ns)
+
+    def add_aggregate(self, timing: dict[str, typing.Any]):
+        match timing["source"]:
+            case "django-sql":
+                self.add_sql(timing["test_id"], timing["sql_hash"], timing["count"])
+            case "gc":
+                self.add_gc(
+                    int(timing["name"].removeprefix("gen")),
+                    count=timing["count"],
+                    total_ns=timing["total"]["as_nanoseconds"],
+                    max_ns=timing["max"]["as_nanoseconds"],
+                )
+
+    def finish(self):
+        while self._open_tests:
+            self._close_test(*self._open_tests.popitem(last=False))
+
+    def render(self) -> str:
+        sections = [
+            _table(
+                f"Slowest {self.top} tests",
+                ["duration", "test"],
+                [
+                    (_ms(runtime_ns), test_id)
+                    for runtime_ns, test_id in self.slowest_tests.items()
+                ],
+            ),
+            _table(
+                f"Slowest {self.top} fixtures",
+                ["duration", "setup", "teardown", "fixture", "test"],
+                [
+                    (
+                        _ms(runtime_ns),
+                        _ms(setup_ns),
+                        _ms(teardown_ns) if teardown_ns is not None else "-",
+                        name,
+                        test_id or "-",
+                    )
+                    for runtime_ns, (name, test_id, setup_ns, teardown_ns) in (
+                        self.slowest_fixtures.items()
+                    )
+                ],
+            ),
+            _table(
+                f"Top {self.top} fixtures by total duration",
+                ["total", "count", "mean", "fixture"],
+                [
+                    (
+                        _ms(stats.total_ns),
+                        str(stats.count),
+                        _ms(stats.total_ns / stats.count),
+                        name,
+                    )
+                    for name, stats in heapq.nlargest(
+                        self.top,
+                        self.fixtures.items(),
+                        key=lambda item: item[1].total_ns,
+                    )
+                ],
+            ),
+            _table(
+                f"Top {self.top} tests by duplicate SQL queries",
+                ["duplicates", "queries", "test"],
+                [
+                    (f"{duplicates:.0f}", str(queries), test_id)
+                    for _, (test_id, duplicates, queries) in self.duplicate_sql.items()
+                ],
+            ),
+            _table(
+                "Garbage collection",
+                ["generation", "count", "total", "max"],
+                [
+                    (
+                        str(generation),
+                        f"{stats.count:.0f}",
+                        _ms(stats.total_ns),
+                        _ms(stats.max_ns),
+                    )
+                    for generation, stats in sorted(self.gc.items())
+                ],
+            ),
+        ]
+        return "\n\n".join(sections) + "\n"
+
+
+def build_report(path: Path, top: int = 10) -> Report:
+    report = Report(top=top)
+    for timing in iter_timings(path):
+        report.add(timing)
+    report.finish()
+    return report
+
+
+def _ms(value_ns: float) -> str:
+    return f"{value_ns / 1_000_000:.3f}ms"
+
+
+def _table(title: str, headers: list[str], rows: list[tuple[str, ...]]) -> str:
+    if not rows:
+        return f"{title}\n  (no data)"
+    widths = [
+        max(len(header), *(len(row[idx]) for row in rows))
+        for idx, header in enumerate(headers)
+    ]
+    lines = [title]
+    for row in [tuple(headers), *rows]:
+        # The last column is left-aligned and not padded, as it is usually a long name
+        cells = [value.rjust(width) for value, width in zip(row[:-1], widths)]
+        lines.append("  " + "  ".join([*cells, row[-1]]))
+    return "\n".join(lines)
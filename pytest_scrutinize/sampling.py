@@ -0,0 +1,106 @@
+import heapq
+import itertools
+import random
+import typing
+from dataclasses import dataclass, field
+
+from .io import TimingsSink
+from .records import TimingRecord, MockRecord, GCRecord
+from .scope import get_scope
+
+if typing.TYPE_CHECKING:
+    from .data import BaseTiming
+
+# With `--scrutinize-sample`, high-frequency timings from the given sources (a recorded
+# function name, `django_sql` or `gc`) are sampled rather than written in full. For each
+# (source, test_id, fixture_name) key, the `top_k` slowest events are always kept. Every
+# other event is kept with the configured probability and carries a `sample_weight` of
+# 1 / rate, so that `sum(runtime * sample_weight)` estimates the unsampled total.
+#
+# Each key has its own random number generator seeded from the key, so the same run
+# samples the same events regardless of what else ran in the session or on the worker.
+
+SampleKey = tuple[str, str | None, str | None]
+
+
+def parse_sample_rate(value: str) -> tuple[str, float]:
+    """Parses a `source=rate` argument"""
+    source, sep, rate_str = value.rpartition("=")
+    if not sep or not source.strip():
+        raise ValueError(f"Invalid sample rate {value!r}, expected source=rate")
+    try:
+        rate = float(rate_str)
+    except ValueError:
+        raise ValueError(f"Invalid sample rate {value!r}: {rate_str!r} is not a number")
+    if not 0 < rate <= 1:
+        raise ValueError(f"Invalid sample rate {value!r}: must be between 0 and 1")
+    return source.strip(), rate
+
+
+@dataclass(slots=True)
+class Reservoir:
+    rng: random.Random
+    # Min-heap of (runtime_ns, sequence, record), holding the slowest events seen so far
+    slowest: list[tuple[int, int, TimingRecord]] = field(default_factory=list)
+
+
+@dataclass
+class TimingsSampler:
+    output: TimingsSink
+    rates: dict[str, float]
+    top_k: int = 10
+
+    # Reservoirs grouped by test ID, so that a single test can be flushed cheaply
+    reservoirs: dict[str | None, dict[SampleKey, Reservoir]] = field(
+        default_factory=dict
+    )
+    _sequence: typing.Iterator[int] = field(default_factory=itertools.count)
+
+    def add_timing(self, timing: "BaseTiming | TimingRecord"):
+        match timing:
+            case MockRecord():
+                source = timing.name
+                test_id, fixture_name = timing.test_id, timing.fixture_name
+            case GCRecord():
+                source = "gc"
+                test_id, fixture_name = get_scope() or (None, None)
+            case _:
+                self.output.add_timing(timing)
+                return
+
+        if (rate := self.rates.get(source)) is None:
+            self.output.add_timing(timing)
+            return
+
+        reservoir = self._get_reservoir((source, test_id, fixture_name))
+        entry = (timing.runtime_ns, next(self._sequence), timing)
+        if len(reservoir.slowest) < self.top_k:
+            heapq.heappush(reservoir.slowest, entry)
+            return
+        if reservoir.slowest and entry > reservoir.slowest[0]:
+            # This event is one of the slowest: sample the one it replaces instead
+            entry = heapq.heapreplace(reservoir.slowest, entry)
+
+        if reservoir.rng.random() < rate:
+            record = entry[2]
+            record.sample_weight = 1 / rate
+            self.output.add_timing(record)
+
+    def _get_reservoir(self, key: SampleKey) -> Reservoir:
+        test_reservoirs = self.reservoirs.setdefault(key[1], {})
+        if (reservoir := test_reservoirs.get(key)) is None:
+            source, test_id, fixture_name = key
+            reservoir = test_reservoirs[key] = Reservoir(
+                rng=random.Random(f"{source}\0{test_id}\0{fixture_name}")
+            )
+        return reservoir
+
+    def flush_test(self, test_id: str | None):
+        for reservoir in self.reservoirs.pop(test_id, {}).values():
+            # Written in the order they were recorded
+            for _, _, record in sorted(reservoir.slowest, key=lambda e: e[1]):
+                self.output.add_timing(record)
+
+    def flush_all(self):
+        for test_id in list(self.reservoirs):
+            self.flush_test(test_id)
@@ -0,0 +1,85 @@
+import collections
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .report import iter_timings
+
+# (argname, baseid) of a fixture definition
+FixtureKey = tuple[str, str]
+
+# With `--scrutinize-schedule`, tests are distributed across pytest-xdist workers using the
+# durations recorded in a previous output file. The scheduler itself is in `schedule_xdist`,
+# as it requires pytest-xdist.
+#
+# Tests are grouped into work units. A test that uses an expensive module, class or package
+# scoped fixture is grouped with every other test in its module, so that the fixture is only
+# set up once. Other tests are a unit of their own. Whenever a worker needs more work, it is
+# given the longest unit that is left (longest-processing-time-first), which keeps the
+# workers finishing at roughly the same time.
+#
+# Session scoped fixtures are set up once per worker, so tests that use an expensive one are
+# preferably given to a worker that has already set it up.
+#
+# Fixtures are identified by their argname and the node ID they are defined in (`baseid`),
+# since tests only record the argnames they use. Like pytest, a test uses the most specific
+# fixture of that name defined in one of its parents.
+
+# Shared fixtures that took less than this in the previous run are not worth grouping for
+SHARED_FIXTURE_THRESHOLD_NS = 100_000_000
+
+
+@dataclass
+class ScheduleHistory:
+    # Duration of each test, including its function scoped fixtures
+    test_ns: collections.Counter[str] = field(default_factory=collections.Counter)
+    # Fixtures used by each test, by argname
+    requires: dict[str, list[str]] = field(default_factory=dict)
+    # (scope, duration) of the slowest setup and teardown of each shared fixture, by
+    # argname and then by baseid
+    shared_fixtures: dict[str, dict[str, tuple[str, int]]] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: Path) -> "ScheduleHistory":
+        history = cls()
+        for timing in iter_timings(path, types=frozenset({b"test", b"fixture"})):
+            if timing["type"] == "test":
+                history.test_ns[timing["test_id"]] += timing["runtime"][
+                    "as_nanoseconds"
+                ]
+                history.requires[timing["test_id"]] = timing["requires"]
+            elif timing["test_id"] is not None:
+                history.test_ns[timing["test_id"]] += timing["runtime"][
+                    "as_nanoseconds"
+                ]
+            else:
+                # Older outputs don't include the argname and baseid
+                argname = timing.get("argname") or timing["short_name"]
+                baseid = timing.get("baseid") or ""
+                runtime_ns = timing["runtime"]["as_nanoseconds"]
+                definitions = history.shared_fixtures.setdefault(argname, {})
+                _, previous_ns = definitions.get(baseid, ("", 0))
+                definitions[baseid] = (timing["scope"], max(previous_ns, runtime_ns))
+        return history
+
+    def _resolve(self, argname: str, nodeid: str) -> str | None:
+        """Returns the baseid of the fixture a test uses for an argname"""
+        definitions = self.shared_fixtures.get(argname, {})
+        visible = [
+            baseid
+            for baseid in definitions
+            if not baseid
+            or nodeid == baseid
+            or nodeid.startswith((f"{baseid}/", f"{baseid}::"))
+        ]
+        return max(visible, key=len, default=None)
+
+    def expensive_fixtures(self, nodeid: str) -> list[tuple[FixtureKey, str, int]]:
+        """Returns the (key, scope, duration) of expensive shared fixtures used by a test"""
+        fixtures = []
+        for argname in self.requires.get(nodeid, []):
+            if (baseid := self._resolve(argname, nodeid)) is None:
+                continue
+            scope, runtime_ns = self.shared_fixtures[argname][baseid]
+            if runtime_ns >= SHARED_FIXTURE_THRESHOLD_NS:
+                fixtures.append(((argname, baseid), scope, runtime_ns))
+        return fixtures
@@ -0,0 +1,131 @@
+import collections
+import itertools
+import statistics
+import typing
+
+import pytest
+from xdist.scheduler import LoadScopeScheduling
+
+from .schedule import FixtureKey, ScheduleHistory
+
+if typing.TYPE_CHECKING:
+    from xdist.workermanage import WorkerController
+
+# The pytest-xdist scheduler for `--scrutinize-schedule`, see `schedule`. Only imported by
+# the xdist master.
+
+# Number of the longest units to consider when looking for one with a matching session
+# scoped fixture
+AFFINITY_WINDOW = 64
+
+
+class ScrutinizeScheduling(LoadScopeScheduling):
+    def __init__(
+        self, config: pytest.Config, log: typing.Any, history: ScheduleHistory
+    ):
+        super().__init__(config, log)
+        self.history = history
+        self.default_test_ns = int(statistics.median(history.test_ns.values() or [0]))
+
+        self.node_fixtures: dict["WorkerController", set[FixtureKey]] = (
+            collections.defaultdict(set)
+        )
+        # Work units, longest first. Built once the work queue is complete, and rebuilt
+        # when the units of a crashed worker are put back.
+        self.unit_order: list[str] | None = None
+        # Every unit before this index in `unit_order` has been assigned
+        self.unit_order_start = 0
+        # Expensive session scoped fixtures used by each unit, built with `unit_order`
+        self.unit_session_fixtures: dict[str, set[FixtureKey]] = {}
+
+    def _split_scope(self, nodeid: str) -> str:
+        module = nodeid.split("::", 1)[0]
+        for _, scope, _ in self.history.expensive_fixtures(nodeid):
+            if scope != "session":
+                return module
+        return nodeid
+
+    def unit_cost(self, scope: str) -> int:
+        tests = self.workqueue[scope]
+        cost = sum(
+            self.history.test_ns.get(nodeid, self.default_test_ns) for nodeid in tests
+        )
+        # Shared fixtures in a grouped module are only set up once
+        shared_fixtures = {
+            (name, runtime_ns)
+            for nodeid in tests
+            for name, scope, runtime_ns in self.history.expensive_fixtures(nodeid)
+            if scope != "session"
+        }
+        return cost + sum(runtime_ns for _, runtime_ns in shared_fixtures)
+
+    def session_fixtures(self, scope: str) -> set[FixtureKey]:
+        return {
+            name
+            for nodeid in self.workqueue[scope]
+            for name, fixture_scope, _ in self.history.expensive_fixtures(nodeid)
+            if fixture_scope == "session"
+        }
+
+    def remove_node(self, node: "WorkerController") -> str | None:
+        # The units of a crashed worker are put back in the work queue, and may be before
+        # `unit_order_start`. The other workers are given more work before this returns.
+        self.unit_order = None
+        return super().remove_node(node)
+
+    def _order_units(self):
+        # The expensive fixtures of each unit only change when the work queue does
+        self.unit_session_fixtures = {
+            scope: self.session_fixtures(scope) for scope in self.workqueue
+        }
+        self.unit_order = sorted(self.workqueue, key=self.unit_cost, reverse=True)
+        self.unit_order_start = 0
+
+    def _pick_unit(self, node: "WorkerController") -> str:
+        if self.unit_order is None:
+            self._order_units()
+        assert self.unit_order is not None
+
+        while self.unit_order[self.unit_order_start] not in self.workqueue:
+            self.unit_order_start += 1
+        longest = self.unit_order[self.unit_order_start]
+
+        candidates = itertools.islice(
+            (
+                scope
+                for scope in itertools.islice(
+                    self.unit_order, self.unit_order_start, None
+                )
+                if scope in self.workqueue
+            ),
+            AFFINITY_WINDOW,
+        )
+        node_fixtures = self.node_fixtures[node]
+        if self.unit_session_fixtures[longest] <= node_fixtures:
+            return longest
+        # Rather than set up another session fixture, prefer a unit that only needs the
+        # ones this worker already has
+        for scope in candidates:
+            fixtures = self.unit_session_fixtures[scope]
+            if fixtures and fixtures <= node_fixtures:
+                return scope
+        return longest
+
+    def _assign_work_unit(self, node: "WorkerController") -> None:
+        assert self.workqueue
+
+        scope = self._pick_unit(node)
+        work_unit = self.workqueue.pop(scope)
+        self.node_fixtures[node].update(self.unit_session_fixtures[scope])
+
+        assigned_to_node = self.assigned_work.setdefault(node, {})
+        assigned_to_node[scope] = work_unit
+
+        worker_collection = self.registered_collections[node]
+        node.send_runtest_some(
+            [
+                worker_collection.index(nodeid)
+                for nodeid, completed in work_unit.items()
+                if not completed
+            ]
+        )
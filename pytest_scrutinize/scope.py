@@ -0,0 +1,60 @@
+import contextlib
+import contextvars
+import threading
+from typing import Generator
+
+# The test and fixture that is currently executing, as (test_id, fixture_name).
+Scope = tuple[str | None, str | None]
+
+_current_scope: contextvars.ContextVar[Scope | None] = contextvars.ContextVar(
+    "pytest_scrutinize_scope", default=None
+)
+
+
+@contextlib.contextmanager
+def enter_scope(
+    test_id: str | None, fixture_name: str | None
+) -> Generator[Scope, None, None]:
+    scope = (test_id, fixture_name)
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        try:
+            _current_scope.reset(token)
+        except ValueError:
+            # The scope was exited from a different context
+            old_value = token.old_value
+            _current_scope.set(None if old_value is token.MISSING else old_value)
+
+
+@contextlib.contextmanager
+def propagate_to_threads() -> Generator[None, None, None]:
+    """Runs threads in the scope that was current when they were started.
+
+    Threads do not inherit context variables from the thread that started them. A thread
+    started outside of any scope, such as a thread pool created before the tests, stays
+    outside of it and its calls are not attributed to any test.
+    """
+    original_start = threading.Thread.start
+
+    def start(thread: threading.Thread):
+        if (scope := _current_scope.get()) is not None:
+            run = thread.run
+
+            def run_in_scope():
+                _current_scope.set(scope)
+                run()
+
+            thread.run = run_in_scope  # type: ignore[method-assign]
+        original_start(thread)
+
+    threading.Thread.start = start  # type: ignore[method-assign]
+    try:
+        yield
+    finally:
+        threading.Thread.start = original_start  # type: ignore[method-assign]
+
+
+def get_scope() -> Scope | None:
+    return _current_scope.get()
@@ -0,0 +1,176 @@
+import contextlib
+import queue
+import socket
+import threading
+import typing
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import pytest
+
+if typing.TYPE_CHECKING:
+    from . import Timing
+
+# Every batch of timings written to the output is also passed to the
+# `pytest_scrutinize_timing` hook, already serialized as JSON lines. Hooks are called from a
+# dispatcher thread fed by a bounded queue, so a slow implementation never blocks the test
+# thread: when the queue is full, batches are dropped and counted instead.
+#
+# The built-in sinks are plugins implementing this hook, configured with `--scrutinize-sink`:
+# - memory: keeps every batch in memory
+# - file:///path/to/file: appends JSON lines to a file, such as a named pipe
+# - unix:///path/to/socket: streams JSON lines to a Unix socket
+# - tcp://host:port: streams JSON lines to a TCP socket
+
+DISPATCH_QUEUE_SIZE = 1024
+
+_STOP = object()
+
+
+class TimingSink:
+    def write(self, batch: bytes): ...
+
+    def close(self): ...
+
+    @pytest.hookimpl
+    def pytest_scrutinize_timing(self, batch: bytes, config: pytest.Config):
+        self.write(batch)
+
+    @pytest.hookimpl
+    def pytest_unconfigure(self, config: pytest.Config):
+        self.close()
+
+
+class MemorySink(TimingSink):
+    def __init__(self):
+        self.batches: list[bytes] = []
+
+    def write(self, batch: bytes):
+        self.batches.append(batch)
+
+    def timings(self) -> list["Timing"]:
+        from . import TimingAdapter
+
+        return [
+            TimingAdapter.validate_json(line)
+            for batch in self.batches
+            for line in batch.splitlines()
+        ]
+
+
+class FileSink(TimingSink):
+    def __init__(self, path: Path):
+        self.path = path
+        self.fd: typing.BinaryIO | None = None
+
+    def write(self, batch: bytes):
+        if self.fd is None:
+            self.fd = self.path.open("ab")
+        self.fd.write(batch)
+        self.fd.flush()
+
+    def close(self):
+        if self.fd is not None:
+            self.fd.close()
+            self.fd = None
+
+
+class SocketSink(TimingSink):
+    def __init__(self, family: socket.AddressFamily, address: typing.Any):
+        self.family = family
+        self.address = address
+        self.socket: socket.socket | None = None
+
+    def write(self, batch: bytes):
+        if self.socket is None:
+            self.socket = socket.socket(self.family, socket.SOCK_STREAM)
+            self.socket.connect(self.address)
+        self.socket.sendall(batch)
+
+    def close(self):
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+
+def parse_sink(value: str) -> TimingSink:
+    """Creates a built-in sink from a `--scrutinize-sink` argument"""
+    if value == "memory":
+        return MemorySink()
+
+    url = urlsplit(value)
+    match url.scheme:
+        case "file" if url.path:
+            return FileSink(Path(url.path))
+        case "unix" if url.path:
+            return SocketSink(socket.AF_UNIX, url.path)
+        case "tcp" if url.hostname and url.port:
+            return SocketSink(socket.AF_INET, (url.hostname, url.port))
+    raise ValueError(
+        f"Invalid sink {value!r}, expected memory, file:///path, unix:///path "
+        f"or tcp://host:port"
+    )
+
+
+@dataclass
+class SinkDispatcher:
+    config: pytest.Config
+    queue_size: int = DISPATCH_QUEUE_SIZE
+
+    batches_dispatched: int = 0
+    batches_dropped: int = 0
+    batches_failed: int = 0
+    first_error: BaseException | None = None
+
+    _queue: queue.Queue | None = None
+    _thread: threading.Thread | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.config.hook.pytest_scrutinize_timing.get_hookimpls())
+
+    def dispatch(self, batch: bytes):
+        assert self._queue is not None
+        try:
+            self._queue.put_nowait(batch)
+        except queue.Full:
+            self.batches_dropped += 1
+
+    def _run(self):
+        assert self._queue is not None
+        hook = self.config.hook.pytest_scrutinize_timing
+        while (batch := self._queue.get()) is not _STOP:
+            try:
+                hook(batch=batch, config=self.config)
+            except Exception as e:
+                self.batches_failed += 1
+                self.first_error = self.first_error or e
+            else:
+                self.batches_dispatched += 1
+
+    @contextlib.contextmanager
+    def start(self) -> typing.Generator[None, None, None]:
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._thread = threading.Thread(
+            target=self._run, name="scrutinize-sinks", daemon=True
+        )
+        self._thread.start()
+        try:
+            yield
+        finally:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._queue, self._thread = None, None
+
+    @property
+    def failure_message(self) -> str | None:
+        if not (self.batches_dropped or self.batches_failed):
+            return None
+        message = (
+            f"pytest-scrutinize: {self.batches_dropped} batches of timings were "
+            f"dropped and {self.batches_failed} failed to be dispatched to sinks"
+        )
+        if self.first_error is not None:
+            message += f", first error: {self.first_error!r}"
+        return message
@@ -0,0 +1,226 @@
+import collections
+import contextlib
+import functools
+import re
+import typing
+from dataclasses import dataclass, field
+
+import pytest
+
+from .data import DjangoSQLExplainTiming, RepeatedSQLTiming
+from .records import hash_query
+from .timer import Duration
+
+if typing.TYPE_CHECKING:
+    from .io import TimingsOutputFile
+
+# The SQL hash of a query changes with every inlined literal and with the number of
+# placeholders in `IN (...)` lists or multi-row `VALUES`, so the same query issued for
+# different objects can have many hashes. With `--scrutinize-django-sql-fingerprint`, each
+# query is also normalized, replacing literals and placeholders with `?` and collapsing
+# lists, and the hash of the normalized query is its fingerprint.
+#
+# Fingerprints are computed while the test runs so repeated queries can be counted, and
+# normalizing a query takes tens of microseconds. Test suites run the same few queries many
+# times, so fingerprints are cached by the raw query, and a cached lookup is ~100x faster.
+#
+# Repeated queries are counted per test and fixture. When a fingerprint runs more times than
+# the threshold, which is what an N+1 query pattern looks like, a `repeated-sql` record is
+# written when the test finishes (or at the end of the session for shared fixtures).
+#
+# With `--scrutinize-django-sql=explain`, the slowest execution of each distinct query is
+# tracked, keeping only the N slowest queries. Queries faster than the N slowest so far are
+# rejected with a single comparison. EXPLAIN is run for each of them once the last test has
+# run but before its teardown, while the test database still exists, on the same connection
+# alias and with the parameters of the slowest execution.
+
+FINGERPRINT_CACHE_SIZE = 4096
+
+_COMMENTS = re.compile(r"/\*.*?\*/|--[^\n]*", re.DOTALL)
+# String literals, placeholders (%s, %(name)s, :name and $1) and numbers
+_VALUES = re.compile(
+    r"'(?:[^']|'')*'"
+    r"|%(?:\(\w+\))?s|(?<!:):\w+|\$\d+"
+    r"|(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b"
+)
+_IN_LIST = re.compile(r"\bIN \((?: ?\?,)* ?\? ?\)", re.IGNORECASE)
+_VALUES_ROWS = re.compile(r"(\((?: ?\?,)* ?\? ?\))(?:, ?\1)+")
+
+
+def normalize_query(query: str) -> str:
+    """Replaces the literals and placeholders in a SQL query, and collapses lists of them"""
+    if "/*" in query or "--" in query:
+        query = _COMMENTS.sub(" ", query)
+    query = " ".join(_VALUES.sub("?", query).split())
+    query = _IN_LIST.sub("IN (...)", query)
+    return _VALUES_ROWS.sub(r"\1", query)
+
+
+@functools.lru_cache(maxsize=FINGERPRINT_CACHE_SIZE)
+def fingerprint_query(query: str | bytes) -> tuple[str, str]:
+    """Returns the fingerprint of a SQL query, along with the normalized query"""
+    if isinstance(query, bytes):
+        query = query.decode()
+    return hash_query(normalize_query(query))
+
+
+@dataclass
+class RepeatedQueries:
+    count: int = 0
+    runtime_ns: int = 0
+
+
+@dataclass
+class RepeatedQueryDetector:
+    output: "TimingsOutputFile"
+    # Queries with the same fingerprint that run more times than this are reported
+    threshold: int = 10
+
+    # Keyed by (test_id, fixture_name), then by fingerprint
+    scopes: dict[tuple[str | None, str | None], dict[str, RepeatedQueries]] = field(
+        default_factory=lambda: collections.defaultdict(dict)
+    )
+    normalized: dict[str, str] = field(default_factory=dict)
+
+    def add(
+        self,
+        test_id: str | None,
+        fixture_name: str | None,
+        fingerprint: str,
+        normalized: str,
+        runtime_ns: int,
+    ):
+        queries = self.scopes[test_id, fixture_name]
+        if (repeated := queries.get(fingerprint)) is None:
+            repeated = queries[fingerprint] = RepeatedQueries()
+            self.normalized.setdefault(fingerprint, normalized)
+        repeated.count += 1
+        repeated.runtime_ns += runtime_ns
+
+    def _flush(self, key: tuple[str | None, str | None]):
+        test_id, fixture_name = key
+        for fingerprint, repeated in self.scopes.pop(key).items():
+            if repeated.count > self.threshold:
+                self.output.add_timing(
+                    RepeatedSQLTiming(
+                        test_id=test_id,
+                        fixture_name=fixture_name,
+                        fingerprint=fingerprint,
+                        sql=self.normalized[fingerprint],
+                        count=repeated.count,
+                        runtime=Duration(as_nanoseconds=repeated.runtime_ns),
+                    )
+                )
+
+    def flush_test(self, test_id: str):
+        for key in [key for key in self.scopes if key[0] == test_id]:
+            self._flush(key)
+
+    def flush_all(self):
+        for key in list(self.scopes):
+            self._flush(key)
+
+
+# Statements that can be explained on all backends that support EXPLAIN
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+@dataclass
+class SlowQuery:
+    query: str | bytes
+    params: typing.Any
+    alias: str
+    runtime_ns: int
+    test_id: str | None
+    fixture_name: str | None
+
+
+@dataclass
+class SlowQueryTracker:
+    output: "TimingsOutputFile"
+    # Number of distinct queries to explain
+    top: int = 10
+
+    # Keyed by the raw query, which identifies it like its SQL hash
+    queries: dict[str | bytes, SlowQuery] = field(default_factory=dict)
+    # The runtime of the fastest tracked query, once `top` queries are tracked
+    _threshold_ns: int = -1
+
+    def add(
+        self,
+        query: str | bytes,
+        params: typing.Any,
+        alias: str,
+        runtime_ns: int,
+        test_id: str | None,
+        fixture_name: str | None,
+    ):
+        if runtime_ns <= self._threshold_ns:
+            return
+
+        slow_query = SlowQuery(query, params, alias, runtime_ns, test_id, fixture_name)
+        if (slowest := self.queries.get(query)) is not None:
+            if runtime_ns <= slowest.runtime_ns:
+                return
+        else:
+            query_str = query.decode() if isinstance(query, bytes) else query
+            if not query_str.lstrip().upper().startswith(_EXPLAINABLE):
+                return
+            if len(self.queries) >= self.top:
+                fastest = min(self.queries.values(), key=lambda q: q.runtime_ns)
+                del self.queries[fastest.query]
+        self.queries[query] = slow_query
+        if len(self.queries) >= self.top:
+            self._threshold_ns = min(q.runtime_ns for q in self.queries.values())
+
+    def explain(self, unblock: typing.ContextManager[typing.Any]):
+        """Explains the tracked queries, and stops tracking them"""
+        queries, self.queries = self.queries, {}
+        if not queries:
+            return
+
+        from django.db import connections, transaction
+
+        with unblock:
+            for slow_query in sorted(queries.values(), key=lambda q: -q.runtime_ns):
+                sql_hash, sql = hash_query(slow_query.query)
+                plan = error = None
+                try:
+                    connection = connections[slow_query.alias]
+                    prefix = connection.ops.explain_query_prefix()
+                    with (
+                        transaction.atomic(using=slow_query.alias),
+                        connection.cursor() as cursor,
+                    ):
+                        cursor.execute(f"{prefix} {sql}", slow_query.params)
+                        plan = "\n".join(
+                            " ".join(str(column) for column in row)
+                            for row in cursor.fetchall()
+                        )
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+
+                self.output.add_timing(
+                    DjangoSQLExplainTiming(
+                        test_id=slow_query.test_id,
+                        fixture_name=slow_query.fixture_name,
+                        sql_hash=sql_hash,
+                        sql=sql,
+                        alias=slow_query.alias,
+                        params=repr(slow_query.params),
+                        runtime=Duration(as_nanoseconds=slow_query.runtime_ns),
+                        plan=plan,
+                        error=error,
+                    )
+                )
+
+
+def unblock_django_db(config: pytest.Config) -> typing.ContextManager[typing.Any]:
+    """Allows database access outside of tests marked with pytest-django's django_db"""
+    try:
+        from pytest_django.plugin import blocking_manager_key
+    except ImportError:
+        return contextlib.nullcontext()
+    if (blocker := config.stash.get(blocking_manager_key, None)) is None:
+        return contextlib.nullcontext()
+    return blocker.unblock()
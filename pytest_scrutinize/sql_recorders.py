@@ -0,0 +1,198 @@
+import contextlib
+import functools
+import sqlite3
+import typing
+from dataclasses import dataclass
+from typing import Literal
+from unittest import mock
+
+from .io import TimingsSink
+from .records import DjangoSQLRecord
+from .scope import get_scope
+from .sql import RepeatedQueryDetector, fingerprint_query
+from .timer import perf_ns
+
+# Django SQL queries are recorded by patching Django's cursor wrapper. With `--scrutinize-sql`,
+# queries that don't go through Django can also be recorded:
+# - sqlalchemy: with the `before_cursor_execute` and `after_cursor_execute` events of every
+#   engine
+# - sqlite3: with `sqlite3` connections created by `sqlite3.connect`, whose cursors are
+#   replaced with a timed subclass. Connections that use their own cursor class (Django's do)
+#   are not recorded. Other DB-API drivers each have their own connection and cursor types,
+#   and are not recorded.
+#
+# These are written as `django-sql` records, named after the recorder, so the reports, the
+# history and the repeated query detection handle them like Django queries. The recorders are
+# installed for the whole session, and queries are attributed with `get_scope()`.
+#
+# SQLAlchemy's SQLite dialect connects with `sqlite3.connect`. When both recorders are
+# enabled, the cursors SQLAlchemy executes on are marked so their queries are only recorded
+# once, by the sqlalchemy recorder.
+
+SQLRecorderName = Literal["sqlalchemy", "sqlite3"]
+SQL_RECORDERS: tuple[SQLRecorderName, ...] = ("sqlalchemy", "sqlite3")
+
+
+def parse_sql_recorders(value: str) -> frozenset[SQLRecorderName]:
+    recorders = set()
+    for name in value.split(","):
+        if not (name := name.strip()):
+            continue
+        if name not in SQL_RECORDERS:
+            raise ValueError(
+                f"Unknown SQL recorder {name!r}, expected one of: "
+                f"{', '.join(SQL_RECORDERS)}"
+            )
+        recorders.add(typing.cast(SQLRecorderName, name))
+    return frozenset(recorders)
+
+
+@functools.lru_cache(maxsize=64)
+def _engine_alias(url: typing.Any) -> str:
+    return url.render_as_string(hide_password=True)
+
+
+@dataclass
+class SQLRecorder:
+    output: TimingsSink
+    recorders: frozenset[SQLRecorderName] = frozenset()
+    # Include the full query, like --scrutinize-django-sql=query
+    include_sql: bool = False
+    repeated_sql: RepeatedQueryDetector | None = None
+
+    def record(
+        self,
+        name: SQLRecorderName,
+        query: str,
+        runtime_ns: int,
+        alias: str,
+        row_count: int,
+        executemany: bool,
+    ):
+        if (scope := get_scope()) is None:
+            return
+        test_id, fixture_name = scope
+        fingerprint = None
+        if self.repeated_sql is not None:
+            fingerprint, normalized = fingerprint_query(query)
+            self.repeated_sql.add(
+                test_id, fixture_name, fingerprint, normalized, runtime_ns
+            )
+        self.output.add_timing(
+            DjangoSQLRecord(
+                name=name,
+                test_id=test_id,
+                fixture_name=fixture_name,
+                runtime_ns=runtime_ns,
+                query=query,
+                include_sql=self.include_sql,
+                fingerprint=fingerprint,
+                alias=alias,
+                row_count=row_count if row_count >= 0 else None,
+                executemany=executemany,
+            )
+        )
+
+    @contextlib.contextmanager
+    def initialize(self) -> typing.Generator[None, None, None]:
+        with contextlib.ExitStack() as stack:
+            if "sqlalchemy" in self.recorders:
+                stack.enter_context(self._listen_sqlalchemy())
+            if "sqlite3" in self.recorders:
+                stack.enter_context(self._patch_sqlite())
+            yield
+
+    @contextlib.contextmanager
+    def _listen_sqlalchemy(self) -> typing.Generator[None, None, None]:
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        record = self.record
+
+        def before_cursor_execute(
+            conn, cursor, statement, parameters, context, executemany
+        ):
+            if hasattr(cursor, "recorded_by_sqlalchemy"):
+                # A cursor of the sqlite3 recorder
+                cursor.recorded_by_sqlalchemy = True
+            if context is not None and get_scope() is not None:
+                context._scrutinize_start_ns = perf_ns()
+
+        def after_cursor_execute(
+            conn, cursor, statement, parameters, context, executemany
+        ):
+            end = perf_ns()
+            start = getattr(context, "_scrutinize_start_ns", None)
+            if start is None:
+                return
+            record(
+                "sqlalchemy",
+                statement,
+                end - start,
+                alias=_engine_alias(conn.engine.url),
+                row_count=cursor.rowcount,
+                executemany=executemany,
+            )
+
+        event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+        try:
+            yield
+        finally:
+            event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+            event.remove(Engine, "after_cursor_execute", after_cursor_execute)
+
+    @contextlib.contextmanager
+    def _patch_sqlite(self) -> typing.Generator[None, None, None]:
+        record = self.record
+
+        class TimedCursor(sqlite3.Cursor):
+            # Set by the sqlalchemy recorder, which records the queries of this cursor
+            recorded_by_sqlalchemy = False
+
+            def execute(self, sql, parameters=(), /):
+                if self.recorded_by_sqlalchemy or get_scope() is None:
+                    return super().execute(sql, parameters)
+                start = perf_ns()
+                result = super().execute(sql, parameters)
+                elapsed_ns = perf_ns() - start
+                record("sqlite3", sql, elapsed_ns, "sqlite3", self.rowcount, False)
+                return result
+
+            def executemany(self, sql, seq_of_parameters, /):
+                if self.recorded_by_sqlalchemy or get_scope() is None:
+                    return super().executemany(sql, seq_of_parameters)
+                start = perf_ns()
+                result = super().executemany(sql, seq_of_parameters)
+                elapsed_ns = perf_ns() - start
+                record("sqlite3", sql, elapsed_ns, "sqlite3", self.rowcount, True)
+                return result
+
+        class TimedConnection(sqlite3.Connection):
+            def cursor(self, *args, **kwargs):
+                if not args and not kwargs:
+                    return super().cursor(TimedCursor)
+                return super().cursor(*args, **kwargs)
+
+            # The C implementations don't create their cursor with `self.cursor()`
+            def execute(self, sql, parameters=(), /):
+                return self.cursor().execute(sql, parameters)
+
+            def executemany(self, sql, seq_of_parameters, /):
+                return self.cursor().executemany(sql, seq_of_parameters)
+
+        connect = sqlite3.connect
+
+        @functools.wraps(connect)
+        def timed_connect(*args, **kwargs):
+            # The connection class is the 6th argument
+            if len(args) < 6 and "factory" not in kwargs:
+                kwargs["factory"] = TimedConnection
+            return connect(*args, **kwargs)
+
+        # Django and SQLAlchemy connect through the `dbapi2` module
+        with (
+            mock.patch("sqlite3.connect", new=timed_connect),
+            mock.patch("sqlite3.dbapi2.connect", new=timed_connect),
+        ):
+            yield
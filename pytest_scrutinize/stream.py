@@ -0,0 +1,178 @@
+import contextlib
+import gzip
+import threading
+import typing
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .io import TimingsOutputFile, TimingsWriter, serialize_timings
+
+if typing.TYPE_CHECKING:
+    import execnet
+
+    from .data import BaseTiming
+
+# With `--scrutinize-xdist-transport=channel`, workers do not write their own output files.
+# Instead, the master opens an execnet channel to every worker and workers send their timings
+# over it as they are recorded. Timings are serialized and gzip compressed on the worker,
+# and the master appends each batch to the final output as a gzip member without decoding
+# it. Timings that reach the master are kept even if the worker later crashes.
+#
+# Each batch is acknowledged once it has been written. A worker only has `window` batches
+# in flight at a time, and waits for an acknowledgement before sending more.
+
+# Serialized timings are buffered on the worker until there are at least this many bytes, and
+# a background thread sends whatever is buffered this often
+FLUSH_BYTES = 256 * 1024
+FLUSH_INTERVAL_NS = 1_000_000_000
+WINDOW = 8
+
+_ACK = b"ack"
+
+
+class ChannelTimingsWriter(TimingsWriter):
+    def __init__(
+        self,
+        channel: "execnet.Channel",
+        flush_bytes: int = FLUSH_BYTES,
+        flush_interval_ns: int = FLUSH_INTERVAL_NS,
+        window: int = WINDOW,
+    ):
+        self.channel = channel
+        self.flush_bytes = flush_bytes
+        self.flush_interval_ns = flush_interval_ns
+        self.window = window
+        self.buffer: list[bytes] = []
+        self.buffered_bytes = 0
+        self.in_flight = 0
+
+        # Held while buffering or sending, as the flusher thread sends too
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._flusher: threading.Thread | None = None
+
+    def write_timings(self, timings: list["BaseTiming"]):
+        self.write_serialized(serialize_timings(timings), timings)
+
+    def write_serialized(self, data: bytes, timings: list["BaseTiming"]):
+        with self._lock:
+            self.buffer.append(data)
+            self.buffered_bytes += len(data)
+            if self.buffered_bytes >= self.flush_bytes:
+                self._send()
+
+    def _send(self):
+        if not self.buffer:
+            return
+        data = gzip.compress(b"".join(self.buffer), compresslevel=6)
+        self.buffer, self.buffered_bytes = [], 0
+
+        while self.in_flight >= self.window:
+            self._wait_for_ack()
+        self.channel.send(data)
+        self.in_flight += 1
+
+    def _wait_for_ack(self):
+        ack = self.channel.receive()
+        if ack != _ACK:
+            raise RuntimeError(f"Unexpected message from the master: {ack!r}")
+        self.in_flight -= 1
+
+    def _run_flusher(self):
+        # Sends the buffered timings every `flush_interval_ns`, even if the worker records
+        # nothing else, e.g. while a slow test runs
+        while not self._stopped.wait(self.flush_interval_ns / 1_000_000_000):
+            with self._lock:
+                self._send()
+
+    def start(self):
+        self._flusher = threading.Thread(
+            target=self._run_flusher, name="scrutinize-channel-flusher", daemon=True
+        )
+        self._flusher.start()
+
+    def close(self):
+        self._stopped.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        # Wait until everything has been written, so that no timings are lost if the
+        # worker exits straight after
+        with self._lock:
+            self._send()
+            while self.in_flight:
+                self._wait_for_ack()
+        self.channel.close()
+
+
+@contextlib.contextmanager
+def open_channel_writer(
+    channel: "execnet.Channel",
+) -> typing.Generator[ChannelTimingsWriter, None, None]:
+    writer = ChannelTimingsWriter(channel)
+    writer.start()
+    try:
+        yield writer
+    finally:
+        writer.close()
+
+
+@dataclass
+class ChannelTimingsOutput(TimingsOutputFile):
+    # Timings are only sent over the channel
+    path: Path | None = None  # type: ignore[assignment]
+    # Set by the worker once the session has started
+    channel: "execnet.Channel | None" = None
+
+    def _open_writer(self) -> typing.ContextManager[TimingsWriter]:
+        if self.channel is None:
+            raise RuntimeError("Not connected to the xdist master")
+        return open_channel_writer(self.channel)
+
+
+_CLOSED = object()
+
+
+@dataclass
+class ChannelReceiver:
+    output: TimingsOutputFile | None = None
+    # Batches received before the output is opened are kept until it is
+    pending: list[bytes] = field(default_factory=list)
+    # Batches received after the output was closed
+    batches_dropped: int = 0
+    closed: bool = False
+
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def connect(self, channel: "execnet.Channel"):
+        def on_message(data: typing.Any):
+            # Called from the execnet receiver thread
+            if data is _CLOSED:
+                return
+            self.write(data)
+            if not channel.isclosed():
+                channel.send(_ACK)
+
+        channel.setcallback(on_message, endmarker=_CLOSED)
+
+    def write(self, data: bytes):
+        with self._lock:
+            if self.closed:
+                self.batches_dropped += 1
+            elif self.output is None:
+                self.pending.append(data)
+            else:
+                self.output.append_compressed(data)
+
+    @contextlib.contextmanager
+    def attach(self, output: TimingsOutputFile) -> typing.Generator[None, None, None]:
+        with self._lock:
+            for data in self.pending:
+                output.append_compressed(data)
+            self.pending = []
+            self.output = output
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.output, self.closed = None, True
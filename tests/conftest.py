@@ -13,6 +13,11 @@ pytest_plugins = [
 
 
 def read_results_file(path: Path) -> list[Timing]:
+    if path.suffix == ".parquet":
+        from pytest_scrutinize.parquet import read_parquet_timings
+
+        return list(read_parquet_timings(path))  # type: ignore[arg-type]
+
     with gzip.open(path, mode="rt") as fd:
         return [TimingAdapter.validate_json(line) for line in fd]
 
@@ -23,15 +28,22 @@ def with_xdist(request) -> bool:
 
 
 @pytest.fixture()
-def output_file(tmp_path) -> Path:
+def output_format() -> str:
+    return "jsonl"
+
+
+@pytest.fixture()
+def output_file(tmp_path, output_format) -> Path:
+    if output_format == "parquet":
+        return tmp_path / "output.parquet"
     return tmp_path / "output.jsonl.gz"
 
 
 @pytest.fixture()
 def run_tests(
-    pytester_pretty: Pytester, with_xdist, output_file
+    pytester_pretty: Pytester, with_xdist, output_file, output_format
 ) -> Callable[..., tuple[RunResult, list[Timing]]]:
-    flags = []
+    flags = [f"--scrutinize-format={output_format}"]
     if with_xdist:
         flags.append("-n 2")
 
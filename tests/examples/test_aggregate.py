@@ -0,0 +1,20 @@
+import pytest
+from urllib import parse
+
+
+@pytest.fixture(scope="session")
+def session_fixture():
+    parse.quote("foo")
+
+
+@pytest.fixture()
+def teardown_fixture():
+    parse.quote("foo")
+    yield
+    parse.quote("foo")
+
+
+@pytest.mark.parametrize("value", range(4))
+def test_case(session_fixture, teardown_fixture, value):
+    for _ in range(value + 1):
+        assert parse.quote("foo") == "foo"
@@ -0,0 +1,15 @@
+import time
+
+import pytest
+
+time.sleep(0.1)
+
+
+@pytest.mark.parametrize("value", range(3))
+def test_parametrized(value):
+    pass
+
+
+class TestClass:
+    def test_method(self):
+        pass
@@ -0,0 +1,22 @@
+import time
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def module_fixture():
+    time.sleep(0.1)
+
+
+@pytest.fixture()
+def function_fixture(module_fixture):
+    time.sleep(0.01)
+
+
+@pytest.mark.parametrize("value", range(2))
+def test_shared(function_fixture, value):
+    pass
+
+
+def test_plain():
+    pass
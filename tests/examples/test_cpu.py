@@ -0,0 +1,21 @@
+import time
+import urllib.parse
+
+import pytest
+
+
+@pytest.fixture()
+def sleeping_fixture():
+    time.sleep(0.05)
+    yield
+    time.sleep(0.05)
+
+
+def test_sleep(sleeping_fixture):
+    time.sleep(0.05)
+
+
+def test_busy():
+    end = time.perf_counter() + 0.05
+    while time.perf_counter() < end:
+        urllib.parse.quote("a b")
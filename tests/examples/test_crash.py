@@ -0,0 +1,13 @@
+import os
+import time
+
+
+def test_case():
+    pass
+
+
+def test_crash():
+    # Nothing else is recorded while this sleeps, so the timings of the previous test are
+    # only sent to the master by the worker's periodic flush
+    time.sleep(1.5)
+    os._exit(1)
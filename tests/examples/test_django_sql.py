@@ -0,0 +1,28 @@
+import pytest
+from django.db import connection
+from tests.django_app.models import DummyModel
+
+
+@pytest.fixture()
+def objects():
+    DummyModel.objects.bulk_create(DummyModel(foo=str(i)) for i in range(12))
+    return list(DummyModel.objects.all())
+
+
+@pytest.mark.django_db
+def test_n_plus_one(objects):
+    # A different number of placeholders each time, but the same fingerprint
+    for i in range(1, len(objects) + 1):
+        assert (
+            len(DummyModel.objects.filter(pk__in=[obj.pk for obj in objects[:i]])) == i
+        )
+
+
+@pytest.mark.django_db
+def test_executemany():
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {DummyModel._meta.db_table} (foo) VALUES (%s)",
+            [("a",), ("b",), ("c",)],
+        )
+    assert DummyModel.objects.count() == 3
@@ -0,0 +1,14 @@
+import time
+
+import pytest
+
+
+def pytest_runtest_setup(item):
+    time.sleep(0.05)
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    time.sleep(0.02)
+    yield
+    time.sleep(0.02)
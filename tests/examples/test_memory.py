@@ -0,0 +1,36 @@
+import pytest
+
+MB = 1024 * 1024
+
+KEPT = []
+
+
+@pytest.fixture(scope="session")
+def live_objects():
+    # Many live traced blocks make the snapshots large
+    return [str(i) for i in range(20_000)]
+
+
+@pytest.fixture()
+def kept_fixture():
+    # Kept until the fixture is torn down
+    data = bytearray(MB)
+    yield
+    del data
+
+
+@pytest.fixture()
+def inner_fixture():
+    data = bytearray(2 * MB)
+    del data
+
+
+@pytest.fixture()
+def outer_fixture(request):
+    request.getfixturevalue("inner_fixture")
+
+
+def test_case(live_objects, kept_fixture, outer_fixture):
+    data = bytearray(4 * MB)
+    del data
+    KEPT.append(bytearray(MB // 2))
@@ -0,0 +1,51 @@
+import asyncio
+import sys
+import time
+
+import pytest
+
+
+def produce(count: int):
+    for i in range(count):
+        time.sleep(0.01)
+        yield i
+
+
+async def wait():
+    await asyncio.sleep(0.2)
+
+
+def test_generator():
+    # Interleaved calls of the same generator function
+    first, second = produce(2), produce(2)
+    assert next(first) == next(second) == 0
+    time.sleep(0.2)
+    assert list(first) == list(second) == [1]
+
+
+def test_coroutine():
+    asyncio.run(wait())
+
+
+def fail():
+    time.sleep(0.01)
+    raise ValueError
+
+
+def test_raises():
+    with pytest.raises(ValueError):
+        fail()
+    generator = produce(2)
+    next(generator)
+    with pytest.raises(KeyError):
+        generator.throw(KeyError)
+
+
+def test_unwind_events_disabled():
+    # Only enabled while tests and fixtures call recorded functions
+    [tool_id] = [
+        tool_id
+        for tool_id in range(6)
+        if sys.monitoring.get_tool(tool_id) == "pytest-scrutinize"
+    ]
+    assert sys.monitoring.get_events(tool_id) == sys.monitoring.events.NO_EVENTS
@@ -0,0 +1,11 @@
+import urllib.parse
+from urllib.parse import quote
+
+original_quote = urllib.parse.quote
+
+
+def test_case():
+    # The recorded function must not be replaced
+    assert urllib.parse.quote is original_quote
+    assert quote("foo") == "foo"
+    assert urllib.parse.quote("bar") == "bar"
@@ -0,0 +1,31 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib import parse
+
+# Started during collection, outside of any test
+call_from_idle_thread = threading.Event()
+idle_thread_called = threading.Event()
+
+
+def idle_thread():
+    call_from_idle_thread.wait()
+    parse.quote("baz")
+    idle_thread_called.set()
+
+
+threading.Thread(target=idle_thread, daemon=True).start()
+
+
+async def call_in_task() -> str:
+    return await asyncio.create_task(asyncio.to_thread(parse.quote, "bar"))
+
+
+def test_case():
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert executor.submit(parse.quote, "foo").result() == "foo"
+
+    assert asyncio.run(call_in_task()) == "bar"
+
+    call_from_idle_thread.set()
+    assert idle_thread_called.wait(timeout=10)
@@ -0,0 +1,22 @@
+import time
+
+import pytest
+
+
+def busy(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+@pytest.fixture()
+def slow_fixture():
+    busy(0.1)
+
+
+def test_slow(slow_fixture):
+    busy(0.1)
+
+
+def test_fast():
+    pass
@@ -0,0 +1,10 @@
+from urllib import parse
+
+
+def test_case():
+    for _ in range(100):
+        assert parse.quote("foo") == "foo"
+
+
+def test_other():
+    assert parse.quote("foo") == "foo"
@@ -0,0 +1,18 @@
+import time
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def expensive_fixture():
+    time.sleep(0.2)
+
+
+@pytest.mark.parametrize("value", range(4))
+def test_shared(expensive_fixture, value):
+    pass
+
+
+@pytest.mark.parametrize("value", range(4))
+def test_case(value):
+    time.sleep(0.01 * value)
@@ -0,0 +1,21 @@
+import pytest
+import sqlalchemy
+
+
+@pytest.fixture()
+def engine():
+    engine = sqlalchemy.create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.execute(sqlalchemy.text("CREATE TABLE items (name TEXT)"))
+    yield engine
+    engine.dispose()
+
+
+def test_queries(engine):
+    with engine.begin() as connection:
+        connection.execute(
+            sqlalchemy.text("INSERT INTO items (name) VALUES (:name)"),
+            [{"name": "a"}, {"name": "b"}],
+        )
+        result = connection.execute(sqlalchemy.text("SELECT name FROM items"))
+        assert sorted(result.scalars()) == ["a", "b"]
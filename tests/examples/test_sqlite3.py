@@ -0,0 +1,19 @@
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture()
+def connection():
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE items (name TEXT)")
+    yield connection
+    connection.close()
+
+
+def test_queries(connection):
+    connection.executemany("INSERT INTO items (name) VALUES (?)", [("a",), ("b",)])
+    for name in ["a", "b"]:
+        cursor = connection.cursor()
+        cursor.execute("SELECT name FROM items WHERE name = ?", (name,))
+        assert cursor.fetchone() == (name,)
@@ -1,5 +1,14 @@
 import collections
+import gzip
+import hashlib
+import json
+import socket
+import sqlite3
+import sys
+import threading
 import typing
+import zlib
+from types import SimpleNamespace
 from typing import Type, Hashable
 
 import pytest
@@ -7,13 +16,41 @@ from _pytest.pytester import RunResult
 
 from pytest_scrutinize import (
     Timing,
+    TimingAdapter,
     CollectionTiming,
+    CollectionFileTiming,
     WorkerTiming,
     TestTiming as PyTestTiming,
+    TestCostTiming as PyTestCostTiming,
     FixtureTiming,
     MockTiming,
     DjangoSQLTiming,
+    RepeatedSQLTiming,
+    DjangoSQLExplainTiming,
+    NetworkTiming,
     GCTiming,
+    WriterTiming,
+    MergeTiming,
+    OverheadTiming,
+    HookTiming,
+    AggregateTiming,
+    MemoryTiming,
+    ProfileTiming,
+)
+from pytest_scrutinize.aggregate import bucket_lower_bound
+from pytest_scrutinize.cli import main as cli_main
+from pytest_scrutinize.collection import CollectionTracker
+from pytest_scrutinize.data import Meta
+from pytest_scrutinize.io import TimingsOutputFile
+from pytest_scrutinize.records import MockRecord, DjangoSQLRecord, GCRecord, hash_query
+from pytest_scrutinize.report import build_report
+from pytest_scrutinize.sampling import TimingsSampler, parse_sample_rate
+from pytest_scrutinize.schedule import ScheduleHistory
+from pytest_scrutinize.sinks import parse_sink
+from pytest_scrutinize.sql import (
+    SlowQueryTracker,
+    fingerprint_query,
+    normalize_query,
 )
 from pytest_scrutinize.timer import Duration
 
@@ -105,7 +142,12 @@ def assert_fixtures(results: list[Timing], is_xdist: bool, root_name: str):
         assert_fixture(fixture_timing, root_name)
 
 
-def assert_mocks(results: list[Timing], is_xdist: bool, root_name: str):
+def assert_mocks(
+    results: list[Timing],
+    is_xdist: bool,
+    root_name: str,
+    include_indirect: bool = False,
+):
     fixture_timings = get_timing_items(results, FixtureTiming)
     mock_timings = get_timing_items(results, MockTiming)
     assert mock_timings != []
@@ -125,11 +167,14 @@ def assert_mocks(results: list[Timing], is_xdist: bool, root_name: str):
 
     fixture_map = {fixture.name: fixture for fixture in fixture_timings}
 
-    # All fixtures should have called the mock, excluding the indirect fixture
+    # All fixtures should have called the mock. The indirect fixture is only seen
+    # when functions are patched once per session.
     expected_fixtures = {
         f"{root_name}.fixture",
         f"{root_name}.teardown_fixture",
     }
+    if include_indirect:
+        expected_fixtures.add(f"{root_name}.indirect_fixture")
     fixtures_calling_mock = {
         mock_timing.fixture_name
         for mock_timing in mock_timings
@@ -163,14 +208,102 @@ def test_simple(run_tests, output_file, with_xdist):
     assert_suite(result, timings, with_xdist)
 
 
-def test_mocks(run_tests, output_file, with_xdist):
+@pytest.mark.parametrize("patch_mode", ["test", "session"])
+def test_mocks(run_tests, output_file, with_xdist, patch_mode):
     result, timings = run_tests(
         "test_mock.py",
         "--scrutinize-func=urllib.parse.urlparse,urllib.parse.parse_qs",
         "--scrutinize-func=urllib.parse.quote",
+        f"--scrutinize-func-patch={patch_mode}",
     )
     assert_suite(result, timings, with_xdist)
-    assert_mocks(timings, with_xdist, root_name="test_mock")
+    assert_mocks(
+        timings,
+        with_xdist,
+        root_name="test_mock",
+        include_indirect=patch_mode == "session",
+    )
+
+
+requires_monitoring = pytest.mark.skipif(
+    sys.version_info < (3, 12), reason="sys.monitoring requires Python 3.12+"
+)
+
+
+@requires_monitoring
+def test_mocks_monitoring(run_tests, output_file, with_xdist):
+    result, timings = run_tests(
+        "test_mock.py",
+        "--scrutinize-func=urllib.parse.urlparse,urllib.parse.parse_qs",
+        "--scrutinize-func=urllib.parse.quote",
+        "--scrutinize-func-backend=monitoring",
+    )
+    assert_suite(result, timings, with_xdist)
+    assert_mocks(timings, with_xdist, root_name="test_mock", include_indirect=True)
+
+
+@requires_monitoring
+def test_mocks_monitoring_identity(run_tests, output_file, with_xdist):
+    result, timings = run_tests(
+        "test_mock_identity.py",
+        "--scrutinize-func=urllib.parse.quote",
+        "--scrutinize-func-backend=monitoring",
+    )
+    result.assert_outcomes(passed=1)
+    mock_timings = get_timing_items(timings, MockTiming)
+    assert len(mock_timings) == 2
+    for mock_timing in mock_timings:
+        assert_duration(mock_timing.runtime)
+        assert mock_timing.test_id == "test_mock_identity.py::test_case"
+
+
+@requires_monitoring
+def test_mocks_monitoring_generator(run_tests, output_file, with_xdist):
+    result, timings = run_tests(
+        "test_mock_generator.py",
+        "--scrutinize-func=test_mock_generator.produce,test_mock_generator.wait",
+        "--scrutinize-func=test_mock_generator.fail",
+        "--scrutinize-func-backend=monitoring",
+    )
+    result.assert_outcomes(passed=4)
+    mock_timings = get_timing_items(timings, MockTiming)
+    assert collections.Counter(
+        (timing.test_id, timing.name, timing.exception) for timing in mock_timings
+    ) == {
+        (
+            "test_mock_generator.py::test_generator",
+            "test_mock_generator.produce",
+            False,
+        ): 2,
+        (
+            "test_mock_generator.py::test_coroutine",
+            "test_mock_generator.wait",
+            False,
+        ): 1,
+        ("test_mock_generator.py::test_raises", "test_mock_generator.fail", True): 1,
+        ("test_mock_generator.py::test_raises", "test_mock_generator.produce", True): 1,
+    }
+    for mock_timing in mock_timings:
+        assert_duration(mock_timing.runtime)
+        # The time spent suspended is not included
+        assert mock_timing.runtime.as_nanoseconds < 100_000_000
+
+
+@pytest.mark.parametrize("patch_mode", ["test", "session"])
+def test_mocks_threads(run_tests, output_file, with_xdist, patch_mode):
+    result, timings = run_tests(
+        "test_mock_threads.py",
+        "--scrutinize-func=urllib.parse.quote",
+        f"--scrutinize-func-patch={patch_mode}",
+    )
+    result.assert_outcomes(passed=1)
+    mock_timings = get_timing_items(timings, MockTiming)
+    # Patched per test, every call made during the test is recorded. Patched for the
+    # session, the thread started outside of the test is not attributed to it
+    assert len(mock_timings) == (3 if patch_mode == "test" else 2)
+    for mock_timing in mock_timings:
+        assert mock_timing.test_id == "test_mock_threads.py::test_case"
+        assert mock_timing.fixture_name is None
 
 
 def test_gc(run_tests, output_file, with_xdist):
@@ -186,13 +319,17 @@ def test_gc(run_tests, output_file, with_xdist):
         assert all_workers != {"master"}
 
 
+@pytest.mark.parametrize("patch_mode", ["test", "session"])
 @pytest.mark.parametrize("with_query", [True, False])
-def test_django(run_tests, output_file, with_xdist, with_query):
+def test_django(run_tests, output_file, with_xdist, with_query, patch_mode):
     flag = "--scrutinize-django-sql"
     if with_query:
         flag = f"{flag}=query"
     result, timings = run_tests(
-        "test_django.py", "--ds=tests.django_app.settings", flag
+        "test_django.py",
+        "--ds=tests.django_app.settings",
+        flag,
+        f"--scrutinize-func-patch={patch_mode}",
     )
     assert_suite(result, timings, with_xdist)
     sql_timings = get_timing_items(timings, DjangoSQLTiming)
@@ -223,6 +360,241 @@ def test_django(run_tests, output_file, with_xdist, with_query):
     )
 
 
+def test_django_sql_fingerprint(run_tests, output_file, with_xdist):
+    result, timings = run_tests(
+        "test_django_sql.py",
+        "--ds=tests.django_app.settings",
+        "--scrutinize-django-sql=query",
+        "--scrutinize-django-sql-fingerprint",
+    )
+    result.assert_outcomes(passed=2)
+
+    sql_timings = get_timing_items(timings, DjangoSQLTiming)
+    # Django's default database isn't written
+    assert all(timing.alias is None for timing in sql_timings)
+    assert all(timing.fingerprint is not None for timing in sql_timings)
+
+    in_queries = [
+        timing
+        for timing in sql_timings
+        if timing.test_id == "test_django_sql.py::test_n_plus_one"
+        and timing.fixture_name is None
+    ]
+    assert len(in_queries) == 12
+    assert len({timing.sql_hash for timing in in_queries}) == 12
+    assert len({timing.fingerprint for timing in in_queries}) == 1
+
+    [executemany] = [timing for timing in sql_timings if timing.executemany]
+    assert executemany.test_id == "test_django_sql.py::test_executemany"
+    assert executemany.row_count == 3
+
+    # pytest-django's database setup also repeats queries
+    [repeated] = [
+        timing
+        for timing in get_timing_items(timings, RepeatedSQLTiming)
+        if timing.fixture_name is None
+    ]
+    assert repeated.test_id == "test_django_sql.py::test_n_plus_one"
+    assert repeated.fingerprint == in_queries[0].fingerprint
+    assert repeated.count == 12
+    assert "IN (...)" in repeated.sql
+
+
+@pytest.mark.parametrize(
+    ("query", "normalized"),
+    [
+        (
+            "SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'o''brien'",
+            "SELECT * FROM t WHERE id IN (...) AND name = ?",
+        ),
+        (
+            "INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)",
+            "INSERT INTO t (a, b) VALUES (?, ?)",
+        ),
+        (
+            "SELECT t1.a FROM t1 /* comment */ WHERE t1.b > -1.5 LIMIT 21",
+            "SELECT t1.a FROM t1 WHERE t1.b > ? LIMIT ?",
+        ),
+        (
+            "SELECT a::text FROM t WHERE b = :b AND c = $1",
+            "SELECT a::text FROM t WHERE b = ? AND c = ?",
+        ),
+    ],
+)
+def test_normalize_query(query, normalized):
+    assert normalize_query(query) == normalized
+    assert fingerprint_query(query)[1] == normalized
+
+
+def test_django_sql_explain(run_tests, output_file, with_xdist):
+    result, timings = run_tests(
+        "test_django_sql.py",
+        "--ds=tests.django_app.settings",
+        "--scrutinize-django-sql=explain",
+        "--scrutinize-django-sql-explain-top=5",
+    )
+    result.assert_outcomes(passed=2)
+
+    slowest: dict[tuple[str, str], int] = collections.defaultdict(int)
+    for timing in get_timing_items(timings, DjangoSQLTiming):
+        assert timing.sql is None
+        key = (timing.meta.worker, timing.sql_hash)
+        slowest[key] = max(slowest[key], timing.runtime.as_nanoseconds)
+
+    explains = get_timing_items(timings, DjangoSQLExplainTiming)
+    assert explains != []
+    workers = collections.Counter(explain.meta.worker for explain in explains)
+    assert max(workers.values()) <= 5
+
+    for explain in explains:
+        assert explain.alias == "default"
+        # Migrations query tables that no longer exist by the end of the run
+        assert (explain.plan is None) != (explain.error is None)
+        # Explained with the parameters of the slowest execution
+        assert (
+            explain.runtime.as_nanoseconds
+            == slowest[explain.meta.worker, explain.sql_hash]
+        )
+    assert any(explain.plan for explain in explains)
+
+
+def test_slow_query_tracker():
+    tracker = SlowQueryTracker(output=None, top=2)  # type: ignore[arg-type]
+    for query, runtime_ns in [
+        ("SELECT 1", 10),
+        ("SELECT 2", 20),
+        ("SELECT 1", 5),
+        ("SELECT 3", 15),
+        ("CREATE TABLE t (a int)", 100),
+        ("SELECT 1", 30),
+    ]:
+        tracker.add(query, (), "default", runtime_ns, None, None)
+
+    assert {
+        query: slow_query.runtime_ns for query, slow_query in tracker.queries.items()
+    } == {"SELECT 1": 30, "SELECT 2": 20}
+
+
+def test_sql_sqlite3(run_tests, output_file, with_xdist):
+    result, timings = run_tests(
+        "test_sqlite3.py", "--scrutinize-sql=sqlite3", "--scrutinize-sql-query"
+    )
+    result.assert_outcomes(passed=1)
+
+    sql_timings = get_timing_items(timings, DjangoSQLTiming)
+    assert {timing.name for timing in sql_timings} == {"sqlite3"}
+    assert all(timing.alias == "sqlite3" for timing in sql_timings)
+
+    [create] = [
+        timing
+        for timing in sql_timings
+        if timing.fixture_name == "test_sqlite3.connection"
+    ]
+    assert create.sql == "CREATE TABLE items (name TEXT)"
+
+    test_timings = [
+        timing
+        for timing in sql_timings
+        if timing.test_id == "test_sqlite3.py::test_queries" and not timing.fixture_name
+    ]
+    [insert] = [timing for timing in test_timings if timing.executemany]
+    assert insert.row_count == 2
+    selects = [timing for timing in test_timings if not timing.executemany]
+    assert len(selects) == 2
+    # Same hash as the Django recorder would give the query
+    assert selects[0].sql_hash == hash_query(selects[0].sql)[0]
+
+
+@pytest.mark.parametrize("recorders", ["sqlalchemy", "sqlalchemy,sqlite3"])
+def test_sql_sqlalchemy(run_tests, output_file, with_xdist, recorders):
+    pytest.importorskip("sqlalchemy")
+    result, timings = run_tests("test_sqlalchemy.py", f"--scrutinize-sql={recorders}")
+    result.assert_outcomes(passed=1)
+
+    sql_timings = [
+        timing
+        for timing in get_timing_items(timings, DjangoSQLTiming)
+        if timing.name == "sqlalchemy"
+    ]
+    # The queries run by SQLAlchemy's sqlite3 connections are only recorded once, the
+    # sqlite3 recorder only gets those SQLAlchemy runs outside of its events
+    sqlite3_hashes = {
+        timing.sql_hash
+        for timing in get_timing_items(timings, DjangoSQLTiming)
+        if timing.name == "sqlite3"
+    }
+    assert sqlite3_hashes.isdisjoint(timing.sql_hash for timing in sql_timings)
+    assert all(timing.alias == "sqlite://" for timing in sql_timings)
+    fixture_timings = [
+        timing
+        for timing in sql_timings
+        if timing.fixture_name == "test_sqlalchemy.engine"
+    ]
+    assert fixture_timings != []
+    [insert] = [timing for timing in sql_timings if timing.executemany]
+    assert insert.test_id == "test_sqlalchemy.py::test_queries"
+    assert insert.fixture_name is None
+
+
+# The keys of each record type in the first release, for the features it had
+BASELINE_KEYS = {
+    "gc": {"meta", "type", "runtime", "collected_count", "generation"},
+    "collection": {"meta", "type", "runtime"},
+    "worker": {"meta", "type", "ready", "runtime"},
+    "mock": {"meta", "type", "name", "test_id", "fixture_name", "runtime"},
+    "django-sql": {
+        "meta",
+        "type",
+        "name",
+        "test_id",
+        "fixture_name",
+        "runtime",
+        "sql_hash",
+        "sql",
+    },
+    "test": {"meta", "type", "name", "test_id", "requires", "runtime"},
+    "fixture": {
+        "meta",
+        "type",
+        "name",
+        "short_name",
+        "test_id",
+        "scope",
+        "setup",
+        "teardown",
+        "runtime",
+        # Added for --scrutinize-schedule, which reads them from any previous run
+        "argname",
+        "baseid",
+    },
+}
+BASELINE_DURATION_KEYS = {"as_nanoseconds", "as_microseconds", "as_iso", "as_text"}
+
+
+def test_baseline_schema(run_tests, pytester_pretty, output_file, with_xdist):
+    pytester_pretty.copy_example("test_mock.py")
+    result, _ = run_tests(
+        "test_django.py",
+        "--ds=tests.django_app.settings",
+        "--scrutinize-django-sql",
+        "--scrutinize-gc",
+        "--scrutinize-func=urllib.parse.urlparse,urllib.parse.parse_qs",
+    )
+    assert result.ret == 0
+
+    with gzip.open(output_file, mode="rt") as fd:
+        records = [json.loads(line) for line in fd]
+    types = {record["type"] for record in records}
+    assert types >= {"gc", "collection", "mock", "django-sql", "test", "fixture"}
+    for record in records:
+        if (keys := BASELINE_KEYS.get(record["type"])) is None:
+            continue
+        assert set(record) == keys
+        for value in record.values():
+            if isinstance(value, dict) and "as_nanoseconds" in value:
+                assert set(value) == BASELINE_DURATION_KEYS
+
+
 def test_all(run_tests, output_file, with_xdist):
     result, timings = run_tests(
         "test_simple.py",
@@ -231,3 +603,972 @@ def test_all(run_tests, output_file, with_xdist):
         "--scrutinize-func=urllib.parse.urlparse",
     )
     assert_suite(result, timings, with_xdist)
+
+
+def test_writer_thread(run_tests, output_file, with_xdist):
+    result, timings = run_tests(
+        "test_mock.py",
+        "--scrutinize-writer=thread",
+        "--scrutinize-writer-queue-size=1",
+        "--scrutinize-func=urllib.parse.urlparse,urllib.parse.parse_qs",
+        "--scrutinize-func=urllib.parse.quote",
+    )
+    assert_suite(result, timings, with_xdist)
+    assert_mocks(timings, with_xdist, root_name="test_mock")
+
+    writer_timings = get_timing_items(timings, WriterTiming)
+    assert writer_timings != []
+    assert_unique(ev.meta.worker for ev in writer_timings)
+    for writer_timing in writer_timings:
+        assert writer_timing.events_written > 0
+        assert writer_timing.events_dropped == 0
+
+
+def test_merge(run_tests, output_file, with_xdist):
+    result, timings = run_tests("test_simple.py")
+    assert_suite(result, timings, with_xdist)
+
+    [merge_timing] = get_timing_items(timings, MergeTiming)
+    assert merge_timing.meta.worker == "master"
+    assert_duration(merge_timing.runtime)
+    if with_xdist:
+        # The master and both workers
+        assert merge_timing.files_merged == 3
+        # Each file is appended as a separate gzip member
+        assert output_file.read_bytes().count(b"\x1f\x8b\x08") >= 3
+
+
+def test_cost(run_tests, output_file, with_xdist):
+    result, timings = run_tests("test_cost.py", "--scrutinize-cost")
+    result.assert_outcomes(passed=3)
+
+    costs = {cost.test_id: cost for cost in get_timing_items(timings, PyTestCostTiming)}
+    assert set(costs) == {
+        "test_cost.py::test_shared[0]",
+        "test_cost.py::test_shared[1]",
+        "test_cost.py::test_plain",
+    }
+
+    # Autouse fixtures from other plugins are included, so only check our own
+    plain = costs.pop("test_cost.py::test_plain")
+    assert "module_fixture" not in plain.fixtures_created + plain.fixtures_cached
+    assert "module_fixture" not in plain.shared_fixtures
+    assert plain.total.as_nanoseconds < 50_000_000
+
+    creators = []
+    for cost in costs.values():
+        assert "function_fixture" in cost.fixtures_created
+        # The module fixture's setup is shared between both tests
+        share = cost.shared_fixtures["module_fixture"]
+        assert 50_000_000 <= share.as_nanoseconds < 100_000_000
+        if "module_fixture" in cost.fixtures_created:
+            creators.append(cost)
+            assert cost.setup.as_nanoseconds >= 100_000_000
+        else:
+            assert "module_fixture" in cost.fixtures_cached
+        assert 0 < cost.total.as_nanoseconds - share.as_nanoseconds < 50_000_000
+
+    if with_xdist:
+        assert len(creators) >= 1
+    else:
+        assert len(creators) == 1
+
+
+def test_cost_disabled(run_tests, output_file):
+    result, timings = run_tests("test_cost.py")
+    result.assert_outcomes(passed=3)
+    assert get_timing_items(timings, PyTestCostTiming) == []
+
+
+def test_collection_files(run_tests, output_file, with_xdist):
+    result, timings = run_tests("test_collection", "--scrutinize-collection")
+    result.assert_outcomes(passed=4)
+
+    files = get_timing_items(timings, CollectionFileTiming)
+    # Each xdist worker collects every file
+    modules = [file for file in files if file.path == "test_slow_import.py"]
+    conftests = [file for file in files if file.path == "conftest.py"]
+    assert modules and conftests
+
+    for module in modules:
+        assert module.kind == "module"
+        assert module.items == 4
+        assert module.import_time.as_nanoseconds >= 100_000_000
+        assert module.collect_time.as_nanoseconds < 100_000_000
+
+    for conftest in conftests:
+        assert conftest.kind == "conftest"
+        assert conftest.items == 0
+        assert conftest.import_time.as_nanoseconds >= 50_000_000
+
+
+def test_collection_files_disabled(run_tests, output_file):
+    result, timings = run_tests("test_collection")
+    result.assert_outcomes(passed=4)
+    assert get_timing_items(timings, CollectionFileTiming) == []
+    assert get_timing_items(timings, CollectionTiming)
+
+
+def test_collection_private_api_missing(tmp_path):
+    warnings = []
+    config = SimpleNamespace(
+        pluginmanager=SimpleNamespace(),
+        issue_config_time_warning=lambda warning, stacklevel: warnings.append(warning),
+    )
+    tracker = CollectionTracker(tmp_path)
+    tracker.trace_conftests(typing.cast(pytest.Config, config))
+    assert [type(warning) for warning in warnings] == [pytest.PytestWarning]
+    assert tracker.files == {}
+
+
+def test_network(run_tests, output_file, with_xdist):
+    result, timings = run_tests("test_network.py", "--scrutinize-network")
+    result.assert_outcomes(passed=1)
+
+    network = get_timing_items(timings, NetworkTiming)
+    # The server only accepts connections, which aren't recorded
+    assert {(timing.test_id, timing.fixture_name) for timing in network} == {
+        ("test_network.py::test_request", None)
+    }
+    by_operation = {timing.operation: timing for timing in network}
+    assert len(by_operation) == len(network) == 3
+
+    dns = by_operation["dns"]
+    assert dns.host == "127.0.0.1"
+    port = dns.port
+    assert port is not None
+
+    http = by_operation["http"]
+    assert (http.host, http.port) == ("127.0.0.1", port)
+    assert http.request == "GET /path"
+    assert http.bytes_sent is not None and http.bytes_sent > 0
+    assert http.error is None
+
+    connect = by_operation["connect"]
+    assert (connect.host, connect.port) == ("127.0.0.1", port)
+    assert connect.bytes_sent == http.bytes_sent
+    # The response headers and body
+    assert connect.bytes_received is not None and connect.bytes_received > 1000
+    assert connect.runtime.as_nanoseconds < http.runtime.as_nanoseconds
+
+
+def test_network_disabled(run_tests, output_file, with_xdist):
+    result, timings = run_tests("test_network.py")
+    result.assert_outcomes(passed=1)
+    assert get_timing_items(timings, NetworkTiming) == []
+
+
+def test_hooks(run_tests, output_file, with_xdist):
+    result, timings = run_tests("test_hooks", "--scrutinize-hooks")
+    result.assert_outcomes(passed=2)
+
+    hooks = get_timing_items(timings, HookTiming)
+    by_test = collections.defaultdict(dict)
+    for hook in hooks:
+        by_test[hook.test_id][hook.hook, hook.plugin] = hook
+    assert set(by_test) >= {
+        None,
+        "test_hooks.py::test_slow",
+        "test_hooks.py::test_fast",
+    }
+
+    for test_id in ["test_hooks.py::test_slow", "test_hooks.py::test_fast"]:
+        test_hooks = by_test[test_id]
+        conftest = {
+            hook: timing
+            for (hook, plugin), timing in test_hooks.items()
+            if plugin.endswith("conftest.py")
+        }
+        assert conftest["pytest_runtest_setup"].calls == 1
+        assert conftest["pytest_runtest_setup"].runtime.as_nanoseconds >= 50_000_000
+        # Both halves of the wrapper are counted, but not the test function it wraps
+        call = conftest["pytest_runtest_call"]
+        assert call.calls == 1
+        assert 40_000_000 <= call.runtime.as_nanoseconds < 100_000_000
+
+    # The test function runs in pytest's own pytest_pyfunc_call
+    pyfunc = by_test["test_hooks.py::test_slow"]["pytest_pyfunc_call", "python"]
+    assert pyfunc.runtime.as_nanoseconds >= 100_000_000
+
+    # This plugin's own hooks are reported separately
+    scrutinize = {
+        hook
+        for (hook, plugin) in by_test["test_hooks.py::test_slow"]
+        if plugin == "pytest_scrutinize.plugin"
+    }
+    assert scrutinize >= {
+        "pytest_runtest_setup",
+        "pytest_runtest_call",
+        "pytest_pyfunc_call",
+        "pytest_runtest_teardown",
+    }
+
+
+def test_hooks_disabled(run_tests, output_file, with_xdist):
+    result, timings = run_tests("test_hooks")
+    result.assert_outcomes(passed=2)
+    assert get_timing_items(timings, HookTiming) == []
+
+
+def test_memory(run_tests, output_file, with_xdist):
+    result, timings = run_tests("test_memory.py", "--scrutinize-memory")
+    result.assert_outcomes(passed=1)
+
+    mb = 1024 * 1024
+    memory = {
+        (timing.fixture_name, timing.phase): timing
+        for timing in get_timing_items(timings, MemoryTiming)
+        if timing.test_id == "test_memory.py::test_case"
+    }
+
+    call = memory[None, "call"]
+    assert 4 * mb <= call.peak_bytes < 5 * mb
+    assert mb // 2 <= call.delta_bytes < mb
+    [site, *_] = call.top_allocations
+    assert site.filename.endswith("test_memory.py")
+    assert site.size_bytes >= mb // 2
+
+    kept_setup = memory["test_memory.kept_fixture", "setup"]
+    assert mb <= kept_setup.delta_bytes < 2 * mb
+    kept_teardown = memory["test_memory.kept_fixture", "teardown"]
+    assert -2 * mb < kept_teardown.delta_bytes <= -mb
+
+    # The outer fixture's peak includes the nested fixture's
+    inner = memory["test_memory.inner_fixture", "setup"]
+    outer = memory["test_memory.outer_fixture", "setup"]
+    assert 2 * mb <= inner.peak_bytes <= outer.peak_bytes < 3 * mb
+    assert abs(outer.delta_bytes) < mb
+    # The snapshots taken for the inner fixture aren't counted in the outer one
+    assert outer.peak_bytes - inner.peak_bytes < 64 * 1024
+
+
+def test_memory_sample(run_tests, output_file, with_xdist):
+    result, timings = run_tests(
+        "test_schedule.py", "--scrutinize-memory", "--scrutinize-memory-sample=2"
+    )
+    result.assert_outcomes(passed=8)
+
+    test_ids = {timing.test_id for timing in get_timing_items(timings, PyTestTiming)}
+    sampled = {test_id for test_id in test_ids if zlib.crc32(test_id.encode()) % 2 == 0}
+    assert 0 < len(sampled) < len(test_ids)
+    # Shared fixtures are recorded without a test
+    memory_test_ids = {
+        timing.test_id for timing in get_timing_items(timings, MemoryTiming)
+    }
+    assert memory_test_ids - {None} == sampled
+
+
+def test_cpu(run_tests, output_file, with_xdist):
+    result, timings = run_tests(
+        "test_cpu.py", "--scrutinize-cpu", "--scrutinize-func=urllib.parse.quote"
+    )
+    result.assert_outcomes(passed=2)
+
+    def cpu_ratio(duration: Duration) -> float:
+        assert duration.process_time_ns is not None
+        assert duration.thread_time_ns is not None
+        return duration.thread_time_ns / duration.as_nanoseconds
+
+    # Other processes can take the CPU from the busy test, so its ratio is only compared
+    # to those of the sleeping test and fixture
+    tests = {test.name: test for test in get_timing_items(timings, PyTestTiming)}
+    busy_ratio = cpu_ratio(tests["test_busy"].runtime)
+    assert busy_ratio > cpu_ratio(tests["test_sleep"].runtime)
+
+    [fixture] = [
+        fixture
+        for fixture in get_timing_items(timings, FixtureTiming)
+        if fixture.short_name == "sleeping_fixture"
+    ]
+    assert busy_ratio > cpu_ratio(fixture.setup)
+    assert fixture.teardown is not None
+    assert busy_ratio > cpu_ratio(fixture.teardown)
+
+    mock_timings = get_timing_items(timings, MockTiming)
+    assert mock_timings != []
+    for mock_timing in mock_timings:
+        assert mock_timing.runtime.thread_time_ns is not None
+
+
+def test_cpu_disabled(run_tests, output_file, with_xdist):
+    result, timings = run_tests("test_simple.py")
+    assert_suite(result, timings, with_xdist)
+    for test_timing in get_timing_items(timings, PyTestTiming):
+        assert test_timing.runtime.process_time_ns is None
+        assert test_timing.runtime.thread_time_ns is None
+    # Durations are written without the CPU time keys
+    with gzip.open(output_file, mode="rt") as fd:
+        for line in fd:
+            assert "process_time_ns" not in line
+            assert "thread_time_ns" not in line
+
+
+def test_profile(run_tests, output_file, with_xdist, capsys):
+    result, timings = run_tests(
+        "test_profile.py",
+        "--scrutinize-profile",
+        "--scrutinize-profile-interval=1",
+        "--scrutinize-profile-threshold=50",
+    )
+    result.assert_outcomes(passed=2)
+
+    profiles = {
+        (profile.test_id, profile.fixture_name): profile
+        for profile in get_timing_items(timings, ProfileTiming)
+    }
+    # The fast test is below the threshold
+    assert set(profiles) == {
+        ("test_profile.py::test_slow", None),
+        ("test_profile.py::test_slow", "test_profile.slow_fixture"),
+    }
+
+    test_profile = profiles["test_profile.py::test_slow", None]
+    assert test_profile.samples == sum(stack.count for stack in test_profile.stacks)
+    # Stacks start at the test function
+    assert test_profile.stacks[0].stack.startswith(
+        "test_profile.test_slow;test_profile.busy"
+    )
+    fixture_profile = profiles[
+        "test_profile.py::test_slow", "test_profile.slow_fixture"
+    ]
+    assert fixture_profile.stacks[0].stack.startswith(
+        "test_profile.slow_fixture;test_profile.busy"
+    )
+
+    capsys.readouterr()
+    args = ["collapse", str(output_file), "--test=test_profile.py::test_slow"]
+    assert cli_main(args) == 0
+    collapsed = capsys.readouterr().out.splitlines()
+    stack, count = collapsed[0].rsplit(" ", 1)
+    assert stack.startswith("test_profile.py::test_slow;")
+    assert int(count) > 0
+
+
+def test_xdist_channel(run_tests, output_file, with_xdist, tmp_path, monkeypatch):
+    # Workers don't create a temporary output file, only the master does
+    worker_temp_dir = tmp_path / "worker-temp"
+    worker_temp_dir.mkdir()
+    monkeypatch.setenv("TMPDIR", str(worker_temp_dir))
+    result, timings = run_tests(
+        "test_mock.py",
+        "--scrutinize-xdist-transport=channel",
+        "--scrutinize-func=urllib.parse.urlparse,urllib.parse.parse_qs",
+        "--scrutinize-func=urllib.parse.quote",
+    )
+    assert_suite(result, timings, with_xdist)
+    assert_mocks(timings, with_xdist, root_name="test_mock")
+    # Worker timings are written as they arrive, without a final merge
+    assert get_timing_items(timings, MergeTiming) == []
+    assert len(list(worker_temp_dir.iterdir())) == 1
+
+
+def test_xdist_channel_crash(run_tests, output_file, with_xdist):
+    if not with_xdist:
+        pytest.skip("Requires xdist")
+    result, timings = run_tests(
+        "test_crash.py",
+        "--scrutinize-xdist-transport=channel",
+        "-n 1",
+        "--max-worker-restart=0",
+    )
+    result.assert_outcomes(passed=1, failed=1)
+    # Timings sent before the worker crashed are kept
+    test_ids = {timing.test_id for timing in get_timing_items(timings, PyTestTiming)}
+    assert "test_crash.py::test_case" in test_ids
+
+
+def test_sinks(run_tests, output_file, with_xdist, tmp_path):
+    received = []
+    server = socket.create_server(("127.0.0.1", 0))
+
+    def serve():
+        # One connection per process
+        connections = [server.accept()[0] for _ in range(3 if with_xdist else 1)]
+        for connection in connections:
+            with connection, connection.makefile("rb") as fd:
+                received.extend(fd)
+
+    server_thread = threading.Thread(target=serve, daemon=True)
+    server_thread.start()
+
+    port = server.getsockname()[1]
+    sink_path = tmp_path / "sink.jsonl"
+    result, timings = run_tests(
+        "test_simple.py",
+        f"--scrutinize-sink=file://{sink_path}",
+        f"--scrutinize-sink=tcp://127.0.0.1:{port}",
+    )
+    assert_suite(result, timings, with_xdist)
+    server_thread.join(timeout=10)
+    server.close()
+
+    # The merge timing is written to the final output after the sinks are closed
+    expected = collections.Counter(
+        timing.type for timing in timings if timing.type != "merge"
+    )
+    for lines in (sink_path.read_bytes().splitlines(keepends=True), received):
+        sink_timings = [TimingAdapter.validate_json(line) for line in lines]
+        # Sinks receive the timings of each process, which the output also contains
+        assert collections.Counter(timing.type for timing in sink_timings) == expected
+
+
+def test_sinks_failure(run_tests, pytester_pretty, with_xdist):
+    pytester_pretty.makeconftest(
+        """
+        def pytest_scrutinize_timing(batch, config):
+            raise ValueError("sink is down")
+        """
+    )
+    result, timings = run_tests("test_simple.py")
+    assert_suite(result, timings, with_xdist)
+    # Reported once for each process, after the sinks are closed
+    result.stdout.re_match_lines(
+        [
+            r".*batches of timings were dropped and \d+ failed to be dispatched to "
+            r"sinks, first error: ValueError\('sink is down'\)"
+        ]
+        * (3 if with_xdist else 1)
+    )
+
+
+@pytest.mark.parametrize(
+    "value", ["foo", "file://", "tcp://localhost", "unix://", "http://localhost:80"]
+)
+def test_parse_sink_invalid(value):
+    with pytest.raises(ValueError):
+        parse_sink(value)
+
+
+def test_schedule(run_tests, output_file, with_xdist, tmp_path):
+    result, _ = run_tests("test_schedule.py")
+    result.assert_outcomes(passed=8)
+    history_path = tmp_path / "history.jsonl.gz"
+    output_file.rename(history_path)
+
+    result, timings = run_tests(
+        "test_schedule.py", f"--scrutinize-schedule={history_path}"
+    )
+    result.assert_outcomes(passed=8)
+
+    # Tests sharing the expensive module fixture run on one worker, so it is set up once
+    [fixture_timing] = [
+        timing
+        for timing in get_timing_items(timings, FixtureTiming)
+        if timing.short_name == "expensive_fixture"
+    ]
+    shared_workers = {
+        timing.meta.worker
+        for timing in get_timing_items(timings, PyTestTiming)
+        if timing.name.startswith("test_shared")
+    }
+    assert shared_workers == {fixture_timing.meta.worker}
+
+
+def test_schedule_dist(pytester_pretty, tmp_path):
+    pytest.importorskip("xdist")
+    history_path = tmp_path / "history.jsonl.gz"
+    history_path.touch()
+    pytester_pretty.copy_example("test_simple.py")
+    result = pytester_pretty.runpytest(
+        "--scrutinize",
+        tmp_path / "output.jsonl.gz",
+        f"--scrutinize-schedule={history_path}",
+        "-n 2",
+        "--dist=loadfile",
+    )
+    assert result.ret == pytest.ExitCode.USAGE_ERROR
+    result.stderr.fnmatch_lines(
+        ["*--scrutinize-schedule replaces --dist=load*--dist=loadfile"]
+    )
+
+
+def test_schedule_history(tmp_path):
+    def test(name: str, requires: list[str], runtime_ns: int) -> PyTestTiming:
+        return PyTestTiming(
+            name=name,
+            test_id=f"a.py::{name}",
+            requires=requires,
+            runtime=Duration(as_nanoseconds=runtime_ns),
+        )
+
+    def fixture(
+        name: str, scope: str, setup_ns: int, baseid: str = "", short_name: str = ""
+    ) -> FixtureTiming:
+        return FixtureTiming(
+            name=f"a.{short_name or name}",
+            short_name=short_name or name,
+            test_id=None,
+            scope=scope,
+            argname=name,
+            baseid=baseid,
+            setup=Duration(as_nanoseconds=setup_ns),
+            teardown=None,
+        )
+
+    output = TimingsOutputFile(tmp_path / "output.jsonl.gz")
+    with output.initialize_writer():
+        output.add_timing(test("test_a", ["slow", "fast"], 10))
+        output.add_timing(test("test_b", ["session"], 20))
+        output.add_timing(test("test_c", ["renamed", "db"], 30))
+        output.add_timing(
+            FixtureTiming(
+                name="a.function",
+                short_name="function",
+                test_id="a.py::test_a",
+                scope="function",
+                setup=Duration(as_nanoseconds=5),
+                teardown=None,
+            )
+        )
+        output.add_timing(fixture("slow", "module", 200_000_000))
+        output.add_timing(fixture("fast", "module", 1_000))
+        output.add_timing(fixture("session", "session", 500_000_000))
+        # Declared with @pytest.fixture(name="renamed")
+        output.add_timing(
+            fixture("renamed", "module", 300_000_000, short_name="_renamed_fixture")
+        )
+        # The same name, overridden in a conftest and in another module
+        output.add_timing(fixture("db", "session", 400_000_000))
+        output.add_timing(fixture("db", "module", 1_000, baseid="sub"))
+        output.add_timing(fixture("db", "module", 100_000_000, baseid="a.py"))
+
+    history = ScheduleHistory.load(output.path)
+    assert history.test_ns == {
+        "a.py::test_a": 15,
+        "a.py::test_b": 20,
+        "a.py::test_c": 30,
+    }
+    assert history.expensive_fixtures("a.py::test_a") == [
+        (("slow", ""), "module", 200_000_000)
+    ]
+    assert history.expensive_fixtures("a.py::test_b") == [
+        (("session", ""), "session", 500_000_000)
+    ]
+    assert history.expensive_fixtures("a.py::test_c") == [
+        (("renamed", ""), "module", 300_000_000),
+        (("db", "a.py"), "module", 100_000_000),
+    ]
+    # Tests elsewhere use the closest definition of the fixture
+    history.requires["sub/b.py::test_d"] = ["db"]
+    history.requires["c.py::test_e"] = ["db"]
+    assert history.expensive_fixtures("sub/b.py::test_d") == []
+    assert history.expensive_fixtures("c.py::test_e") == [
+        (("db", ""), "session", 400_000_000)
+    ]
+    assert history.expensive_fixtures("a.py::test_f") == []
+
+
+class FakeNode:
+    def __init__(self, name: str):
+        self.gateway = SimpleNamespace(id=name)
+        self.shutting_down = False
+        self.sent: list[int] = []
+
+    def send_runtest_some(self, indices: list[int]):
+        self.sent.extend(indices)
+
+    def shutdown(self):
+        self.shutting_down = True
+
+
+def test_schedule_requeue(pytester):
+    pytest.importorskip("xdist")
+    from pytest_scrutinize.schedule_xdist import ScrutinizeScheduling
+
+    history = ScheduleHistory()
+    collection = [f"a.py::test_{i}" for i in range(10)]
+    for i, nodeid in enumerate(collection):
+        history.test_ns[nodeid] = (i + 1) * 1_000
+
+    config = pytester.parseconfig("--tx=2*popen")
+    scheduler = ScrutinizeScheduling(config, None, history)
+    crashed, survivor = FakeNode("gw0"), FakeNode("gw1")
+    for node in [crashed, survivor]:
+        scheduler.add_node(node)
+        scheduler.add_node_collection(node, collection)
+    scheduler.schedule()
+
+    completed: list[str] = []
+
+    def run_test(node: FakeNode):
+        index = node.sent.pop(0)
+        completed.append(collection[index])
+        scheduler.mark_test_complete(node, index)
+
+    # The longest tests are given out first
+    assert {collection[i] for i in crashed.sent + survivor.sent} >= {
+        "a.py::test_9",
+        "a.py::test_8",
+    }
+    crashed_tests = [collection[i] for i in crashed.sent]
+    while scheduler.workqueue:
+        run_test(survivor)
+
+    # The crashed worker's tests are put back, and given to the other worker
+    assert scheduler.remove_node(crashed) == crashed_tests[0]
+    while survivor.sent:
+        run_test(survivor)
+    assert sorted(completed) == sorted(collection)
+    assert not scheduler.workqueue
+
+
+@pytest.mark.parametrize("output_format", ["parquet"])
+def test_parquet(run_tests, output_file, with_xdist):
+    pytest.importorskip("pyarrow")
+    result, timings = run_tests(
+        "test_django.py",
+        "--ds=tests.django_app.settings",
+        "--scrutinize-django-sql=query",
+        "--scrutinize-gc",
+    )
+    assert_suite(result, timings, with_xdist)
+    sql_timings = get_timing_items(timings, DjangoSQLTiming)
+    assert sql_timings != []
+    for sql_timing in sql_timings:
+        assert_duration(sql_timing.runtime)
+        assert sql_timing.sql is not None
+
+
+@pytest.mark.parametrize("output_format", ["parquet"])
+def test_parquet_cpu(run_tests, output_file, with_xdist):
+    pytest.importorskip("pyarrow")
+    result, timings = run_tests(
+        "test_cpu.py", "--scrutinize-cpu", "--scrutinize-func=urllib.parse.quote"
+    )
+    result.assert_outcomes(passed=2)
+
+    test_timings = get_timing_items(timings, PyTestTiming)
+    mock_timings = get_timing_items(timings, MockTiming)
+    assert test_timings != [] and mock_timings != []
+    for timing in [*test_timings, *mock_timings]:
+        assert timing.runtime.process_time_ns is not None
+        assert timing.runtime.thread_time_ns is not None
+
+
+@pytest.mark.parametrize("correct", [True, False])
+def test_overhead(run_tests, output_file, with_xdist, correct):
+    flag = "--scrutinize-overhead"
+    if correct:
+        flag = f"{flag}=correct"
+    result, timings = run_tests(
+        "test_mock.py",
+        flag,
+        "--scrutinize-func=urllib.parse.urlparse,urllib.parse.parse_qs",
+    )
+    assert_suite(result, timings, with_xdist)
+
+    overhead_timings = get_timing_items(timings, OverheadTiming)
+    test_overheads = [timing for timing in overhead_timings if timing.test_id]
+    worker_overheads = [timing for timing in overhead_timings if not timing.test_id]
+
+    assert {timing.test_id for timing in test_overheads} == {"test_mock.py::test_case"}
+    assert_unique(timing.meta.worker for timing in worker_overheads)
+    if with_xdist:
+        # Each worker and the master
+        assert len(worker_overheads) == 3
+    else:
+        assert len(worker_overheads) == 1
+
+    for timing in test_overheads:
+        assert_duration(timing.patching)
+        assert_duration(timing.recording)
+        assert_duration(timing.bookkeeping)
+        assert_duration(timing.runtime)
+
+
+def test_aggregate(run_tests, output_file, with_xdist):
+    result, timings = run_tests(
+        "test_aggregate.py",
+        "--scrutinize-mode=aggregate",
+        "--scrutinize-func=urllib.parse.quote",
+    )
+    result.assert_outcomes(passed=4)
+    assert get_timing_items(timings, MockTiming) == []
+
+    aggregates = get_timing_items(timings, AggregateTiming)
+    aggregates_by_key = {
+        (aggregate.test_id, aggregate.fixture_name): aggregate
+        for aggregate in aggregates
+    }
+    # Aggregates are unique per key, including the session fixture that is merged
+    # from all xdist workers.
+    assert len(aggregates_by_key) == len(aggregates)
+
+    for value in range(4):
+        test_id = f"test_aggregate.py::test_case[{value}]"
+        test_aggregate = aggregates_by_key[(test_id, None)]
+        assert test_aggregate.count == value + 1
+        assert test_aggregate.min.as_nanoseconds <= test_aggregate.max.as_nanoseconds
+        assert test_aggregate.total.as_nanoseconds >= test_aggregate.max.as_nanoseconds
+        assert sum(bucket.count for bucket in test_aggregate.histogram) == value + 1
+
+        fixture_aggregate = aggregates_by_key[
+            (test_id, "test_aggregate.teardown_fixture")
+        ]
+        assert fixture_aggregate.count == 2
+
+    session_aggregate = aggregates_by_key[(None, "test_aggregate.session_fixture")]
+    # The session fixture runs once per worker
+    assert 1 <= session_aggregate.count <= 2
+    if not with_xdist:
+        assert session_aggregate.count == 1
+
+
+def test_sample(run_tests, output_file, with_xdist):
+    result, timings = run_tests(
+        "test_sample.py",
+        "--scrutinize-sample=urllib.parse.quote=0.25",
+        "--scrutinize-sample-top-k=5",
+        "--scrutinize-func=urllib.parse.quote",
+    )
+    result.assert_outcomes(passed=2)
+
+    mock_timings = get_timing_items(timings, MockTiming)
+    by_test = collections.defaultdict(list)
+    for timing in mock_timings:
+        by_test[timing.test_id].append(timing)
+
+    sampled = by_test["test_sample.py::test_case"]
+    assert 5 < len(sampled) < 100
+    weights = collections.Counter(timing.sample_weight for timing in sampled)
+    assert weights[1.0] == 5
+    assert set(weights) == {1.0, 4.0}
+    # The slowest calls are always kept
+    slowest = sorted(sampled, key=lambda t: t.runtime.as_nanoseconds)[-5:]
+    assert all(timing.sample_weight == 1.0 for timing in slowest)
+
+    [other] = by_test["test_sample.py::test_other"]
+    assert other.sample_weight == 1.0
+
+
+def test_sampler():
+    class Output(list):
+        add_timing = list.append
+
+    def sample_runtimes():
+        output = Output()
+        sampler = TimingsSampler(output=output, rates={"mock": 0.5}, top_k=2)
+        for runtime_ns in range(1, 1001):
+            sampler.add_timing(MockRecord("mock", "a.py::b", None, runtime_ns))
+        sampler.add_timing(MockRecord("other", "a.py::b", None, 1))
+        sampler.flush_all()
+        return [(record.runtime_ns, record.sample_weight) for record in output]
+
+    runtimes = sample_runtimes()
+    # Sampling is deterministic
+    assert runtimes == sample_runtimes()
+    assert (1, 1.0) in runtimes
+    assert runtimes[-2:] == [(999, 1.0), (1000, 1.0)]
+    assert {weight for _, weight in runtimes[:-2]} == {1.0, 2.0}
+    estimated_total = sum(runtime * weight for runtime, weight in runtimes) - 1
+    assert estimated_total == pytest.approx(sum(range(1, 1001)), rel=0.1)
+
+
+@pytest.mark.parametrize("value", ["foo", "foo=", "foo=bar", "foo=0", "foo=1.5"])
+def test_parse_sample_rate_invalid(value):
+    with pytest.raises(ValueError):
+        parse_sample_rate(value)
+
+
+def test_report_cli(run_tests, output_file, with_xdist, capsys):
+    result, timings = run_tests(
+        "test_django.py",
+        "--ds=tests.django_app.settings",
+        "--scrutinize-django-sql",
+    )
+    result.assert_outcomes(passed=1)
+
+    assert cli_main(["report", str(output_file), "--top=5"]) == 0
+    report = capsys.readouterr().out
+    assert "Slowest 5 tests" in report
+    assert "test_django.py::test_case" in report
+    assert "test_django.teardown_fixture" in report
+    assert "Garbage collection" in report
+
+
+def test_report(tmp_path):
+    def sql(
+        test_id: str | None, sql_hash: str, sample_weight: float = 1
+    ) -> DjangoSQLTiming:
+        return DjangoSQLTiming(
+            sample_weight=sample_weight,
+            name="django_sql",
+            test_id=test_id,
+            fixture_name=None,
+            runtime=Duration(as_nanoseconds=10),
+            sql_hash=sql_hash,
+            sql=None,
+        )
+
+    def fixture(test_id: str, setup_ns: int) -> FixtureTiming:
+        return FixtureTiming(
+            name="a.fixture",
+            short_name="fixture",
+            test_id=test_id,
+            scope="function",
+            setup=Duration(as_nanoseconds=setup_ns),
+            teardown=Duration(as_nanoseconds=1),
+        )
+
+    output = TimingsOutputFile(tmp_path / "output.jsonl.gz")
+    with output.initialize_writer():
+        output.add_timing(
+            PyTestTiming(
+                # Timings are filtered by their top-level type only
+                meta=Meta(thread_name='"type":"test"'),
+                name="test",
+                test_id="a.py::test",
+                requires=[],
+                runtime=Duration(as_nanoseconds=100),
+            )
+        )
+        output.add_timing(CollectionTiming(runtime=Duration(as_nanoseconds=1_000)))
+        output.add_timing(fixture("a.py::test", 10))
+        output.add_timing(fixture("a.py::other", 20))
+        for sql_hash in ["a", "a", "a", "b", "b", "c"]:
+            output.add_timing(sql("a.py::test", sql_hash))
+        output.add_timing(sql(None, "a"))
+        output.add_timing(sql("a.py::other", "a"))
+        # A sampled query stands for several identical ones
+        output.add_timing(sql("a.py::sampled", "a", sample_weight=4))
+        output.add_timing(
+            GCTiming(
+                runtime=Duration(as_nanoseconds=5), collected_count=1, generation=2
+            )
+        )
+
+    report = build_report(output.path, top=5)
+    assert report.slowest_tests.items() == [(100, "a.py::test")]
+    assert report.slowest_fixtures.items() == [
+        (21, ("a.fixture", "a.py::other", 20, 1)),
+        (11, ("a.fixture", "a.py::test", 10, 1)),
+    ]
+    assert report.fixtures["a.fixture"].count == 2
+    assert report.fixtures["a.fixture"].total_ns == 32
+    assert report.duplicate_sql.items() == [
+        (3, ("a.py::test", 3, 2)),
+        (3, ("a.py::sampled", 3, 1)),
+    ]
+    assert report.gc[2].count == 1
+    assert report.gc[2].total_ns == 5
+    assert "a.py::test" in report.render()
+
+
+def test_history(tmp_path, capsys):
+    store = tmp_path / "history.db"
+
+    def ingest(run: int, test_ns: int, queries: int):
+        output = TimingsOutputFile(tmp_path / f"run-{run}.jsonl.gz")
+        with output.initialize_writer():
+            output.add_timing(
+                PyTestTiming(
+                    name="test",
+                    test_id="a.py::test",
+                    requires=["fixture"],
+                    runtime=Duration(as_nanoseconds=test_ns),
+                )
+            )
+            output.add_timing(
+                FixtureTiming(
+                    name="a.fixture",
+                    short_name="fixture",
+                    test_id="a.py::test",
+                    scope="function",
+                    setup=Duration(as_nanoseconds=5_000_000 + run),
+                    teardown=Duration(as_nanoseconds=1_000),
+                )
+            )
+            for _ in range(queries):
+                output.add_timing(
+                    DjangoSQLTiming(
+                        name="django_sql",
+                        test_id="a.py::test",
+                        fixture_name=None,
+                        runtime=Duration(as_nanoseconds=10),
+                        sql_hash="a",
+                        sql=None,
+                    )
+                )
+        args = ["ingest", str(output.path), f"--store={store}", f"--name=run-{run}"]
+        assert cli_main(args) == 0
+
+    assert cli_main(["compare", f"--store={store}"]) == 2
+
+    for run, test_ns in enumerate([10_000_000, 10_100_000, 9_900_000, 10_000_000]):
+        ingest(run, test_ns, queries=2)
+    assert cli_main(["compare", f"--store={store}"]) == 0
+    assert "No regressions found" in capsys.readouterr().out
+
+    ingest(4, 20_000_000, queries=3)
+    assert cli_main(["compare", f"--store={store}", "--runs=3"]) == 1
+    output = capsys.readouterr().out
+    assert "queries          a.py::test: 2 -> 3 (+50%)" in output
+    assert "test             a.py::test: 10.00ms -> 20.00ms (+100%)" in output
+    assert "fixture" not in output
+
+    # Earlier runs are compared to the runs before them
+    assert cli_main(["compare", f"--store={store}", "--run=4"]) == 0
+
+    # Every per-run table can be filtered by run without a full scan
+    with sqlite3.connect(store) as connection:
+        for table in ["tests", "fixtures", "queries"]:
+            plan = connection.execute(
+                f"explain query plan select * from {table} where run_id = 1"
+            ).fetchall()
+            assert f"USING INDEX {table}_run_id" in plan[0][-1]
+
+
+def test_records_match_models():
+    mock_record = MockRecord(
+        name="mock", test_id="a.py::b", fixture_name=None, runtime_ns=1234
+    )
+    mock_timing = mock_record.to_timing()
+    assert mock_timing.meta.worker == "master"
+    assert mock_timing.model_dump_json() == (
+        MockTiming(
+            meta=mock_timing.meta,
+            name="mock",
+            test_id="a.py::b",
+            fixture_name=None,
+            runtime=Duration(as_nanoseconds=1234),
+        ).model_dump_json()
+    )
+
+    sql_record = DjangoSQLRecord(
+        name="django_sql",
+        test_id=None,
+        fixture_name="a.fixture",
+        runtime_ns=5678,
+        query=b"SELECT 1",
+        include_sql=True,
+    )
+    sql_timing = sql_record.to_timing()
+    assert sql_timing.model_dump_json() == (
+        DjangoSQLTiming(
+            meta=sql_timing.meta,
+            name="django_sql",
+            test_id=None,
+            fixture_name="a.fixture",
+            runtime=Duration(as_nanoseconds=5678),
+            sql_hash=hashlib.sha256(b"SELECT 1").hexdigest(),
+            sql="SELECT 1",
+        ).model_dump_json()
+    )
+
+    gc_timing = GCRecord(runtime_ns=9012, collected_count=3, generation=2).to_timing()
+    assert gc_timing.model_dump_json() == (
+        GCTiming(
+            meta=gc_timing.meta,
+            runtime=Duration(as_nanoseconds=9012),
+            collected_count=3,
+            generation=2,
+        ).model_dump_json()
+    )
+
+
+def test_histogram_buckets():
+    assert [bucket_lower_bound(value) for value in range(9)] == list(range(9))
+    assert bucket_lower_bound(1_000) == 896
+    assert bucket_lower_bound(1_023) == 896
+    assert bucket_lower_bound(1_024) == 1_024
+    assert bucket_lower_bound(1_300) == 1_280